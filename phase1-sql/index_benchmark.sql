@@ -0,0 +1,146 @@
+-- Index benchmark for the borrowing/review access paths
+-- (phase3 migration library/0005_borrowing_review_access_path_indexes)
+--
+-- Builds a synthetic 10M-row borrowing table (and 1M reviews) in a scratch
+-- database, then prints EXPLAIN plans and EXPLAIN ANALYZE timings for the
+-- hot queries before and after adding the indexes.
+-- Needs MySQL 8.0.18+ (EXPLAIN ANALYZE). Run it on a scratch server:
+--     mysql -u root -p < index_benchmark.sql > index_benchmark.out
+
+-- 1. Scratch database
+create database if not exists lib_mng_bench;
+use lib_mng_bench;
+
+drop table if exists borrowing;
+drop table if exists review;
+drop table if exists digits;
+
+-- Same columns and baseline indexes (pk, FKs, unique member/book) as the
+-- Django `borrowing` and `review` tables
+create table borrowing (
+borrowing_id int auto_increment primary key,
+borrow_date datetime(6) not null,
+due_date datetime(6) not null,
+return_date datetime(6) null,
+late_fee double not null,
+created_at datetime(6) not null,
+updated_at datetime(6) not null,
+member_id int not null,
+book_id int not null,
+unique key unique_book_member (member_id, book_id),
+key borrowing_book_id (book_id),
+key borrowing_due_date_idx (due_date, borrowing_id)
+);
+
+create table review (
+review_id int auto_increment primary key,
+rating double not null,
+comment varchar(500) not null,
+review_date datetime(6) not null,
+created_at datetime(6) not null,
+updated_at datetime(6) not null,
+member_id int not null,
+book_id int not null,
+unique key unique_review_per_member_book (member_id, book_id),
+key review_book_id (book_id)
+);
+
+-- 2. Synthetic data
+-- n = 0 .. 9,999,999 from a cross join of digit tables.
+-- 100k members with 100 distinct books each, over 1M book ids.
+-- Two years of borrows, 14-day loans, 5% still out.
+create table digits (d int primary key);
+insert into digits values (0), (1), (2), (3), (4), (5), (6), (7), (8), (9);
+
+set @start = '2023-01-01 00:00:00';
+
+insert into borrowing (borrow_date, due_date, return_date, late_fee, created_at, updated_at, member_id, book_id)
+select borrow_date,
+	borrow_date + interval 14 day,
+    case when n % 20 = 0 then null else borrow_date + interval (n % 21) day end,
+    case when n % 20 <> 0 and n % 21 > 14 then (n % 21 - 14) * 10.0 else 0 end,
+    borrow_date, borrow_date,
+    n % 100000 + 1,
+    ((n div 100000) * 7919 + n % 100000) % 1000000 + 1
+from (
+	select n, @start + interval (n % 730) day + interval (n % 86400) second as borrow_date
+    from (
+		select d1.d + d2.d * 10 + d3.d * 100 + d4.d * 1000 + d5.d * 10000 + d6.d * 100000 + d7.d * 1000000 as n
+		from digits d1, digits d2, digits d3, digits d4, digits d5, digits d6, digits d7
+	) as seq
+) as rows_;
+
+insert into review (rating, comment, review_date, created_at, updated_at, member_id, book_id)
+select 1 + n % 5, 'Synthetic review', @start + interval (n % 730) day, now(), now(),
+	n % 100000 + 1,
+    ((n div 100000) * 7919 + n % 100000) % 1000000 + 1
+from (
+	select d1.d + d2.d * 10 + d3.d * 100 + d4.d * 1000 + d5.d * 10000 + d6.d * 100000 as n
+    from digits d1, digits d2, digits d3, digits d4, digits d5, digits d6
+) as seq;
+
+analyze table borrowing, review;
+
+-- 3. Hot queries, BEFORE the new indexes
+-- Q1. Active loans of a member (borrow limit check)
+explain select count(*) from borrowing where member_id = 4242 and return_date is null;
+explain analyze select count(*) from borrowing where member_id = 4242 and return_date is null;
+
+-- Q2. Most borrowed books in a period (phase1 queries.sql Q2)
+explain select book_id, count(*) as borrowing_times from borrowing
+where borrow_date between '2024-06-10' and '2024-06-30' group by book_id order by borrowing_times desc limit 10;
+explain analyze select book_id, count(*) as borrowing_times from borrowing
+where borrow_date between '2024-06-10' and '2024-06-30' group by book_id order by borrowing_times desc limit 10;
+
+-- Q3. Borrow history of one book
+explain select count(*) from borrowing where book_id = 777 and borrow_date >= '2024-01-01';
+explain analyze select count(*) from borrowing where book_id = 777 and borrow_date >= '2024-01-01';
+
+-- Q4. Overdue and not returned
+explain select borrowing_id, member_id, book_id, due_date from borrowing
+where due_date < '2024-12-31' and return_date is null;
+explain analyze select borrowing_id, member_id, book_id, due_date from borrowing
+where due_date < '2024-12-31' and return_date is null;
+
+-- Q5. Fines per member (phase1 queries.sql Q3)
+explain select member_id, sum(late_fee) as fine from borrowing where late_fee > 0 group by member_id;
+explain analyze select member_id, sum(late_fee) as fine from borrowing where late_fee > 0 group by member_id;
+
+-- Q6. Average rating per book (phase1 queries.sql Q4)
+explain select book_id, avg(rating) from review group by book_id;
+explain analyze select book_id, avg(rating) from review group by book_id;
+
+-- 4. The indexes from migration 0005
+create index borrowing_member_active_idx on borrowing (member_id, return_date);
+create index borrowing_book_history_idx on borrowing (book_id, borrow_date);
+create index borrowing_overdue_idx on borrowing (due_date, return_date);
+create index borrowing_late_fee_idx on borrowing (late_fee, member_id);
+create index review_book_rating_idx on review (book_id, rating);
+
+analyze table borrowing, review;
+
+-- 5. Same queries, AFTER
+explain select count(*) from borrowing where member_id = 4242 and return_date is null;
+explain analyze select count(*) from borrowing where member_id = 4242 and return_date is null;
+
+explain select book_id, count(*) as borrowing_times from borrowing
+where borrow_date between '2024-06-10' and '2024-06-30' group by book_id order by borrowing_times desc limit 10;
+explain analyze select book_id, count(*) as borrowing_times from borrowing
+where borrow_date between '2024-06-10' and '2024-06-30' group by book_id order by borrowing_times desc limit 10;
+
+explain select count(*) from borrowing where book_id = 777 and borrow_date >= '2024-01-01';
+explain analyze select count(*) from borrowing where book_id = 777 and borrow_date >= '2024-01-01';
+
+explain select borrowing_id, member_id, book_id, due_date from borrowing
+where due_date < '2024-12-31' and return_date is null;
+explain analyze select borrowing_id, member_id, book_id, due_date from borrowing
+where due_date < '2024-12-31' and return_date is null;
+
+explain select member_id, sum(late_fee) as fine from borrowing where late_fee > 0 group by member_id;
+explain analyze select member_id, sum(late_fee) as fine from borrowing where late_fee > 0 group by member_id;
+
+explain select book_id, avg(rating) from review group by book_id;
+explain analyze select book_id, avg(rating) from review group by book_id;
+
+-- 6. Clean up
+drop database lib_mng_bench;
@@ -2,7 +2,7 @@ import argparse
 from datetime import date
 from sqlalchemy.exc import IntegrityError
 from api_client import OpenLibraryClient
-from database import get_engine_and_session, Base
+from database import get_engine_and_session, pool_stats, Base
 from models import Author, Book
 from schemas import AuthorSchema, BookSchema, validate_and_log, ValidationTracker
 from logs import logger
@@ -116,6 +116,7 @@ def main():
         logger.error(f"Database commit failed: {e}")
     book_tracker.report("Books")
     session.close()
+    logger.debug(f"Connection pool: {pool_stats(engine)}")
 
 if __name__ == "__main__":
     main()
@@ -1,8 +1,16 @@
+import sys
+from pathlib import Path
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+# Pool settings are shared with the CSV ingestion scripts (src/library_mng_system/db_pool.py).
+# Appended, not prepended, so this directory's models/schemas/database still win.
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src" / "library_mng_system"))
+from db_pool import pool_options, pool_stats  # noqa: E402  (pool_stats is used by api_fetcher)
+
 Base = declarative_base()
 def get_engine_and_session(database_url: str):
-    engine = create_engine(database_url, echo=False, future=True)
+    engine = create_engine(database_url, echo=False, future=True, **pool_options(database_url))
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     return engine, SessionLocal
@@ -2,6 +2,12 @@ import models
 import os
 import argparse
 import csv
+import logging
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
+from sqlalchemy import insert, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from models import Library, Book, Author, Member
@@ -15,8 +21,11 @@ from schemas import (
 )
 from logs import logger, set_log_level
 from database import get_engine_and_session, Base
+from db_pool import pool_stats
 
-# Map CSV file names to models and schemas
+# Map CSV file names to models and schemas. Files are ingested in this
+# order, so a parent table's file must come before its children's: the
+# foreign keys of every row are checked against the parent keys (ParentKeys)
 FILE_MODEL_SCHEMA_MAP = {
     "libraries.csv": (Library, LibrarySchema),
     "books.csv": (Book, BookSchema),
@@ -24,11 +33,20 @@ FILE_MODEL_SCHEMA_MAP = {
     "members.csv": (Member, MemberSchema),
 }
 
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_CHUNK_SIZE = 10000
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Process and insert validated CSV data into the database.")
     parser.add_argument("--directory", required=True, help="Directory containing CSV files.")
     parser.add_argument("--db", required=True, help="SQLAlchemy-compatible database URL.")
     parser.add_argument("--log-level", default="INFO", help="Logging level (e.g., INFO, DEBUG, WARNING).")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Rows per duplicate-key lookup, per INSERT statement and per task sent to a worker.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Rows validated and inserted per transaction; each chunk is committed on its own.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes validating rows in parallel (1 validates in this process).")
     return parser.parse_args()
 
 def load_csv(filepath):
@@ -37,22 +55,156 @@ def load_csv(filepath):
         for row in reader:
             yield {k.strip(): v.strip() for k, v in row.items()}
 
-def insert_validated_data(session: Session, model, validated_objects):
-    for obj in validated_objects:
-        # Check if object with this PK already exists, skip to avoid duplicates
-        pk_name = list(model.__table__.primary_key.columns)[0].name
-        pk_value = getattr(obj, pk_name, None)
+def batched(iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def existing_keys(session: Session, pk_column, keys) -> set:
+    # One IN (...) lookup for a whole batch of primary keys
+    if not keys:
+        return set()
+    return set(session.scalars(select(pk_column).where(pk_column.in_(keys))))
+
+class ParentKeys:
+    # Primary keys of the tables referenced by foreign keys, loaded with one
+    # query per table the first time a child row needs them and extended with
+    # every batch inserted into that table afterwards
+    def __init__(self, session: Session):
+        self.session = session
+        self._keys: dict[str, set] = {}
+
+    def get(self, table) -> set:
+        if table.name not in self._keys:
+            pk_column = list(table.primary_key.columns)[0]
+            self._keys[table.name] = set(self.session.scalars(select(pk_column)))
+        return self._keys[table.name]
 
-        if pk_value is not None:
-            exists = session.query(model).filter(getattr(model, pk_name) == pk_value).first()
-            if exists:
-                logger.warning(f"Skipping duplicate {model.__tablename__} with {pk_name}={pk_value}")
+    def add(self, table, keys):
+        # Tables not loaded yet will read the new keys from the database
+        if table.name in self._keys:
+            self._keys[table.name].update(keys)
+
+    def forget(self, table):
+        # Reload on next use, e.g. after the table's inserts were rolled back
+        self._keys.pop(table.name, None)
+
+    def missing(self, model, row: dict):
+        # (column, value) of the first foreign key in a CSV row whose parent
+        # row does not exist, or None. Empty values are left to the schema.
+        for fk in model.__table__.foreign_keys:
+            value = row.get(fk.parent.name)
+            if value in (None, ""):
                 continue
+            try:
+                key = fk.column.type.python_type(value)
+            except (TypeError, ValueError):
+                return fk.parent.name, value
+            if key not in self.get(fk.column.table):
+                return fk.parent.name, value
+        return None
+
+def insert_validated_data(session: Session, model, validated_objects, batch_size: int = DEFAULT_BATCH_SIZE,
+                          parent_keys: ParentKeys | None = None) -> tuple[int, int]:
+    # Inserts in batches of batch_size rows (one executemany INSERT each),
+    # skipping rows whose primary key is already in the table or earlier in
+    # the file. Returns (inserted, skipped).
+    pk_column = list(model.__table__.primary_key.columns)[0]
+    pk_name = pk_column.name
+    inserted = skipped = 0
+
+    for batch in batched(validated_objects, batch_size):
+        keys = {getattr(obj, pk_name, None) for obj in batch} - {None}
+        seen = existing_keys(session, pk_column, list(keys))
+        rows = []
+        for obj in batch:
+            pk_value = getattr(obj, pk_name, None)
+            if pk_value is not None:
+                if pk_value in seen:
+                    logger.warning(f"Skipping duplicate {model.__tablename__} with {pk_name}={pk_value}")
+                    skipped += 1
+                    continue
+                seen.add(pk_value)
+            rows.append(obj.model_dump())
+
+        if rows:
+            session.execute(insert(model), rows)
+            inserted += len(rows)
+            if parent_keys is not None:
+                if any(row.get(pk_name) is None for row in rows):
+                    parent_keys.forget(model.__table__)  # keys generated by the database
+                else:
+                    parent_keys.add(model.__table__, (row[pk_name] for row in rows))
+
+    return inserted, skipped
+
+class RecordCollector(logging.Handler):
+    # Keeps a worker's log records so the parent can emit them in input order
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
 
-        db_obj = model(**obj.model_dump())
-        session.add(db_obj)
+def validate_row(schema_class, item: tuple[dict, str | None], tracker: ValidationTracker):
+    # item is (CSV row, rejection): rows rejected by the foreign key check
+    # are only logged and counted here, so the report keeps the file's order
+    row, rejection = item
+    if rejection:
+        logger.warning(rejection)
+        tracker.log_invalid()
+        return None
+    return validate_and_log(schema_class, row, tracker)
 
-def process_file(filename, model, schema_class, directory, session):
+def validate_chunk(schema_class, items: list) -> tuple[list, ValidationTracker, list]:
+    # Runs in a worker process: validates one chunk of rows and returns its
+    # log records instead of printing them
+    tracker = ValidationTracker()
+    collector = RecordCollector()
+    handlers, logger.handlers = logger.handlers, [collector]
+    try:
+        validated = [obj for item in items if (obj := validate_row(schema_class, item, tracker))]
+    finally:
+        logger.handlers = handlers
+    tracker.capture_phone_cache()
+    return validated, tracker, collector.records
+
+def validate_rows(schema_class, items, tracker: ValidationTracker, executor: Executor | None = None,
+                  workers: int = 1, batch_size: int = DEFAULT_BATCH_SIZE):
+    # Yields the valid objects in input order. With an executor, items are
+    # validated batch_size at a time in its workers, keeping at most two
+    # batches per worker in flight; their tracker counts are merged into
+    # `tracker` and their log records emitted in input order, so the output
+    # matches a single-process run.
+    if executor is None:
+        for item in items:
+            validated = validate_row(schema_class, item, tracker)
+            if validated:
+                yield validated
+        return
+
+    pending = deque()
+    for chunk in batched(items, batch_size):
+        pending.append(executor.submit(validate_chunk, schema_class, chunk))
+        if len(pending) >= workers * 2:
+            yield from _collect(pending.popleft(), tracker)
+    while pending:
+        yield from _collect(pending.popleft(), tracker)
+
+def _collect(future, tracker: ValidationTracker) -> list:
+    validated, chunk_tracker, records = future.result()
+    for record in records:
+        logger.handle(record)
+    tracker.merge(chunk_tracker)
+    return validated
+
+def process_file(filename, model, schema_class, directory, session, batch_size: int = DEFAULT_BATCH_SIZE,
+                 parent_keys: ParentKeys | None = None, executor: Executor | None = None, workers: int = 1,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+    # Streams the file through load_csv -> foreign key check -> validation ->
+    # insert, committing every chunk_size valid rows, so memory stays flat
+    # whatever the file size. A failure rolls back the current chunk only.
     logger.info(f"Processing file: {filename}")
     filepath = os.path.join(directory, filename)
 
@@ -60,25 +212,44 @@ def process_file(filename, model, schema_class, directory, session):
         logger.warning(f"File not found: {filepath}")
         return
 
+    parent_keys = parent_keys or ParentKeys(session)
     tracker = ValidationTracker()
-    validated_objects = []
-
-    for row in load_csv(filepath):
-        # Extra foreign key validation for Book
-        if schema_class == BookSchema:
-            library_id = row.get("library_id")
-            if not session.query(Library).filter_by(library_id=library_id).first():
-                logger.warning(f"Book skipped - library_id {library_id} does not exist in DB.")
-                tracker.log_invalid()
-                continue
+    started = time.perf_counter()
 
-        validated = validate_and_log(schema_class, row, tracker)
-        if validated:
-            validated_objects.append(validated)
+    def rows_with_parents():
+        for row in load_csv(filepath):
+            # Extra foreign key validation, e.g. a Book's library_id
+            missing = parent_keys.missing(model, row)
+            if missing:
+                column, value = missing
+                yield row, f"{model.__name__} skipped - {column} {value} does not exist in DB."
+            else:
+                yield row, None
+
+    validated_objects = validate_rows(schema_class, rows_with_parents(), tracker, executor, workers, batch_size)
+    inserted = skipped = 0
+    chunk_started = time.perf_counter()
+
+    for number, chunk in enumerate(batched(validated_objects, chunk_size), start=1):
+        chunk_inserted, chunk_skipped = insert_validated_data(session, model, chunk, batch_size, parent_keys)
+        session.commit()
+        inserted += chunk_inserted
+        skipped += chunk_skipped
+
+        now = time.perf_counter()
+        elapsed = now - chunk_started
+        rate = len(chunk) / elapsed if elapsed else 0.0
+        logger.info(f"{filename}: chunk {number} - {len(chunk)} valid rows, {chunk_inserted} inserted "
+                    f"in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+        chunk_started = now
 
-    insert_validated_data(session, model, validated_objects)
     tracker.report(schema_class.__name__)
 
+    elapsed = time.perf_counter() - started
+    rate = tracker.total / elapsed if elapsed else 0.0
+    logger.info(f"{filename}: {tracker.total} rows read, {inserted} inserted, {skipped} duplicates skipped "
+                f"in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+
 def main():
     args = parse_args()
     set_log_level(args.log_level)
@@ -88,17 +259,29 @@ def main():
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)  # Auto-create tables
 
+    executor = None
+    if args.workers > 1:
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=set_log_level, initargs=(args.log_level,))
+
     with SessionLocal() as session:
+        parent_keys = ParentKeys(session)
         for filename, (model, schema_class) in FILE_MODEL_SCHEMA_MAP.items():
             try:
-                process_file(filename, model, schema_class, args.directory, session)
+                process_file(filename, model, schema_class, args.directory, session, args.batch_size, parent_keys,
+                             executor, args.workers, args.chunk_size)
                 session.commit()
             except IntegrityError as e:
                 logger.warning(f"Integrity error while processing {filename}: {e}")
                 session.rollback()
+                parent_keys.forget(model.__table__)
             except Exception as e:
                 logger.warning(f"Unexpected error while processing {filename}: {e}")
                 session.rollback()
+                parent_keys.forget(model.__table__)
+
+    if executor is not None:
+        executor.shutdown()
+    logger.debug(f"Connection pool: {pool_stats(engine)}")
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,11 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from db_pool import pool_options
+
 Base = declarative_base()
 
 def get_engine_and_session(database_url: str):
-    engine = create_engine(database_url, echo=False, future=True)
+    engine = create_engine(database_url, echo=False, future=True, **pool_options(database_url))
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     return engine, SessionLocal
@@ -0,0 +1,32 @@
+import os
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+
+# Connection pool settings, read from the same DB_POOL_* environment
+# variables as the Django app (phase3 lms/settings.py). DB_POOL_ENABLED=false
+# opens a fresh connection for every checkout.
+def pool_options(database_url: str) -> dict:
+    if make_url(database_url).get_backend_name() == "sqlite":
+        return {}
+    if os.getenv("DB_POOL_ENABLED", "true").lower() not in ("1", "true", "yes", "on"):
+        return {"poolclass": NullPool}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_POOL_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "3600")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes", "on"),
+    }
+
+def pool_stats(engine) -> dict:
+    # Checked in/out counts of a QueuePool (empty for other pool classes)
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {}
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+    }
@@ -1,5 +1,6 @@
 # This File contains Pydantic data Validation
 import re
+from functools import lru_cache
 import phonenumbers
 from phonenumbers import NumberParseException
 from pydantic import BaseModel, EmailStr, ValidationError, field_validator, model_validator, confloat
@@ -111,19 +112,35 @@ class MemberSchema(BaseValidator):
         return validate_phone_global(v)
 
 # Some common validation across models
-def validate_phone_global(phone: Optional[str]) -> Optional[str]:
-    if not phone:
-        return None
+PHONE_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=PHONE_CACHE_SIZE)
+def normalize_phone(phone: str) -> tuple[Optional[str], Optional[str]]:
+    # (E.164 number, None) or (None, error message). Memoized: exports repeat
+    # the same numbers (shared department lines) and parsing is the costliest
+    # check. Errors are returned rather than raised so they are cached too.
     try:
         # Try parsing with no region to force international format (+)
         number = phonenumbers.parse(phone, None)
-        if not phonenumbers.is_valid_number(number):
-            raise ValueError("Invalid phone number")
-        # Return number in E.164 format: +12345678900
-        return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
-
     except NumberParseException as e:
-        raise ValueError(f"Invalid phone number format: {e}")
+        return None, f"Invalid phone number format: {e}"
+    if not phonenumbers.is_valid_number(number):
+        return None, "Invalid phone number"
+    # Return number in E.164 format: +12345678900
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164), None
+
+def phone_cache_counts() -> tuple[int, int]:
+    # (hits, misses) of normalize_phone in this process
+    info = normalize_phone.cache_info()
+    return info.hits, info.misses
+
+def validate_phone_global(phone: Optional[str]) -> Optional[str]:
+    if not phone:
+        return None
+    normalized, error = normalize_phone(phone)
+    if error:
+        raise ValueError(error)
+    return normalized
 
 def name_validator(name: Optional[str]) -> Optional[str]:
     if not re.fullmatch(r"[A-Za-z\s\-']+", name.strip()):
@@ -136,6 +153,10 @@ class ValidationTracker:
         self.total = 0
         self.valid = 0
         self.invalid = 0
+        # normalize_phone cache lookups made while this tracker was in use
+        self.phone_hits = 0
+        self.phone_misses = 0
+        self._phone_cache_seen = phone_cache_counts()
 
     def log_valid(self):
         self.valid += 1
@@ -147,6 +168,24 @@ class ValidationTracker:
 
     def reset(self):
         self.total = self.valid = self.invalid = 0
+        self.phone_hits = self.phone_misses = 0
+        self._phone_cache_seen = phone_cache_counts()
+
+    def capture_phone_cache(self):
+        # Adds the phone cache hits/misses since the last capture; the cache
+        # is per process, so a worker captures before sending its tracker back
+        hits, misses = phone_cache_counts()
+        self.phone_hits += hits - self._phone_cache_seen[0]
+        self.phone_misses += misses - self._phone_cache_seen[1]
+        self._phone_cache_seen = (hits, misses)
+
+    def merge(self, other: "ValidationTracker"):
+        # Add the counts of a tracker filled elsewhere (e.g. a worker process)
+        self.total += other.total
+        self.valid += other.valid
+        self.invalid += other.invalid
+        self.phone_hits += other.phone_hits
+        self.phone_misses += other.phone_misses
 
     def report(self, schema_name):
         success_rate = (self.valid / self.total * 100) if self.total else 0
@@ -156,6 +195,13 @@ class ValidationTracker:
         logger.info(f"====>Total rows:   {self.total}\n")
         logger.info(f"====> Success rate: {success_rate:.1f}%\n")
 
+        self.capture_phone_cache()
+        lookups = self.phone_hits + self.phone_misses
+        if lookups:
+            hit_rate = self.phone_hits / lookups * 100
+            logger.info(f"====> Phone cache:  {self.phone_hits} hits, {self.phone_misses} misses "
+                        f"({hit_rate:.1f}% hit rate)\n")
+
 def validate_and_log(schema_class, row: dict, tracker: ValidationTracker) -> Optional[BaseValidator]:
     try:
         obj = schema_class(**row)
@@ -0,0 +1,195 @@
+import csv
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+import data_processor
+from data_processor import FILE_MODEL_SCHEMA_MAP, ParentKeys, existing_keys, insert_validated_data, process_file
+from database import Base, get_engine_and_session
+from models import Book, Library
+from schemas import BookSchema, LibrarySchema
+
+CSV_DIRECTORY = Path(__file__).resolve().parents[1] / "csv_data"
+
+
+@pytest.fixture
+def make_session(tmp_path):
+    sessions = []
+
+    def make(name="library.db"):
+        engine, SessionLocal = get_engine_and_session(f"sqlite:///{tmp_path / name}")
+        Base.metadata.create_all(bind=engine)
+        sessions.append(SessionLocal())
+        return sessions[-1]
+
+    yield make
+    for session in sessions:
+        session.close()
+
+
+def library(library_id):
+    return LibrarySchema(library_id=library_id, name=f"Library {library_id}", campus_location="Campus",
+                         contact_email=f"library{library_id}@example.com", phone_number=None)
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def book_row(book_id, library_id):
+    return {"book_id": book_id, "title": f"Book {book_id}", "publication_date": "2020-01-01",
+            "total_copies": 2, "available_copies": 1, "library_id": library_id, "isbn": "9780135957059"}
+
+
+def library_ids(session):
+    return list(session.scalars(select(Library.library_id).order_by(Library.library_id)))
+
+
+@pytest.fixture
+def statements():
+    # SQL statements sent to any engine; an executemany counts once
+    sent = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        sent.append(statement.split()[0].upper())
+
+    event.listen(Engine, "before_cursor_execute", record)
+    yield sent
+    event.remove(Engine, "before_cursor_execute", record)
+
+
+def ingest(session, directory=CSV_DIRECTORY, **options):
+    parent_keys = ParentKeys(session)
+    for filename, (model, schema_class) in FILE_MODEL_SCHEMA_MAP.items():
+        process_file(filename, model, schema_class, str(directory), session, parent_keys=parent_keys, **options)
+
+
+def table_rows(session):
+    return {
+        model.__tablename__: session.execute(select(model.__table__).order_by(*model.__table__.primary_key)).all()
+        for model, _ in FILE_MODEL_SCHEMA_MAP.values()
+    }
+
+
+def report(caplog):
+    # Log lines that do not depend on timing or on the per-process phone cache
+    return [
+        record.getMessage() for record in caplog.records
+        if "rows/sec" not in record.getMessage() and "Phone cache" not in record.getMessage()
+    ]
+
+
+def test_workers_give_the_same_rows_and_report_as_one_process(make_session, caplog):
+    caplog.set_level(logging.INFO, logger="data_validation")
+    session = make_session("single.db")
+    ingest(session, batch_size=2)
+    single_rows, single_report = table_rows(session), report(caplog)
+    caplog.clear()
+
+    with ProcessPoolExecutor(max_workers=3) as executor:
+        session = make_session("workers.db")
+        ingest(session, batch_size=2, executor=executor, workers=3)
+
+    assert table_rows(session) == single_rows
+    assert report(caplog) == single_report
+    assert any(rows for rows in single_rows.values())
+    assert any(record.levelno == logging.WARNING for record in caplog.records)
+
+
+def test_duplicate_keys_are_skipped_within_and_across_batches(make_session, statements):
+    session = make_session()
+    session.add(Library(**library(1).model_dump()))
+    session.commit()
+    statements.clear()
+
+    objects = [library(i) for i in (1, 2, 3, 2, 4, 3, 5)]
+    assert insert_validated_data(session, Library, objects, batch_size=2) == (4, 3)
+    # One key lookup and one INSERT per batch of two
+    assert statements == ["SELECT", "INSERT"] * 4
+    session.commit()
+    assert library_ids(session) == [1, 2, 3, 4, 5]
+
+
+def test_existing_keys_is_one_lookup(make_session, statements):
+    session = make_session()
+    session.add_all([Library(**library(i).model_dump()) for i in (1, 2)])
+    session.commit()
+    statements.clear()
+
+    assert existing_keys(session, Library.library_id, []) == set()
+    assert statements == []
+    assert existing_keys(session, Library.library_id, [1, 2, 3]) == {1, 2}
+    assert statements == ["SELECT"]
+
+
+def test_parent_keys_are_loaded_once_and_extended(make_session, statements):
+    session = make_session()
+    session.add_all([Library(**library(i).model_dump()) for i in (1, 2)])
+    session.commit()
+    statements.clear()
+
+    keys = ParentKeys(session)
+    assert keys.missing(Book, book_row(1, "1")) is None
+    assert keys.missing(Book, book_row(2, "3")) == ("library_id", "3")
+    assert keys.missing(Book, book_row(3, "x")) == ("library_id", "x")
+    assert keys.missing(Book, book_row(4, "")) is None  # left to the schema
+    keys.add(Library.__table__, [3])
+    assert keys.missing(Book, book_row(5, "3")) is None
+    assert statements == ["SELECT"]
+
+
+def test_rows_with_missing_parents_are_rejected(make_session, tmp_path, caplog):
+    session = make_session()
+    session.add(Library(**library(1).model_dump()))
+    session.commit()
+    write_csv(tmp_path / "books.csv", [book_row(1, 1), book_row(2, 3), book_row(3, "x"), book_row(4, 1)])
+
+    process_file("books.csv", Book, BookSchema, str(tmp_path), session)
+    assert list(session.scalars(select(Book.book_id).order_by(Book.book_id))) == [1, 4]
+    assert "Book skipped - library_id 3 does not exist in DB." in caplog.messages
+    assert "Book skipped - library_id x does not exist in DB." in caplog.messages
+
+
+def test_failing_chunk_is_rolled_back_without_losing_earlier_chunks(tmp_path, monkeypatch):
+    write_csv(tmp_path / "libraries.csv", [library(i).model_dump() for i in range(1, 6)])
+    write_csv(tmp_path / "books.csv", [book_row(1, 1), book_row(2, 3)])
+    insert, calls = data_processor.insert_validated_data, []
+
+    def insert_then_fail_second_chunk(session, model, objects, *args):
+        calls.append(model)
+        result = insert(session, model, objects, *args)
+        if model is Library and len(calls) == 2:
+            raise IntegrityError("INSERT INTO libraries", None, Exception("connection lost"))
+        return result
+
+    monkeypatch.setattr(data_processor, "insert_validated_data", insert_then_fail_second_chunk)
+    database = f"sqlite:///{tmp_path / 'library.db'}"
+    monkeypatch.setattr("sys.argv", ["data_processor.py", "--directory", str(tmp_path), "--db", database,
+                                     "--chunk-size", "2"])
+    data_processor.main()
+
+    with create_engine(database).connect() as connection:
+        # Chunk 1 was committed before chunk 2 failed; chunk 3 never ran
+        assert list(connection.scalars(select(Library.library_id).order_by(Library.library_id))) == [1, 2]
+        # Library 3 was rolled back, so its book is rejected
+        assert list(connection.scalars(select(Book.book_id))) == [1]
+
+
+def test_forgotten_parent_keys_are_reloaded_after_a_rollback(make_session):
+    session = make_session()
+    keys = ParentKeys(session)
+    keys.get(Library.__table__)
+    insert_validated_data(session, Library, [library(1)], parent_keys=keys)
+    assert keys.missing(Book, book_row(1, "1")) is None
+
+    session.rollback()
+    keys.forget(Library.__table__)
+    assert keys.missing(Book, book_row(1, "1")) == ("library_id", "1")
@@ -0,0 +1,40 @@
+import logging
+import pickle
+
+import pytest
+
+from data_processor import validate_chunk
+from schemas import LibrarySchema, ValidationTracker, normalize_phone, validate_and_log
+
+
+@pytest.fixture(autouse=True)
+def empty_phone_cache():
+    normalize_phone.cache_clear()
+
+
+def library_row(library_id, phone_number):
+    return {"library_id": library_id, "name": "Main Library", "campus_location": "North Campus",
+            "contact_email": "contact@mainlib.edu", "phone_number": phone_number}
+
+
+def test_phone_cache_hits_and_misses_are_counted():
+    tracker = ValidationTracker()
+    for library_id, phone in enumerate(["+14155550101", "+14155550101", "12345", "+14155550101", "12345"]):
+        validate_and_log(LibrarySchema, library_row(library_id, phone), tracker)
+    tracker.capture_phone_cache()
+    assert (tracker.valid, tracker.invalid) == (3, 2)
+    assert (tracker.phone_hits, tracker.phone_misses) == (3, 2)
+
+
+def test_worker_phone_cache_counts_are_merged(caplog):
+    caplog.set_level(logging.INFO, logger="data_validation")
+    rows = [(library_row(i, "+14155550101"), None) for i in range(4)]
+    validated, chunk_tracker, _ = pickle.loads(pickle.dumps(validate_chunk(LibrarySchema, rows)))
+    assert len(validated) == 4
+
+    tracker = ValidationTracker()
+    tracker.merge(chunk_tracker)
+    tracker.merge(chunk_tracker)
+    assert (tracker.phone_hits, tracker.phone_misses) == (6, 2)
+    tracker.report("LibrarySchema")
+    assert any("6 hits, 2 misses (75.0% hit rate)" in message for message in caplog.messages)
@@ -0,0 +1,89 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Avg, CharField, Count, F, Q, Sum, Value, Window
+from django.db.models.functions import Cast, Concat, DenseRank, Round
+from django.utils import timezone
+
+from .models import BookAuthor, Borrowing, Library, Review
+
+# Read-only reports behind /api/analytics/ (they replace the hand-run
+# queries in phase1-sql/queries.sql and extra_questions.sql).
+#
+# Every report is a single values() queryset: joins, GROUP BY, ranking
+# (DENSE_RANK() OVER ...) and LIMIT all run in the database, and only the
+# final rows reach Python. `start`/`end` are inclusive dates; they are
+# turned into a half-open datetime range so the date columns' indexes are
+# used.
+
+
+def _full_name(prefix=''):
+    return Concat(f'{prefix}first_name', Value(' '), f'{prefix}last_name')
+
+
+def _datetime_range(field, start, end):
+    lookups = {}
+    tz = timezone.get_current_timezone()
+    if start:
+        lookups[f'{field}__gte'] = timezone.make_aware(datetime.combine(start, time.min), tz)
+    if end:
+        lookups[f'{field}__lt'] = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz)
+    return lookups
+
+
+# Q1. Books with their authors and categories
+def books_with_authors(limit, **params):
+    return BookAuthor.objects.values(
+        'book_id',
+        isbn=F('book__isbn'),
+        book_title=F('book__title'),
+        author_name=_full_name('author__'),
+        category=F('book__categories__name'),
+    ).order_by('book_id', 'author_name', 'category')[:limit]
+
+
+# Q2. Most borrowed books in a date window, densely ranked
+def most_borrowed(limit, start=None, end=None):
+    return Borrowing.objects.filter(**_datetime_range('borrow_date', start, end)).values('book_id').annotate(
+        isbn=F('book__isbn'),
+        book_title=F('book__title'),
+        borrowing_times=Count('pk'),
+        priority=Window(DenseRank(), order_by=Count('pk').desc()),
+    ).order_by('priority', 'book_id')[:limit]
+
+
+# Q3. Members with overdue books and/or late fees
+def overdue_members(limit, start=None, end=None):
+    overdue = Q(return_date__isnull=True, due_date__lt=timezone.now())
+    return Borrowing.objects.filter(
+        Q(late_fee__gt=0) | overdue, **_datetime_range('due_date', start, end)
+    ).values('member_id').annotate(
+        name=_full_name('member__'),
+        email=F('member__email'),
+        phone=Cast('member__phone__number', CharField()),  # plain string, not a PhoneNumber
+        member_type=F('member__member_type'),
+        overdue_books=Count('pk', filter=overdue),
+        fine=Sum('late_fee'),
+        rank=Window(DenseRank(), order_by=Sum('late_fee').desc()),
+    ).order_by('rank', 'member_id')[:limit]
+
+
+# Q4. Average rating per author, over the reviews of all their books
+def author_ratings(limit, start=None, end=None):
+    return Review.objects.filter(
+        book__authors__isnull=False, **_datetime_range('review_date', start, end)
+    ).values(author_id=F('book__authors__author_id')).annotate(
+        author_name=_full_name('book__authors__'),
+        review_count=Count('pk'),
+        avg_rating=Round(Avg('rating'), 2),
+        rank=Window(DenseRank(), order_by=Avg('rating').desc()),
+    ).order_by('rank', 'author_id')[:limit]
+
+
+# Q5. Stock per library (copies are counted on the books it holds)
+def library_stock(limit, **params):
+    return Library.objects.values('library_id', library_name=F('name')).annotate(
+        titles=Count('book_set'),
+        total_copies=Sum('book_set__total_copies', default=0),
+        available_copies=Sum('book_set__available_copies', default=0),
+        out_of_stock=Count('book_set', filter=Q(book_set__available_copies=0)),
+    ).order_by('library_id')[:limit]
@@ -0,0 +1,141 @@
+from django.views import View
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .cache import cached_response
+from .conditional import conditional_response
+from .pagination import KeysetCursorPagination
+from .views import AuthorViewSet, BookViewSet, CategoryViewSet, LibraryViewSet
+
+# Async read path for the catalog (GET /api/async/<libraries|authors|
+# categories|books>/[<pk>/]), for deployments served through lms.asgi.
+#
+# Same querysets, serializers, envelopes, keyset pagination, ETags and
+# catalog cache as the DRF viewsets, but the database work is awaited
+# (aiterator/aget/aexists/aaggregate) so an ASGI worker keeps serving other
+# requests meanwhile instead of parking a thread per request. Serializers
+# run after every relation has been prefetched, so they never touch the
+# database (a lazy query would raise SynchronousOnlyOperation here).
+
+
+class AsyncCatalogView(View):
+    http_method_names = ['get', 'head', 'options']
+    viewset = None  # DRF viewset whose queryset/serializer are reused
+    list_message = None
+    empty_message = None  # 404 message for an empty list, if the viewset has one
+    not_found_message = None
+    wrap_detail = False  # detail payload inside the status/message/data envelope
+    detail_message = None
+    lookup_field = 'pk'
+    lookup_url_kwarg = None
+
+    @property
+    def queryset(self):
+        return self.viewset.queryset
+
+    def get_queryset(self):
+        return self.viewset().get_queryset()
+
+    async def get(self, request, pk=None):
+        request = Request(request)
+        if pk is None:
+            response = await self.list(request)
+        else:
+            response = await self.retrieve(request, pk=pk)
+        # Rendered by Django's handler like any other template response
+        response.accepted_renderer = JSONRenderer()
+        response.accepted_media_type = JSONRenderer.media_type
+        response.renderer_context = {'request': request, 'view': self}
+        return response
+
+    async def _list(self, request):
+        queryset = self.get_queryset()
+        if self.empty_message and not await queryset.aexists():
+            return self._error(self.empty_message, status.HTTP_404_NOT_FOUND)
+        paginator = KeysetCursorPagination()
+        page = await paginator.apaginate_queryset(queryset, request)
+        data = self.viewset.serializer_class(page, many=True, context={'request': request}).data
+        return paginator.get_paginated_response(data, self.list_message)
+
+    async def _retrieve(self, request, pk):
+        try:
+            instance = await self.get_queryset().aget(pk=pk)
+        except self.queryset.model.DoesNotExist:
+            return self._error(self.not_found_message, status.HTTP_404_NOT_FOUND)
+        data = self.viewset.serializer_class(instance, context={'request': request}).data
+        if self.wrap_detail:
+            return Response({"status": "success", "message": self.detail_message, "data": data})
+        return Response(data)
+
+    def _error(self, message, code):
+        return Response({"status": "error", "message": message, "code": code}, status=code)
+
+
+class AsyncLibraryView(AsyncCatalogView):
+    viewset = LibraryViewSet
+    list_message = "Libraries retrieved successfully."
+    empty_message = "No libraries available."
+    not_found_message = "Library not found."
+
+    @conditional_response('library')
+    @cached_response('library')
+    async def list(self, request):
+        return await self._list(request)
+
+    @conditional_response('library')
+    @cached_response('library')
+    async def retrieve(self, request, pk):
+        return await self._retrieve(request, pk)
+
+
+class AsyncAuthorView(AsyncCatalogView):
+    viewset = AuthorViewSet
+    list_message = "Authors retrieved successfully."
+    not_found_message = "Author not found."
+    wrap_detail = True
+    detail_message = "Author retrieved successfully."
+
+    @conditional_response('author')
+    @cached_response('author')
+    async def list(self, request):
+        return await self._list(request)
+
+    @conditional_response('author')
+    @cached_response('author')
+    async def retrieve(self, request, pk):
+        return await self._retrieve(request, pk)
+
+
+class AsyncCategoryView(AsyncCatalogView):
+    viewset = CategoryViewSet
+    list_message = "Categories retrieved successfully."
+    empty_message = "No categories available."
+    not_found_message = "Category not found."
+
+    @conditional_response('category')
+    @cached_response('category')
+    async def list(self, request):
+        return await self._list(request)
+
+    @conditional_response('category')
+    @cached_response('category')
+    async def retrieve(self, request, pk):
+        return await self._retrieve(request, pk)
+
+
+class AsyncBookView(AsyncCatalogView):
+    viewset = BookViewSet
+    list_message = "Books retrieved successfully."
+    not_found_message = "Book not found."
+
+    @conditional_response('book')
+    @cached_response('book')
+    async def list(self, request):
+        return await self._list(request)
+
+    @conditional_response('book')
+    @cached_response('book')
+    async def retrieve(self, request, pk):
+        return await self._retrieve(request, pk)
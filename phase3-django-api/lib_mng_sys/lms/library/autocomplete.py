@@ -0,0 +1,293 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+from django.conf import settings
+
+from .models import Author, Book, Category
+
+# In-process type-ahead index over book titles, author names and category
+# names, served by /api/autocomplete/ without touching the database.
+#
+# Every label gets a slot; a slot's kind and object id live in flat
+# arrays. Prefix matching uses one sorted array of packed (slot, word
+# offset) integers ordered by the label text from that word on, so "tag"
+# finds "Rabindranath Tagore" by bisection. Infix matching uses trigram
+# posting arrays (trigram -> slots). No per-word strings are stored, which
+# keeps 1M titles in a few hundred MB.
+#
+# The index is built on first use (AppConfig.ready() must not query the
+# database) and kept current by the receivers in signals.py. Each process
+# has its own copy, so it is also rebuilt in the background every
+# AUTOCOMPLETE_REBUILD_INTERVAL seconds to pick up other workers' writes.
+# Writes that land while a build scans the database are recorded and
+# replayed on the new index before it replaces the serving one.
+
+KINDS = ('book', 'author', 'category')
+
+# Word offsets are packed into the low 8 bits of a prefix entry
+OFFSET_BITS = 8
+MAX_OFFSET = (1 << OFFSET_BITS) - 1
+
+# Batches larger than this trigger a rebuild instead of incremental inserts
+REBUILD_THRESHOLD = 1000
+
+
+def normalize(text):
+    return ' '.join(str(text or '').casefold().split())
+
+
+def _word_offsets(label):
+    return [i for i in range(min(len(label), MAX_OFFSET + 1)) if i == 0 or label[i - 1] == ' ']
+
+
+def _trigrams(label):
+    return {label[i:i + 3] for i in range(len(label) - 2)}
+
+
+def book_label(book):
+    return book.title
+
+
+def author_label(author):
+    return f"{author.first_name} {author.last_name}"
+
+
+def category_label(category):
+    return category.name
+
+
+# kind -> (model, label function, values_list fields for a full build)
+SOURCES = {
+    'book': (Book, book_label, ('pk', 'title')),
+    'author': (Author, author_label, ('pk', 'first_name', 'last_name')),
+    'category': (Category, category_label, ('pk', 'name')),
+}
+
+
+class AutocompleteIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.labels = []            # display label per slot, None when free
+        self.normalized = []        # normalized label per slot
+        self.kinds = array('b')     # index into KINDS per slot
+        self.object_ids = array('q')
+        self.slots = {kind: {} for kind in KINDS}  # object_id -> slot, per kind
+        self.free = []
+        self.prefixes = array('q')  # slot << OFFSET_BITS | offset, sorted by text
+        self.trigrams = {}          # trigram -> array('i') of slots
+        self.built_at = None
+
+    def __len__(self):
+        return sum(len(slots) for slots in self.slots.values())
+
+    def _prefix_text(self, packed):
+        return self.normalized[packed >> OFFSET_BITS][packed & MAX_OFFSET:]
+
+    def _allocate(self, kind, object_id, label):
+        text = normalize(label)
+        if self.free:
+            slot = self.free.pop()
+            self.labels[slot], self.normalized[slot] = label, text
+            self.kinds[slot], self.object_ids[slot] = KINDS.index(kind), object_id
+        else:
+            slot = len(self.labels)
+            self.labels.append(label)
+            self.normalized.append(text)
+            self.kinds.append(KINDS.index(kind))
+            self.object_ids.append(object_id)
+        self.slots[kind][object_id] = slot
+        return slot, text
+
+    @classmethod
+    def build(cls, entries):
+        # entries: iterable of (kind, object_id, label)
+        index = cls()
+        prefixes = array('q')
+        for kind, object_id, label in entries:
+            slot, text = index._allocate(kind, object_id, label)
+            prefixes.extend(slot << OFFSET_BITS | offset for offset in _word_offsets(text))
+            for gram in _trigrams(text):
+                index.trigrams.setdefault(gram, array('i')).append(slot)
+        index.prefixes = array('q', sorted(prefixes, key=index._prefix_text))
+        index.built_at = time.monotonic()
+        return index
+
+    def add(self, kind, object_id, label):
+        with self._lock:
+            self.remove(kind, object_id)
+            slot, text = self._allocate(kind, object_id, label)
+            for offset in _word_offsets(text):
+                insort(self.prefixes, slot << OFFSET_BITS | offset, key=self._prefix_text)
+            for gram in _trigrams(text):
+                self.trigrams.setdefault(gram, array('i')).append(slot)
+
+    def remove(self, kind, object_id):
+        with self._lock:
+            slot = self.slots[kind].pop(object_id, None)
+            if slot is None:
+                return
+            text = self.normalized[slot]
+            for offset in _word_offsets(text):
+                # Entries with the same text are adjacent; a missing one is skipped
+                packed = slot << OFFSET_BITS | offset
+                start = bisect_left(self.prefixes, text[offset:], key=self._prefix_text)
+                end = bisect_right(self.prefixes, text[offset:], key=self._prefix_text)
+                for pos in range(start, end):
+                    if self.prefixes[pos] == packed:
+                        del self.prefixes[pos]
+                        break
+            for gram in _trigrams(text):
+                postings = self.trigrams.get(gram)
+                if postings is not None and slot in postings:
+                    postings.remove(slot)
+                    if not postings:
+                        del self.trigrams[gram]
+            self.labels[slot] = self.normalized[slot] = None
+            self.free.append(slot)
+
+    def search(self, query, limit=10, kinds=None):
+        query = normalize(query)
+        if not query:
+            return []
+        kind_ids = {KINDS.index(kind) for kind in kinds or KINDS}
+        scan_limit = limit * 8
+
+        with self._lock:
+            # 1. Word prefixes: whole-label matches first, then shorter labels
+            matches, seen = [], set()
+            pos = bisect_left(self.prefixes, query, key=self._prefix_text)
+            end = min(len(self.prefixes), pos + scan_limit)
+            while pos < end:
+                packed = self.prefixes[pos]
+                slot, offset = packed >> OFFSET_BITS, packed & MAX_OFFSET
+                if not self.normalized[slot].startswith(query, offset):
+                    break
+                if slot not in seen and self.kinds[slot] in kind_ids:
+                    seen.add(slot)
+                    matches.append((offset > 0, len(self.normalized[slot]), slot))
+                pos += 1
+            matches.sort()
+            slots = [slot for _, _, slot in matches[:limit]]
+
+            # 2. Substrings, through the rarest trigram of the query
+            grams = _trigrams(query)
+            if len(slots) < limit and grams:
+                postings = [self.trigrams.get(gram) for gram in grams]
+                if all(postings):
+                    for slot in min(postings, key=len)[:scan_limit * 4]:
+                        if (slot not in seen and self.kinds[slot] in kind_ids
+                                and query in self.normalized[slot]):
+                            seen.add(slot)
+                            slots.append(slot)
+                            if len(slots) == limit:
+                                break
+
+            return [
+                {"type": KINDS[self.kinds[slot]], "id": self.object_ids[slot], "label": self.labels[slot]}
+                for slot in slots
+            ]
+
+
+def load_entries():
+    for kind, (model, label, fields) in SOURCES.items():
+        for row in model._default_manager.order_by().values_list(*fields).iterator():
+            if kind == 'author':
+                yield kind, row[0], f"{row[1]} {row[2]}"
+            else:
+                yield kind, row[0], row[1]
+
+
+_index = None
+_pending = None  # changes made while a build scans the database
+_build_lock = threading.Lock()  # one full build at a time
+_swap_lock = threading.Lock()   # guards _index and _pending
+_rebuilding = threading.Event()
+
+
+def _build():
+    # Full build from the database. Changes applied during the scan are
+    # also recorded in _pending and replayed on the new index before it is
+    # installed, so a write committed mid-scan is never lost.
+    global _index, _pending
+    with _swap_lock:
+        _pending = []
+    index = None
+    try:
+        index = AutocompleteIndex.build(load_entries())
+    finally:
+        with _swap_lock:
+            if index is not None:
+                for change in _pending:
+                    change(index)
+                _index = index
+            _pending = None
+
+
+def _apply(change):
+    # change(index) updates the serving index, if any, and any index being built
+    with _swap_lock:
+        if _pending is not None:
+            _pending.append(change)
+        index = _index
+    if index is not None:
+        change(index)
+
+
+def get_index():
+    if _index is None:
+        with _build_lock:
+            if _index is None:
+                _build()
+    interval = getattr(settings, 'AUTOCOMPLETE_REBUILD_INTERVAL', 300)
+    if interval and time.monotonic() - _index.built_at > interval:
+        schedule_rebuild()
+    return _index
+
+
+def _rebuild():
+    try:
+        with _build_lock:
+            _build()
+    finally:
+        _rebuilding.clear()
+
+
+def schedule_rebuild():
+    # Rebuild in a background thread; the current index keeps serving.
+    # Returns whether a rebuild was started.
+    if _index is None or _rebuilding.is_set():
+        return False
+    _rebuilding.set()
+    threading.Thread(target=_rebuild, name='autocomplete-rebuild', daemon=True).start()
+    return True
+
+
+def index_objects(kind, objects):
+    # Called (after commit) with saved Book/Author/Category instances.
+    # Before the first build there is nothing to update: it reads them.
+    if len(objects) > REBUILD_THRESHOLD and schedule_rebuild():
+        return
+    label = SOURCES[kind][1]
+    entries = [(obj.pk, label(obj)) for obj in objects]
+
+    def change(index):
+        for object_id, text in entries:
+            index.add(kind, object_id, text)
+    _apply(change)
+
+
+def unindex_objects(kind, object_ids):
+    object_ids = list(object_ids)
+
+    def change(index):
+        for object_id in object_ids:
+            index.remove(kind, object_id)
+    _apply(change)
+
+
+def reset():
+    global _index
+    with _build_lock, _swap_lock:
+        _index = None
@@ -0,0 +1,213 @@
+import hashlib
+import inspect
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+from rest_framework.response import Response
+
+from . import routers
+
+# Read-through cache for the catalog endpoints (libraries, categories,
+# authors, books) and the analytics reports.
+#
+# Cached payloads live in the Django cache alias CATALOG_CACHE_ALIAS
+# (locmem by default, which is a size-bounded LRU; point it at Redis or
+# memcached in settings to share it between workers). Keys carry a
+# per-resource generation number: a write bumps the generation of every
+# resource whose payload embeds the changed model, so stale entries are
+# never read again and simply age out of the LRU.
+
+# Which cached resources embed which models. LibrarySerializer nests books
+# with their authors and categories, CategorySerializer nests books with
+# authors, AuthorSerializer nests books with categories and BookSerializer
+# lists libraries, authors, categories and the book's stats.
+RESOURCE_DEPENDENCIES = {
+    'library': {'Library', 'Address', 'ContactNumber', 'Book', 'Author', 'Category',
+                'BookLibrary', 'BookAuthor', 'BookCategory'},
+    'category': {'Category', 'Book', 'Author', 'BookCategory', 'BookAuthor'},
+    'author': {'Author', 'Book', 'Category', 'BookAuthor', 'BookCategory'},
+    'book': {'Book', 'BookStats', 'Library', 'Author', 'Category', 'BookLibrary', 'BookAuthor', 'BookCategory'},
+    # /api/analytics/ reports aggregate circulation and reviews as well
+    'analytics': {'Book', 'BookStats', 'Library', 'Author', 'Category', 'BookLibrary', 'BookAuthor',
+                  'BookCategory', 'Borrowing', 'Review', 'Member', 'ContactNumber', 'DailyCirculation'},
+}
+
+# Models whose writes invalidate at least one resource
+WATCHED_MODELS = set().union(*RESOURCE_DEPENDENCIES.values())
+
+
+class CatalogCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {resource: {'hits': 0, 'misses': 0} for resource in RESOURCE_DEPENDENCIES}
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'CATALOG_CACHE_ENABLED', True)
+
+    @property
+    def backend(self):
+        return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'catalog')]
+
+    def _generation_key(self, resource):
+        return f"catalog:gen:{resource}"
+
+    def _written_key(self, resource):
+        return f"catalog:written:{resource}"
+
+    def recently_written(self, resource):
+        # Invalidated within routers.replica_staleness_window() (the key's TTL)
+        return self.backend.get(self._written_key(resource)) is not None
+
+    async def arecently_written(self, resource):
+        return await self.backend.aget(self._written_key(resource)) is not None
+
+    def generation(self, resource):
+        # Seeded from the clock so a generation key that was evicted never
+        # restarts at a number older entries were stored under
+        return self.backend.get_or_set(self._generation_key(resource), time.time_ns, timeout=None)
+
+    def make_key(self, resource, request):
+        return self._key(resource, self.generation(resource), request)
+
+    def _key(self, resource, generation, request):
+        # Absolute URI: paginated payloads embed absolute next/previous links
+        uri = request.build_absolute_uri().encode('utf-8')
+        digest = hashlib.md5(uri, usedforsecurity=False).hexdigest()
+        return f"catalog:{resource}:{generation}:{digest}"
+
+    def get(self, key, resource):
+        value = self.backend.get(key)
+        self._count(resource, value)
+        return value
+
+    def _count(self, resource, value):
+        with self._lock:
+            self._stats[resource]['hits' if value is not None else 'misses'] += 1
+
+    def set(self, key, resource, value):
+        self.backend.set(key, value, timeout=self._timeout(resource))
+
+    def _timeout(self, resource):
+        ttls = getattr(settings, 'CATALOG_CACHE_TTLS', {})
+        return ttls.get(resource, DEFAULT_TIMEOUT)
+
+    # Async counterparts for the async views (async_views.py), through the
+    # cache backend's a* methods
+    async def amake_key(self, resource, request):
+        generation = await self.backend.aget_or_set(self._generation_key(resource), time.time_ns, timeout=None)
+        return self._key(resource, generation, request)
+
+    async def aget(self, key, resource):
+        value = await self.backend.aget(key)
+        self._count(resource, value)
+        return value
+
+    async def aset(self, key, resource, value):
+        await self.backend.aset(key, value, timeout=self._timeout(resource))
+
+    def bump(self, resource):
+        key = self._generation_key(resource)
+        try:
+            self.backend.incr(key)
+        except ValueError:
+            # Not cached yet or evicted: a fresh clock seed is already new
+            self.backend.add(key, time.time_ns(), timeout=None)
+        # Start of the window in which replicas may lag behind this write
+        if getattr(settings, 'REPLICA_DATABASES', None):
+            self.backend.set(self._written_key(resource), True, timeout=routers.replica_staleness_window())
+
+    def invalidate_model(self, model_name):
+        resources = [r for r, deps in RESOURCE_DEPENDENCIES.items() if model_name in deps]
+        for resource in resources:
+            self.bump(resource)
+
+        # Bump again once the transaction commits, so a reader that cached
+        # the pre-commit rows in between cannot keep serving them
+        if resources and transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: [self.bump(r) for r in resources])
+
+    def stats(self):
+        with self._lock:
+            per_resource = {r: dict(counts) for r, counts in self._stats.items()}
+        hits = sum(c['hits'] for c in per_resource.values())
+        misses = sum(c['misses'] for c in per_resource.values())
+        lookups = hits + misses
+        return {
+            'backend': self.backend.__class__.__name__,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'resources': per_resource,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            for counts in self._stats.values():
+                counts['hits'] = counts['misses'] = 0
+
+    def clear(self):
+        self.backend.clear()
+        self.reset_stats()
+
+
+catalog_cache = CatalogCache()
+
+
+def cached_response(resource):
+    # Decorator for ViewSet list/retrieve: serve a cached 200 payload or
+    # build, store and return it. Marks the response with X-Cache: HIT/MISS.
+    def decorator(view_method):
+        if inspect.iscoroutinefunction(view_method):
+            return _async_cached(view_method, resource)
+
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if not catalog_cache.enabled:
+                return view_method(self, request, *args, **kwargs)
+
+            key = catalog_cache.make_key(resource, request)
+            data = catalog_cache.get(key, resource)
+            if data is not None:
+                response = Response(data)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            # A fill right after a write must not come from a lagging replica
+            if catalog_cache.recently_written(resource):
+                routers.pin_to_primary()
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                catalog_cache.set(key, resource, response.data)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def _async_cached(view_method, resource):
+    @wraps(view_method)
+    async def wrapper(self, request, *args, **kwargs):
+        if not catalog_cache.enabled:
+            return await view_method(self, request, *args, **kwargs)
+
+        key = await catalog_cache.amake_key(resource, request)
+        data = await catalog_cache.aget(key, resource)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        if await catalog_cache.arecently_written(resource):
+            routers.pin_to_primary()
+        response = await view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            await catalog_cache.aset(key, resource, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+    return wrapper
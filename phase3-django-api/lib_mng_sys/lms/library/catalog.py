@@ -0,0 +1,214 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import autocomplete
+from .cache import catalog_cache
+from .models import Author, Book, BookAuthor, BookCategory, BookLibrary, BookStats, Category, Library
+
+# Batched catalog writes used by BookSerializer and the bulk books endpoint.
+#
+# Authors and categories are matched case-insensitively (authors on first
+# name, last name and birth date, categories on name). Every reference in
+# a request is resolved with one SELECT per model, the missing rows are
+# inserted with a single bulk_create and read back, so the number of
+# queries does not grow with the number of books, authors or categories.
+
+# Maximum books per bulk upsert request
+BULK_LIMIT = 1000
+
+# Book columns overwritten when an ISBN already exists. available_copies
+# of an existing book is derived as total_copies minus its open loans
+# (BookStats.active_borrows), never taken from the request.
+UPSERT_FIELDS = ['title', 'publication_date', 'total_copies', 'available_copies']
+
+
+def _error(message):
+    return ValidationError({"status": "error", "message": message, "code": 400})
+
+
+def _index_on_commit(kind, objects):
+    # bulk_create/bulk_update send no post_save, so feed the autocomplete
+    # index here; re-indexing an unchanged label is harmless
+    transaction.on_commit(lambda: autocomplete.index_objects(kind, objects))
+
+
+def author_key(author_data):
+    return (author_data['first_name'].lower(), author_data['last_name'].lower(), author_data['birth_date'])
+
+
+def category_key(cat_data):
+    return cat_data['name'].lower()
+
+
+def library_key(lib_data):
+    if lib_data.get('library_id'):
+        return int(lib_data['library_id'])
+    return str(lib_data.get('name', '')).strip()
+
+
+def _existing_authors(wanted):
+    authors = Author.objects.annotate(
+        first_lower=Lower('first_name'), last_lower=Lower('last_name')
+    ).filter(
+        first_lower__in={key[0] for key in wanted},
+        last_lower__in={key[1] for key in wanted},
+        birth_date__in={key[2] for key in wanted},
+    ).order_by()
+    found = {}
+    for author in authors:
+        key = (author.first_lower, author.last_lower, author.birth_date)
+        if key in wanted:
+            found.setdefault(key, author)
+    return found
+
+
+def resolve_authors(author_list):
+    # Returns {author_key: Author}, creating the authors that do not exist
+    wanted = {author_key(a): a for a in author_list}
+    if not wanted:
+        return {}
+    found = _existing_authors(wanted)
+    missing = [
+        Author(
+            first_name=data['first_name'], last_name=data['last_name'], birth_date=data['birth_date'],
+            biography=data.get('biography') or '',
+            **({'nationality': data['nationality']} if data.get('nationality') else {}),
+        )
+        for key, data in wanted.items() if key not in found
+    ]
+    if missing:
+        # ignore_conflicts: a concurrent request may have just created one
+        Author.objects.bulk_create(missing, ignore_conflicts=True)
+        catalog_cache.invalidate_model('Author')
+        found = _existing_authors(wanted)
+        _index_on_commit('author', list(found.values()))
+    return found
+
+
+def _existing_categories(wanted):
+    categories = Category.objects.annotate(name_lower=Lower('name')).filter(name_lower__in=wanted).order_by()
+    found = {}
+    for category in categories:
+        found.setdefault(category.name_lower, category)
+    return found
+
+
+def resolve_categories(category_list):
+    # Returns {category_key: Category}, creating the categories that do not exist
+    wanted = {category_key(c): c for c in category_list}
+    if not wanted:
+        return {}
+    found = _existing_categories(wanted)
+    missing = [
+        Category(name=data['name'], description=data.get('description') or '')
+        for key, data in wanted.items() if key not in found
+    ]
+    if missing:
+        Category.objects.bulk_create(missing, ignore_conflicts=True)
+        catalog_cache.invalidate_model('Category')
+        found = _existing_categories(wanted)
+        _index_on_commit('category', list(found.values()))
+    return found
+
+
+def resolve_libraries(lib_list):
+    # Libraries must already exist (they need an address and phone), so
+    # they are only looked up, by id or name, in a single query
+    keys = set()
+    for lib_data in lib_list:
+        key = library_key(lib_data)
+        if not key:
+            raise ValidationError("Library id or name is required.")
+        keys.add(key)
+    ids = {key for key in keys if isinstance(key, int)}
+    names = keys - ids
+
+    found = {}
+    for library in Library.objects.filter(Q(library_id__in=ids) | Q(name__in=names)).order_by():
+        if library.library_id in ids:
+            found[library.library_id] = library
+        if library.name in names:
+            found[library.name] = library
+    missing = keys - set(found)
+    if missing:
+        raise ValidationError(f"Library not found: {', '.join(sorted(str(m) for m in missing))}.")
+    return found
+
+
+def bulk_upsert_books(items):
+    # items: validated BulkBookItemSerializer data. Books are matched on
+    # ISBN: new ones are inserted, existing ones get UPSERT_FIELDS
+    # overwritten. Author/category/library links are only ever added.
+    isbns = [item['isbn'] for item in items]
+    duplicates = sorted(isbn for isbn, n in Counter(isbns).items() if n > 1)
+    if duplicates:
+        raise _error(f"Duplicate ISBN in batch: {', '.join(duplicates)}.")
+
+    libraries = resolve_libraries([lib for item in items for lib in item['libraries']])
+    now = timezone.now()
+
+    with transaction.atomic():
+        authors = resolve_authors([a for item in items for a in item['authors']])
+        categories = resolve_categories([c for item in items for c in item['categories']])
+
+        existing = Book.objects.select_for_update().in_bulk(isbns, field_name='isbn')
+        on_loan = dict(
+            BookStats.objects.filter(book__in=existing.values()).values_list('book_id', 'active_borrows')
+        )
+        books, new_books, updated = [], [], []
+        for item in items:
+            book = existing.get(item['isbn'])
+            if book is None:
+                book = Book(isbn=item['isbn'])
+                new_books.append(book)
+            else:
+                book.updated_at = now  # bulk_update skips auto_now
+                updated.append(book)
+            for field in UPSERT_FIELDS:
+                setattr(book, field, item[field])
+            if book.pk is not None:
+                loans = on_loan.get(book.pk, 0)
+                if book.total_copies < loans:
+                    raise _error(f"Book {book.isbn} has {loans} copies on loan; total_copies cannot be lower.")
+                book.available_copies = book.total_copies - loans
+            books.append(book)
+
+        Book.objects.bulk_update(updated, UPSERT_FIELDS + ['updated_at'])
+        created = Book.objects.bulk_create(new_books)
+        if created and created[0].pk is None:
+            # MySQL does not return ids from a bulk insert; isbn is unique
+            ids = dict(Book.objects.filter(isbn__in=[b.isbn for b in created]).values_list('isbn', 'pk'))
+            for book in created:
+                book.pk = ids[book.isbn]
+        BookStats.objects.bulk_create([BookStats(book_id=book.pk) for book in created])
+
+        book_authors, book_categories, book_libraries = set(), set(), set()
+        for book, item in zip(books, items):
+            book_authors.update((book.pk, authors[author_key(a)].pk) for a in item['authors'])
+            book_categories.update((book.pk, categories[category_key(c)].pk) for c in item['categories'])
+            book_libraries.update((book.pk, libraries[library_key(lib)].pk) for lib in item['libraries'])
+
+        # Links that already exist are skipped by the unique constraints
+        BookAuthor.objects.bulk_create(
+            [BookAuthor(book_id=b, author_id=a) for b, a in book_authors], ignore_conflicts=True)
+        BookCategory.objects.bulk_create(
+            [BookCategory(book_id=b, category_id=c) for b, c in book_categories], ignore_conflicts=True)
+        BookLibrary.objects.bulk_create(
+            [BookLibrary(book_id=b, library_id=lib) for b, lib in book_libraries], ignore_conflicts=True)
+
+        # bulk_create/bulk_update send no signals; every catalog resource
+        # embeds books (and their links), so one Book invalidation covers them
+        catalog_cache.invalidate_model('Book')
+        _index_on_commit('book', books)
+
+    new_ids = {id(book) for book in new_books}
+    return [
+        {"index": index, "status": "created" if id(book) in new_ids else "updated",
+         "book_id": book.pk, "isbn": book.isbn}
+        for index, book in enumerate(books)
+    ]
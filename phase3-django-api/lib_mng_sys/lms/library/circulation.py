@@ -0,0 +1,227 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, PositiveIntegerField, When
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import stats
+from .cache import catalog_cache
+from .models import Book, Borrowing, Member
+
+# Borrow/return engine used by BorrowingSerializer.
+#
+# Copies are never read-modify-written in Python. A checkout is a
+# conditional "UPDATE book SET available_copies = available_copies - 1
+# WHERE book_id = %s AND available_copies > 0": if it touches no row the
+# book is out of stock, so concurrent checkouts can never oversell. The
+# member row is locked (SELECT ... FOR UPDATE) for the rest of the
+# transaction, which serializes that member's checkouts so the borrow
+# limit and duplicate checks cannot race either.
+
+# Maximum concurrent borrows per member
+BORROW_LIMIT = 10
+
+
+def _error(message):
+    return ValidationError({"status": "error", "message": message, "code": 400})
+
+
+def _adjust_copies(book_id, delta):
+    # Returns the number of rows updated (0 when no copy is available)
+    books = Book.objects.filter(pk=book_id)
+    if delta < 0:
+        books = books.filter(available_copies__gte=-delta)
+    updated = books.update(available_copies=F('available_copies') + delta, updated_at=timezone.now())
+    if updated:
+        # queryset.update() sends no post_save, so invalidate explicitly
+        catalog_cache.invalidate_model('Book')
+    return updated
+
+
+def borrow_book(member, book, **fields):
+    with transaction.atomic():
+        Member.objects.select_for_update().only('pk').get(pk=member.pk)
+
+        active = Borrowing.objects.filter(member=member, return_date__isnull=True).count()
+        if active >= BORROW_LIMIT:
+            raise _error(f"Member has reached borrowing limit ({BORROW_LIMIT}).")
+        # (member, book) is unique in borrowing, returned or not
+        previous = Borrowing.objects.filter(member=member, book=book).only('return_date').first()
+        if previous is not None:
+            raise _error("This book is already borrowed by the member and not returned." if previous.return_date is None
+                         else "This book was already borrowed by the member before.")
+
+        if not _adjust_copies(book.pk, -1):
+            raise _error(f"The book '{book.title}' is currently not available.")
+
+        borrowing = Borrowing.objects.create(member=member, book=book, **fields)
+        stats.record_borrows({book.pk: 1})
+        return borrowing
+
+
+def update_borrowing(borrowing, **fields):
+    # Applies `fields` to the borrowing (its book and member are fixed); the
+    # first time a return_date is set the copy goes back on the shelf. The row lock makes two racing
+    # returns of the same borrowing increment only once. A returned loan is
+    # never reopened: its copy may already be out again.
+    with transaction.atomic():
+        borrowing = Borrowing.objects.select_for_update().get(pk=borrowing.pk)
+        # Copies, BookStats and the borrow limit are accounted per book and
+        # member, so a loan is never moved
+        for name in ('book', 'member'):
+            if name in fields and fields[name].pk != getattr(borrowing, f'{name}_id'):
+                raise _error(f"The {name} of a borrowing cannot be changed.")
+        if 'return_date' in fields and fields['return_date'] is None and borrowing.return_date is not None:
+            raise _error("A returned borrowing cannot be reopened.")
+        returning = fields.get('return_date') is not None and borrowing.return_date is None
+
+        for attr, value in fields.items():
+            setattr(borrowing, attr, value)
+        borrowing.save()
+
+        if returning:
+            _adjust_copies(borrowing.book_id, 1)
+            stats.record_returns({borrowing.book_id: 1})
+        return borrowing
+
+
+# Batch circulation for the librarian desk.
+#
+# A batch is validated with a handful of set-based queries, every book
+# touched is decremented/incremented by one "UPDATE ... CASE" statement
+# and the rows are written with bulk_create/bulk_update, all in a single
+# transaction. Rules are applied per item in request order, so one bad
+# item is reported and skipped without failing the rest.
+
+# Maximum items per batch request
+BULK_LIMIT = 100
+
+
+def _ok(index, borrowing):
+    return {"index": index, "status": "success", "borrowing_id": borrowing.pk,
+            "member": borrowing.member_id, "book": borrowing.book_id}
+
+
+def _failed(index, message, **item):
+    return {"index": index, "status": "error", "message": message, **item}
+
+
+def _bulk_adjust_copies(deltas):
+    # deltas: {book_id: +n / -n}; one UPDATE for the whole batch
+    deltas = {book_id: delta for book_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    Book.objects.filter(pk__in=deltas).update(
+        available_copies=Case(
+            *[When(pk=book_id, then=F('available_copies') + delta) for book_id, delta in deltas.items()],
+            default=F('available_copies'),
+            output_field=PositiveIntegerField(),
+        ),
+        updated_at=timezone.now(),
+    )
+    catalog_cache.invalidate_model('Book')
+
+
+def bulk_borrow(items):
+    # items: [{"member": member_id, "book": book_id}, ...]
+    results = [None] * len(items)
+    member_ids = {item['member'] for item in items}
+    book_ids = {item['book'] for item in items}
+
+    with transaction.atomic():
+        # Lock the members and books of the batch, then decide in memory
+        members = set(Member.objects.select_for_update().filter(pk__in=member_ids).order_by().values_list('pk', flat=True))
+        books = {
+            book.pk: book
+            for book in Book.objects.select_for_update().filter(pk__in=book_ids).order_by().only('pk', 'title', 'available_copies')
+        }
+        active = dict(
+            Borrowing.objects.filter(member_id__in=members, return_date__isnull=True)
+            .values('member_id').annotate(n=Count('pk')).values_list('member_id', 'n')
+        )
+        # (member, book) is unique in borrowing, returned or not
+        history = dict(
+            ((member_id, book_id), return_date is None)
+            for member_id, book_id, return_date in Borrowing.objects.filter(
+                member_id__in=members, book_id__in=books
+            ).order_by().values_list('member_id', 'book_id', 'return_date')
+        )
+
+        available = {pk: book.available_copies for pk, book in books.items()}
+        new_borrowings = []
+        for index, item in enumerate(items):
+            member_id, book_id = item['member'], item['book']
+            pair = (member_id, book_id)
+            if member_id not in members:
+                results[index] = _failed(index, f"Invalid member_id '{member_id}': Member does not exist.", **item)
+            elif book_id not in books:
+                results[index] = _failed(index, f"Invalid book_id '{book_id}': Book does not exist.", **item)
+            elif pair in history:
+                message = ("This book is already borrowed by the member and not returned." if history[pair]
+                           else "This book was already borrowed by the member before.")
+                results[index] = _failed(index, message, **item)
+            elif active.get(member_id, 0) >= BORROW_LIMIT:
+                results[index] = _failed(index, f"Member has reached borrowing limit ({BORROW_LIMIT}).", **item)
+            elif available[book_id] <= 0:
+                results[index] = _failed(index, f"The book '{books[book_id].title}' is currently not available.", **item)
+            else:
+                history[pair] = True
+                active[member_id] = active.get(member_id, 0) + 1
+                available[book_id] -= 1
+                new_borrowings.append((index, Borrowing(member_id=member_id, book_id=book_id)))
+
+        _bulk_adjust_copies({pk: available[pk] - book.available_copies for pk, book in books.items()})
+        created = Borrowing.objects.bulk_create([borrowing for _, borrowing in new_borrowings])
+        stats.record_borrows(Counter(borrowing.book_id for borrowing in created))
+
+        if created and created[0].pk is None:
+            # MySQL does not return ids from a bulk insert; (member, book) is unique
+            ids = {
+                (member_id, book_id): pk
+                for pk, member_id, book_id in Borrowing.objects.filter(
+                    member_id__in={b.member_id for b in created}, book_id__in={b.book_id for b in created},
+                ).values_list('pk', 'member_id', 'book_id')
+            }
+            for borrowing in created:
+                borrowing.pk = ids[(borrowing.member_id, borrowing.book_id)]
+
+    for index, borrowing in new_borrowings:
+        results[index] = _ok(index, borrowing)
+    return results
+
+
+def bulk_return(items):
+    # items: [{"borrowing": borrowing_id, "return_date": datetime|None, "late_fee": float|None}, ...]
+    results = [None] * len(items)
+    now = timezone.now()
+
+    with transaction.atomic():
+        borrowings = Borrowing.objects.select_for_update().in_bulk({item['borrowing'] for item in items})
+
+        returned = {}
+        for index, item in enumerate(items):
+            borrowing = borrowings.get(item['borrowing'])
+            return_date = item.get('return_date') or now
+            if borrowing is None:
+                results[index] = _failed(index, f"Invalid borrowing_id '{item['borrowing']}': Borrowing does not exist.", **item)
+            elif borrowing.return_date is not None or borrowing.pk in returned:
+                results[index] = _failed(index, "This borrowing has already been returned.", **item)
+            elif return_date < borrowing.borrow_date:
+                results[index] = _failed(index, "Return date cannot be before borrow date.", **item)
+            else:
+                borrowing.return_date = return_date
+                if item.get('late_fee') is not None:
+                    borrowing.late_fee = item['late_fee']
+                borrowing.updated_at = now  # bulk_update skips auto_now
+                returned[borrowing.pk] = index
+
+        updated = [borrowings[pk] for pk in returned]
+        Borrowing.objects.bulk_update(updated, ['return_date', 'late_fee', 'updated_at'])
+        returns = Counter(borrowing.book_id for borrowing in updated)
+        _bulk_adjust_copies(returns)
+        stats.record_returns(returns)
+
+    for pk, index in returned.items():
+        results[index] = _ok(index, borrowings[pk])
+    return results
@@ -0,0 +1,170 @@
+import hashlib
+import inspect
+from functools import wraps
+
+from django.apps import apps
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import catalog_cache, RESOURCE_DEPENDENCIES
+
+# Conditional GET (ETag / Last-Modified) for list and detail endpoints.
+#
+# Validators come from MAX(updated_at) and COUNT(*) of the endpoint's model
+# and of every model with an updated_at that its payload embeds, never from
+# the rendered body. Through-table changes touch Book.updated_at (see
+# signals.py), so adding an author to a book changes the validators too;
+# likewise Address/ContactNumber writes touch their Library and Member.
+# List responses carry only the ETag: deleting a row lowers COUNT(*) but
+# not MAX(updated_at), so a list Last-Modified would answer 304 with a
+# stale page. If-None-Match / If-Modified-Since are answered with 304
+# before anything is serialized.
+
+# Embedded models (with an updated_at column) per endpoint model
+VALIDATOR_DEPENDENCIES = {
+    'Library': ('Book', 'Author', 'Category'),
+    'Category': ('Book', 'Author'),
+    'Author': ('Book', 'Category'),
+    'Book': ('BookStats', 'Library', 'Author', 'Category'),
+}
+
+
+def _table_state(queryset):
+    state = queryset.aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+    return state['last_modified'], state['count']
+
+
+async def _atable_state(queryset):
+    state = await queryset.aaggregate(last_modified=Max('updated_at'), count=Count('pk'))
+    return state['last_modified'], state['count']
+
+
+def _querysets(model, pk):
+    # The endpoint's model (or detail row) first, then its dependencies
+    queryset = model._default_manager.all()
+    if pk is not None:
+        queryset = queryset.filter(pk=pk)
+    return [queryset] + [
+        apps.get_model('library', name)._default_manager.all()
+        for name in VALIDATOR_DEPENDENCIES.get(model.__name__, ())
+    ]
+
+
+def compute_validators(model, request, pk=None):
+    # Returns (etag, last_modified) or None when a detail object is missing
+    own, *dependencies = _querysets(model, pk)
+    states = [_table_state(own)]
+    if pk is not None and not states[0][1]:
+        return None
+    states += [_table_state(queryset) for queryset in dependencies]
+    return _make_validators(model, request, states, detail=pk is not None)
+
+
+async def acompute_validators(model, request, pk=None):
+    own, *dependencies = _querysets(model, pk)
+    states = [await _atable_state(own)]
+    if pk is not None and not states[0][1]:
+        return None
+    states += [await _atable_state(queryset) for queryset in dependencies]
+    return _make_validators(model, request, states, detail=pk is not None)
+
+
+def _make_validators(model, request, states, detail):
+    timestamps = [last for last, _ in states if last is not None]
+    last_modified = max(timestamps) if timestamps and detail else None
+
+    # The representation also varies with the page (query string) and format
+    renderer = getattr(request, 'accepted_renderer', None)
+    fingerprint = repr((
+        model._meta.label, request.get_full_path(), getattr(renderer, 'format', None),
+        [(last.isoformat() if last else None, count) for last, count in states],
+    ))
+    etag = quote_etag(hashlib.md5(fingerprint.encode('utf-8'), usedforsecurity=False).hexdigest())
+    return etag, last_modified
+
+
+def _validators_suffix(request, resource):
+    # Catalog validators only change when the catalog cache generation is
+    # bumped, so they can be cached under the same generation
+    if resource in RESOURCE_DEPENDENCIES and catalog_cache.enabled:
+        renderer = getattr(request, 'accepted_renderer', None)
+        return f":validators:{getattr(renderer, 'format', '')}"
+    return None
+
+
+def _validators(view, request, kwargs, resource):
+    model = view.queryset.model
+    pk = kwargs.get(view.lookup_url_kwarg or view.lookup_field)
+    suffix = _validators_suffix(request, resource)
+    if suffix is None:
+        return compute_validators(model, request, pk)
+
+    key = catalog_cache.make_key(resource, request) + suffix
+    validators = catalog_cache.backend.get(key)
+    if validators is None:
+        validators = compute_validators(model, request, pk) or ()
+        catalog_cache.set(key, resource, validators)
+    return validators or None
+
+
+async def _avalidators(view, request, kwargs, resource):
+    model = view.queryset.model
+    pk = kwargs.get(view.lookup_url_kwarg or view.lookup_field)
+    suffix = _validators_suffix(request, resource)
+    if suffix is None:
+        return await acompute_validators(model, request, pk)
+
+    key = await catalog_cache.amake_key(resource, request) + suffix
+    validators = await catalog_cache.backend.aget(key)
+    if validators is None:
+        validators = await acompute_validators(model, request, pk) or ()
+        await catalog_cache.aset(key, resource, validators)
+    return validators or None
+
+
+def _finalize(response, etag, timestamp):
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+def conditional_response(resource=None):
+    # Decorator for ViewSet list/retrieve: adds ETag (and, on detail views,
+    # Last-Modified) to 200 responses and answers matching conditional requests with 304.
+    # `resource` names the catalog cache resource, if any, for the view.
+    def decorator(view_method):
+        if inspect.iscoroutinefunction(view_method):
+            @wraps(view_method)
+            async def async_wrapper(self, request, *args, **kwargs):
+                validators = await _avalidators(self, request, kwargs, resource)
+                if validators is None:
+                    return await view_method(self, request, *args, **kwargs)
+
+                etag, last_modified = validators
+                timestamp = int(last_modified.timestamp()) if last_modified else None
+                response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+                if response is None:
+                    response = await view_method(self, request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                return _finalize(response, etag, timestamp)
+            return async_wrapper
+
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            validators = _validators(self, request, kwargs, resource)
+            if validators is None:
+                return view_method(self, request, *args, **kwargs)
+
+            etag, last_modified = validators
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            return _finalize(response, etag, timestamp)
+        return wrapper
+    return decorator
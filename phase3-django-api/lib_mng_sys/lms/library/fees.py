@@ -0,0 +1,101 @@
+import time
+from datetime import datetime, time as day_start
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, FloatField, Func, Max, Min, Value, When
+from django.utils import timezone
+
+from .cache import catalog_cache
+from .models import Borrowing, Member, MemberType
+
+# Late-fee accrual for overdue, unreturned borrowings
+# (`manage.py accrue_late_fees`, meant to run from cron).
+#
+# fee = LATE_FEE_RATES[member type] * days overdue, where every started
+# day past the due date counts and days are counted up to the start of the
+# run's day (`as_of`), so every run on the same day computes the same fees.
+#
+# The borrowing table is walked in borrowing_id ranges; each range is one
+# set-based UPDATE (the member type comes from an IN (SELECT ...) per type,
+# the day count from the database's date arithmetic) that only touches rows
+# whose fee changes. Reruns and resumed runs skip the rows an earlier run
+# already brought up to date.
+
+class DaysOverdue(Func):
+    # Started days between `due_date` and `as_of` (both datetimes)
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL and others
+        return super().as_sql(compiler, connection,
+                              template='CEIL(EXTRACT(EPOCH FROM (%(expressions)s)) / 86400)',
+                              arg_joiner=' - ', **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self._render(compiler, 'CEIL(TIMESTAMPDIFF(SECOND, %(due)s, %(as_of)s) / 86400)')
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self._render(
+            compiler,
+            '((CAST(ROUND((julianday(%(as_of)s) - julianday(%(due)s)) * 86400) AS INTEGER) + 86399) / 86400)',
+        )
+
+    def _render(self, compiler, template):
+        compiled = dict(zip(('as_of', 'due'), (compiler.compile(e) for e in self.get_source_expressions())))
+        order = sorted(compiled, key=lambda name: template.index(f'%({name})s'))
+        params = [param for name in order for param in compiled[name][1]]
+        return template % {name: sql for name, (sql, _) in compiled.items()}, params
+
+
+def get_rates():
+    # {member_type: fee per day}; every member type needs a rate
+    rates = getattr(settings, 'LATE_FEE_RATES', {})
+    missing = [value for value in MemberType.values if value not in rates]
+    if missing:
+        raise ValueError(f"LATE_FEE_RATES has no rate for member type(s): {', '.join(missing)}.")
+    return {member_type: float(rates[member_type]) for member_type in MemberType.values}
+
+
+def start_of_day(day=None):
+    day = day or timezone.localdate()
+    return timezone.make_aware(datetime.combine(day, day_start.min), timezone.get_current_timezone())
+
+
+def fee_expression(as_of, rates):
+    rate = Case(
+        *[When(member__in=Member.objects.filter(member_type=member_type), then=Value(amount))
+          for member_type, amount in rates.items()],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    return rate * DaysOverdue(Value(as_of, output_field=DateTimeField()), F('due_date'))
+
+
+def accrue_late_fees(as_of=None, batch_size=None, rates=None, progress=None):
+    # Returns the number of borrowings whose fee changed. `progress` is
+    # called after every batch with (last borrowing_id, rows touched so far,
+    # seconds elapsed).
+    as_of = as_of or start_of_day()
+    rates = rates or get_rates()
+    batch_size = batch_size or settings.LATE_FEE_BATCH_SIZE
+    overdue = Borrowing.objects.order_by().filter(return_date__isnull=True, due_date__lt=as_of)
+    bounds = overdue.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return 0
+
+    fee = fee_expression(as_of, rates)
+    touched, started = 0, time.monotonic()
+    for low in range(bounds['first'], bounds['last'] + 1, batch_size):
+        high = low + batch_size - 1
+        with transaction.atomic():
+            touched += overdue.filter(pk__gte=low, pk__lte=high).alias(fee=fee).exclude(late_fee=F('fee')).update(
+                late_fee=fee, updated_at=timezone.now()
+            )
+        if progress:
+            progress(high, touched, time.monotonic() - started)
+
+    if touched:
+        # queryset.update() sends no post_save
+        catalog_cache.invalidate_model('Borrowing')
+    return touched
@@ -0,0 +1,35 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.fees import accrue_late_fees, get_rates, start_of_day
+
+
+class Command(BaseCommand):
+    help = "Compute late fees for overdue, unreturned borrowings (safe to rerun or resume)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="borrowing_id range per UPDATE (default LATE_FEE_BATCH_SIZE).")
+        parser.add_argument('--as-of', help="Count overdue days up to this date (YYYY-MM-DD, default today).")
+
+    def handle(self, *args, **options):
+        try:
+            rates = get_rates()
+            as_of = start_of_day(date.fromisoformat(options['as_of'])) if options['as_of'] else None
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        def progress(last_id, touched, elapsed):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"up to borrowing {last_id}: {touched} rows, {touched / max(elapsed, 1e-6):.0f} rows/s")
+
+        started = time.monotonic()
+        touched = accrue_late_fees(as_of, options['batch_size'], rates, progress)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated late fees on {touched} borrowing(s) in {elapsed:.1f}s "
+            f"({touched / max(elapsed, 1e-6):.0f} rows/s)."
+        ))
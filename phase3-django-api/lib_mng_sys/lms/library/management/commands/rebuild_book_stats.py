@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from library import stats
+from library.cache import catalog_cache
+from library.models import Book, BookStats
+
+
+class Command(BaseCommand):
+    help = "Recompute BookStats (ratings and borrow counts) from the review and borrowing tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per INSERT.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            computed = stats.computed_stats()
+
+            # Plain DELETE: the catalog post_delete receivers would make the
+            # ORM load and signal every row first
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {BookStats._meta.db_table}")
+            rows, written = [], 0
+            for book_id in Book.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size):
+                rows.append(BookStats(book_id=book_id, **stats.stats_values(computed.get(book_id, {}))))
+                if len(rows) >= batch_size:
+                    BookStats.objects.bulk_create(rows)
+                    written += len(rows)
+                    rows = []
+            BookStats.objects.bulk_create(rows)
+            written += len(rows)
+
+            catalog_cache.invalidate_model('BookStats')
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {written} books."))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = "Correct BookStats rows that drifted from the review and borrowing tables (safe to run on a schedule)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Books recomputed per transaction.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        started = time.monotonic()
+        fixed = reconcile(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Corrected stats for {fixed} book(s) in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.rollups import refresh_daily_circulation
+
+
+class Command(BaseCommand):
+    help = "Refresh the daily circulation rollup for the days touched since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', help="Recompute every day from this date (YYYY-MM-DD), e.g. after deletes or date edits."
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError("--since must be a date in YYYY-MM-DD format.")
+
+        days = refresh_daily_circulation(since)
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {days} day(s) of circulation rollup."))
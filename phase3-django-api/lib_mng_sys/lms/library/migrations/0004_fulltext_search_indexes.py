@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:40
+
+from django.db import migrations
+
+# FULLTEXT indexes for /api/books/search/ (see library/search.py). They are
+# MySQL-only, so other backends (SQLite test runs) skip them and search
+# falls back to an in-process inverted index.
+FULLTEXT_INDEXES = [
+    ('book', 'book_title_ft', 'title'),
+    ('author', 'author_name_ft', 'first_name, last_name'),
+    ('category', 'category_name_ft', 'name'),
+]
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, name, columns in FULLTEXT_INDEXES:
+        schema_editor.execute(f"CREATE FULLTEXT INDEX {name} ON {table} ({columns})")
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, name, _ in FULLTEXT_INDEXES:
+        schema_editor.execute(f"DROP INDEX {name} ON {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_fulltext_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(fields=['member', 'return_date'], name='borrowing_member_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(fields=['book', 'borrow_date'], name='borrowing_book_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(fields=['due_date', 'return_date'], name='borrowing_overdue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(fields=['late_fee', 'member'], name='borrowing_late_fee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['book', 'rating'], name='review_book_rating_idx'),
+        ),
+    ]
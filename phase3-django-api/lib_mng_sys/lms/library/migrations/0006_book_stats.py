@@ -0,0 +1,61 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_book_stats(apps, schema_editor):
+    # Same computation as `manage.py rebuild_book_stats`
+    Book = apps.get_model('library', 'Book')
+    BookStats = apps.get_model('library', 'BookStats')
+    Borrowing = apps.get_model('library', 'Borrowing')
+    Review = apps.get_model('library', 'Review')
+
+    reviews = {
+        row['book_id']: row
+        for row in Review.objects.order_by().values('book_id').annotate(count=Count('pk'), total=Sum('rating'))
+    }
+    borrows = {
+        row['book_id']: row
+        for row in Borrowing.objects.order_by().values('book_id').annotate(
+            total=Count('pk'), active=Count('pk', filter=Q(return_date__isnull=True)))
+    }
+    rows = []
+    for book_id in Book.objects.order_by('pk').values_list('pk', flat=True).iterator():
+        review, borrow = reviews.get(book_id, {}), borrows.get(book_id, {})
+        count, total = review.get('count', 0), review.get('total') or 0.0
+        rows.append(BookStats(
+            book_id=book_id, review_count=count, rating_sum=total,
+            avg_rating=total / count if count else None,
+            total_borrows=borrow.get('total', 0), active_borrows=borrow.get('active', 0),
+        ))
+    BookStats.objects.bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0005_borrowing_review_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookStats',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='library.book')),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.FloatField(default=0.0)),
+                ('avg_rating', models.FloatField(blank=True, null=True)),
+                ('total_borrows', models.PositiveIntegerField(default=0)),
+                ('active_borrows', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Book Statistics',
+                'verbose_name_plural': 'Book Statistics',
+                'db_table': 'book_stats',
+            },
+        ),
+        migrations.RunPython(backfill_book_stats, migrations.RunPython.noop),
+    ]
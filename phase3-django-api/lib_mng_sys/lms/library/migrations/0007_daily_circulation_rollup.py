@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0006_book_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RefreshWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'refresh_watermark',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCirculation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('borrows', models.PositiveIntegerField(default=0)),
+                ('returns', models.PositiveIntegerField(default=0)),
+                ('overdues', models.PositiveIntegerField(default=0)),
+                ('late_fees', models.FloatField(default=0.0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+                ('library', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_circulation', to='library.library')),
+            ],
+            options={
+                'verbose_name': 'Daily Circulation',
+                'verbose_name_plural': 'Daily Circulation',
+                'db_table': 'daily_circulation',
+                'ordering': ['day', 'library'],
+                'indexes': [models.Index(fields=['library', 'day'], name='daily_circulation_library_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'library'), name='unique_daily_circulation')],
+            },
+        ),
+    ]
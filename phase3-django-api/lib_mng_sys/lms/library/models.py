@@ -8,7 +8,8 @@ from phonenumber_field.modelfields import PhoneNumberField
 
 # Function to calculate default due date (14 days from now)
 def default_due_date():
-    return timezone.now().date() + timedelta(days=14)
+    # Aware datetime: due_date is a DateTimeField
+    return timezone.now() + timedelta(days=14)
 
 # Enum for member types
 class MemberType(models.TextChoices):
@@ -108,7 +109,7 @@ class Library(models.Model):
     contact_email = models.EmailField(unique=True, max_length=100)
     phone_number = models.OneToOneField(ContactNumber, on_delete=models.PROTECT)
     created_at = models.DateTimeField(auto_now_add=True)  # on create
-    updated_at = models.DateTimeField(auto_now=True)  # on every save
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # on every save, indexed for ETags
 
     # relationship
     books = models.ManyToManyField(
@@ -135,7 +136,7 @@ class Author(models.Model):
     nationality = models.CharField(max_length=20, default='Indian')
     biography = models.TextField(max_length=200)
     created_at = models.DateTimeField(auto_now_add=True)  # on create
-    updated_at = models.DateTimeField(auto_now=True)  # on every save
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # on every save, indexed for ETags
 
     class Meta:
         db_table = "author"
@@ -158,13 +159,16 @@ class Member(models.Model):
     member_type = models.CharField(max_length=20, choices=MemberType.choices)
     registration_date = models.DateTimeField(auto_now_add=True)
     created_at = models.DateTimeField(auto_now_add=True)  # on create
-    updated_at = models.DateTimeField(auto_now=True)  # on every save
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # on every save, indexed for ETags
 
     class Meta:
         db_table = "member"
         ordering = ['registration_date'] #ASC order
         verbose_name = "Member detail" #Book categories
         verbose_name_plural = "Member details"
+        indexes = [
+            models.Index(fields=['registration_date', 'member_id'], name='member_registration_idx')
+        ]  # keyset pagination order
 
     def __str__(self):
         return f"{self.member_id} - ({self.first_name} {self.last_name}) - {self.member_type}"
@@ -175,7 +179,7 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.CharField(max_length=500)
     created_at = models.DateTimeField(auto_now_add=True)  # on create
-    updated_at = models.DateTimeField(auto_now=True)  # on every save
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # on every save, indexed for ETags
 
     class Meta:
         db_table = "category"
@@ -195,7 +199,7 @@ class Book(models.Model):
     total_copies = models.PositiveIntegerField()
     available_copies = models.PositiveIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)  # on create
-    updated_at = models.DateTimeField(auto_now=True)  # on every save
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # on every save, indexed for ETags
 
     # Relationship
     authors = models.ManyToManyField(Author, related_name='books', through="BookAuthor")
@@ -211,6 +215,9 @@ class Book(models.Model):
         verbose_name = "Book Details"
         verbose_name_plural = "Books Details"
         ordering = ['created_at'] #ASC order
+        indexes = [
+            models.Index(fields=['created_at', 'book_id'], name='book_created_idx')
+        ]  # keyset pagination order
 
     def __str__(self):
         return f"{self.book_id} - {self.title}"
@@ -223,7 +230,7 @@ class Borrowing(models.Model):
     return_date = models.DateTimeField(null=True, blank=True) # Fill when he/she will return
     late_fee = models.FloatField(default=0.0)
     created_at = models.DateTimeField(auto_now_add=True)  # on create
-    updated_at = models.DateTimeField(auto_now=True)  # on every save
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # on every save, indexed for ETags
 
     #Relationship
     member = models.ForeignKey('Member', on_delete=models.CASCADE)
@@ -234,6 +241,13 @@ class Borrowing(models.Model):
         ordering = ['due_date']
         verbose_name = "Borrowed Book"
         verbose_name_plural = "Borrowed Books"
+        indexes = [
+            models.Index(fields=['due_date', 'borrowing_id'], name='borrowing_due_date_idx'),  # keyset pagination order
+            models.Index(fields=['member', 'return_date'], name='borrowing_member_active_idx'),  # member's active loans
+            models.Index(fields=['book', 'borrow_date'], name='borrowing_book_history_idx'),  # borrows per book and period
+            models.Index(fields=['due_date', 'return_date'], name='borrowing_overdue_idx'),  # overdue, not returned
+            models.Index(fields=['late_fee', 'member'], name='borrowing_late_fee_idx'),  # fines per member
+        ]
         constraints = [
             UniqueConstraint(fields=['member', 'book'], name='unique_book_member')
         ]
@@ -248,7 +262,7 @@ class Review(models.Model):
     comment = models.CharField(max_length=500)
     review_date = models.DateTimeField(auto_now=True) # updated when edited
     created_at = models.DateTimeField(auto_now_add=True)  # on create
-    updated_at = models.DateTimeField(auto_now=True)  # on every save
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # on every save, indexed for ETags
 
     # Relationship
     member = models.ForeignKey('Member', on_delete=models.CASCADE)
@@ -262,6 +276,65 @@ class Review(models.Model):
         verbose_name = "Book Review"
         verbose_name_plural = "Book Reviews"
         ordering = ['-review_date'] #DESC order
+        indexes = [
+            models.Index(fields=['review_date', 'review_id'], name='review_date_idx'),  # keyset pagination order
+            models.Index(fields=['book', 'rating'], name='review_book_rating_idx'),  # average rating per book
+        ]
 
     def __str__(self):
         return f"{self.review_id} - {self.member.member_id}: {self.rating}"
+
+# Per-book review and borrow aggregates, kept current by library/stats.py
+class BookStats(models.Model):
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.FloatField(default=0.0)
+    avg_rating = models.FloatField(null=True, blank=True)  # None until the first review
+    total_borrows = models.PositiveIntegerField(default=0)
+    active_borrows = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # on every save, indexed for ETags
+
+    class Meta:
+        db_table = "book_stats"
+        verbose_name = "Book Statistics"
+        verbose_name_plural = "Book Statistics"
+
+    def __str__(self):
+        return f"{self.book_id}: {self.avg_rating} ({self.review_count} reviews), {self.total_borrows} borrows"
+
+# Daily circulation per library, materialized by library/rollups.py.
+# A borrowing counts for every library that holds the book.
+class DailyCirculation(models.Model):
+    day = models.DateField()
+    library = models.ForeignKey(Library, on_delete=models.CASCADE, related_name='daily_circulation')
+    borrows = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+    overdues = models.PositiveIntegerField(default=0)  # loans due that day, returned late or not at all
+    late_fees = models.FloatField(default=0.0)  # fees of the loans returned that day
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "daily_circulation"
+        ordering = ['day', 'library']
+        verbose_name = "Daily Circulation"
+        verbose_name_plural = "Daily Circulation"
+        constraints = [
+            UniqueConstraint(fields=['day', 'library'], name='unique_daily_circulation')
+        ]
+        indexes = [
+            models.Index(fields=['library', 'day'], name='daily_circulation_library_idx')
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.library_id}: {self.borrows} borrows, {self.returns} returns"
+
+# Progress markers of incremental refresh jobs
+class RefreshWatermark(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateTimeField()  # last source updated_at that was processed
+
+    class Meta:
+        db_table = "refresh_watermark"
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
@@ -0,0 +1,181 @@
+import base64
+import json
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+# Keyset (seek) pagination over the model's Meta.ordering.
+# The cursor stores the ordering values of the last/first row of a page, so
+# every page is a "WHERE (a, b, pk) > (x, y, z) ORDER BY a, b, pk LIMIT n"
+# query and costs the same whether it is page 1 or page 10,000.
+class KeysetCursorPagination(BasePagination):
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor.'
+    default_message = 'Records retrieved successfully.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self._set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # Async views (async_views.py); chunk_size lets aiterator() honour
+        # prefetch_related()
+        queryset = self._page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self._set_page([obj async for obj in queryset.aiterator(chunk_size=self.page_size + 1)])
+
+    def _page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.ordering = self.get_ordering(queryset)
+        values, self.reverse = self.decode_cursor(request)
+        self.after_cursor = values is not None
+
+        # Walking backwards = walking forwards over the reversed ordering
+        ordering = _reverse_ordering(self.ordering) if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(ordering, values))
+
+        # Fetch one extra row to know whether another page exists
+        return queryset[:self.page_size + 1]
+
+    def _set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.after_cursor
+        return self.page
+
+    def get_paginated_response(self, data, message=None):
+        return Response({
+            "status": "success",
+            "message": message or self.default_message,
+            "data": data,
+            "pagination": {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "page_size": self.page_size,
+            }
+        })
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, queryset):
+        # Meta.ordering plus the primary key as a tie-breaker, so the
+        # ordering is total even on columns like Borrowing.due_date
+        ordering = list(queryset.model._meta.ordering)
+        names = {field.lstrip('-') for field in ordering}
+        if not names & {'pk', queryset.model._meta.pk.name}:
+            descending = ordering and ordering[-1].startswith('-')
+            ordering.append('-pk' if descending else 'pk')
+        return tuple(ordering)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self._link(self.page[0], reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            values, reverse = payload['v'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            values = [self._to_python(field, value) for field, value in zip(self.ordering, values)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def _to_python(self, field, value):
+        # Cursor values are client input: coerce each to its ordering
+        # field's type, so a tampered cursor is a 404 rather than a 500
+        name = field.lstrip('-')
+        model_field = self.model._meta.pk if name == 'pk' else self.model._meta.get_field(name)
+        if value is None or isinstance(value, (dict, list)):
+            raise TypeError(f"Invalid cursor value for {name}.")
+        return model_field.to_python(value)
+
+    def encode_cursor(self, values, reverse):
+        payload = json.dumps({'v': values, 'r': int(reverse)})
+        return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+
+    def _link(self, instance, reverse):
+        values = [_cursor_value(getattr(instance, field.lstrip('-'))) for field in self.ordering]
+        cursor = self.encode_cursor(values, reverse)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    @staticmethod
+    def _keyset_filter(ordering, values):
+        # (a, b, c) > (x, y, z)  ==>  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        clauses = []
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {f.lstrip('-'): v for f, v in zip(ordering[:i], values[:i])}
+            clauses.append(Q(**equal, **{f'{name}__{lookup}': values[i]}))
+        return reduce(or_, clauses)
+
+
+def _reverse_ordering(ordering):
+    return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+
+def _cursor_value(value):
+    # Full-precision ISO strings: DjangoJSONEncoder truncates microseconds,
+    # which would make rows sharing a millisecond repeat or vanish
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
@@ -0,0 +1,167 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Primary/replica routing for the library app.
+#
+# Inside an HTTP request (PrimaryReplicaMiddleware), reads go to one of
+# settings.REPLICA_DATABASES, round robin, and writes go to the primary
+# ('default'). The request then sticks to the primary for the rest of its
+# reads: from the start for POST/PUT/PATCH/DELETE, otherwise from its first
+# write. Reads inside a transaction on the primary stay there too. Outside
+# requests (management commands, the shell) everything uses the primary.
+#
+# A replica is skipped while it is unreachable or more than REPLICA_MAX_LAG
+# seconds behind; each replica's health is re-checked at most every
+# REPLICA_HEALTH_INTERVAL seconds. With no healthy replica, reads fall back
+# to the primary.
+#
+# Cached catalog payloads (cache.py) are shared by every request, so a miss
+# shortly after a catalog write is filled from the primary: for
+# replica_staleness_window() seconds after the write a healthy replica may
+# still return the pre-write rows, which would go back into the cache
+# under the new generation. Replicas are never migrated; they copy the
+# primary's schema through replication.
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# {'pinned': bool} for the current request, None outside requests. A dict,
+# so a write made in a sync_to_async thread (own context copy) still pins
+_request_state = ContextVar('library_db_request_state', default=None)
+
+
+@contextmanager
+def request_scope(method='GET'):
+    token = _request_state.set({'pinned': method not in SAFE_METHODS})
+    try:
+        yield
+    finally:
+        _request_state.reset(token)
+
+
+def pin_to_primary():
+    state = _request_state.get()
+    if state is not None:
+        state['pinned'] = True
+
+
+def replica_staleness_window():
+    # How far behind a replica served to a request can be: up to
+    # REPLICA_MAX_LAG when last checked, plus the time until the next check
+    return getattr(settings, 'REPLICA_MAX_LAG', 5) + getattr(settings, 'REPLICA_HEALTH_INTERVAL', 10)
+
+
+def replica_lag(alias):
+    # Seconds the replica is behind its source; None if it does not report
+    # replication status (not a replica, or not MySQL). Raises if unreachable.
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor != 'mysql':
+            cursor.execute('SELECT 1')
+            return None
+        cursor.execute('SHOW REPLICA STATUS')
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        status = dict(zip((column[0] for column in cursor.description), row))
+    lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+    return float('inf') if lag is None else float(lag)  # NULL: replication stopped
+
+
+class ReplicaHealth:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}  # alias -> (monotonic time, healthy)
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._checked.get(alias)
+        if cached and now - cached[0] < getattr(settings, 'REPLICA_HEALTH_INTERVAL', 10):
+            return cached[1]
+        healthy = self._probe(alias)
+        with self._lock:
+            self._checked[alias] = (now, healthy)
+        return healthy
+
+    def _probe(self, alias):
+        try:
+            lag = replica_lag(alias)
+        except Exception:
+            return False
+        return lag is None or lag <= getattr(settings, 'REPLICA_MAX_LAG', 5)
+
+    def status(self):
+        with self._lock:
+            return {alias: healthy for alias, (_, healthy) in self._checked.items()}
+
+    def reset(self):
+        with self._lock:
+            self._checked.clear()
+
+
+replica_health = ReplicaHealth()
+_round_robin = itertools.count()
+
+
+class PrimaryReplicaRouter:
+    app_label = 'library'
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != self.app_label:
+            return None
+        state = _request_state.get()
+        replicas = getattr(settings, 'REPLICA_DATABASES', [])
+        if state is None or state['pinned'] or not replicas or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        start = next(_round_robin)
+        for i in range(len(replicas)):
+            alias = replicas[(start + i) % len(replicas)]
+            if replica_health.is_healthy(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != self.app_label:
+            return None
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *getattr(settings, 'REPLICA_DATABASES', [])}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in getattr(settings, 'REPLICA_DATABASES', []):
+            return False
+        return None
+
+
+class PrimaryReplicaMiddleware:
+    # Opens the request scope the router reads; sync and async capable
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with request_scope(request.method):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with request_scope(request.method):
+            return await self.get_response(request)
@@ -0,0 +1,174 @@
+import math
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.exceptions import NotFound
+
+from .cache import catalog_cache
+from .models import Book, BookAuthor, BookCategory
+from .pagination import KeysetCursorPagination
+
+# Book search over titles, author names and category names.
+#
+# On MySQL the FULLTEXT indexes from migration 0004 are queried with
+# MATCH ... AGAINST (natural language mode); the three matches are summed
+# per book with a field weight and only the top SEARCH_MAX_RESULTS ids are
+# returned, so the cost is bounded by the index lookups, not the catalog
+# size. Other backends (SQLite test runs) use an in-process inverted index
+# with the same weights, rebuilt whenever the catalog cache generation of
+# the 'book' resource changes.
+
+# Relevance weight per matched field
+SEARCH_WEIGHTS = {'title': 3.0, 'author': 2.0, 'category': 1.0}
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def _max_results():
+    return getattr(settings, 'SEARCH_MAX_RESULTS', 1000)
+
+
+MYSQL_SEARCH_SQL = """
+    SELECT hits.book_id, SUM(hits.score) AS relevance FROM (
+        SELECT book_id, MATCH(title) AGAINST (%s IN NATURAL LANGUAGE MODE) * {title} AS score
+        FROM book
+        WHERE MATCH(title) AGAINST (%s IN NATURAL LANGUAGE MODE)
+        UNION ALL
+        SELECT ba.book_id, MATCH(a.first_name, a.last_name) AGAINST (%s IN NATURAL LANGUAGE MODE) * {author}
+        FROM author a JOIN book_author ba ON ba.author_id = a.author_id
+        WHERE MATCH(a.first_name, a.last_name) AGAINST (%s IN NATURAL LANGUAGE MODE)
+        UNION ALL
+        SELECT bc.book_id, MATCH(c.name) AGAINST (%s IN NATURAL LANGUAGE MODE) * {category}
+        FROM category c JOIN book_category bc ON bc.category_id = c.category_id
+        WHERE MATCH(c.name) AGAINST (%s IN NATURAL LANGUAGE MODE)
+    ) hits
+    GROUP BY hits.book_id
+    ORDER BY relevance DESC, hits.book_id
+    LIMIT %s
+""".format(**SEARCH_WEIGHTS)
+
+
+def _mysql_search(query, limit):
+    with connection.cursor() as cursor:
+        cursor.execute(MYSQL_SEARCH_SQL, [query] * 6 + [limit])
+        return [(round(float(score), 6), book_id) for book_id, score in cursor.fetchall()]
+
+
+class InvertedIndex:
+    # token -> {book_id: summed field weight}
+    def __init__(self):
+        self.postings = defaultdict(lambda: defaultdict(float))
+        self.book_count = 0
+
+    def add(self, book_id, text, weight):
+        for token in set(tokenize(text)):
+            self.postings[token][book_id] += weight
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        for book_id, title in Book.objects.order_by().values_list('pk', 'title').iterator():
+            index.add(book_id, title, SEARCH_WEIGHTS['title'])
+            index.book_count += 1
+        for book_id, first, last in BookAuthor.objects.values_list(
+                'book_id', 'author__first_name', 'author__last_name').iterator():
+            index.add(book_id, f"{first} {last}", SEARCH_WEIGHTS['author'])
+        for book_id, name in BookCategory.objects.values_list('book_id', 'category__name').iterator():
+            index.add(book_id, name, SEARCH_WEIGHTS['category'])
+        return index
+
+    def search(self, query, limit):
+        scores = defaultdict(float)
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            # Rarer tokens count for more, as in MySQL's natural language mode
+            idf = math.log(1 + self.book_count / len(postings))
+            for book_id, weight in postings.items():
+                scores[book_id] += weight * idf
+        ranked = sorted((-score, book_id) for book_id, score in scores.items())
+        return [(round(-score, 6), book_id) for score, book_id in ranked[:limit]]
+
+
+_index_lock = threading.Lock()
+_index = (None, None)  # (catalog generation, InvertedIndex)
+
+
+# Rebuilds in a row when writes keep landing during the scan; after the
+# last one the index is served as is and rebuilt on the next search
+INDEX_BUILD_ATTEMPTS = 3
+
+
+def _fallback_search(query, limit):
+    global _index
+    with _index_lock:
+        for _ in range(INDEX_BUILD_ATTEMPTS):
+            # Generation taken before the scan: a write committed while it
+            # runs bumps it, so the index is stored as already stale and
+            # rebuilt rather than silently missing that write
+            generation = catalog_cache.generation('book')
+            if _index[0] == generation:
+                break
+            _index = (generation, InvertedIndex.build())
+        index = _index[1]
+    return index.search(query, limit)
+
+
+def search_books(query):
+    # Returns [(relevance, book_id), ...], best match first
+    if connection.vendor == 'mysql':
+        return _mysql_search(query, _max_results())
+    return _fallback_search(query, _max_results())
+
+
+class RankedResultsPagination(KeysetCursorPagination):
+    # Keyset pagination over a ranked id list: the cursor is the
+    # (relevance, book_id) of the last/first row of the page
+    default_message = 'Search results retrieved successfully.'
+
+    def _to_python(self, field, value):
+        # relevance is not a model field; paginate_ranked converts the pair
+        return value
+
+    def paginate_ranked(self, ranked, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = ('relevance', 'pk')
+        values, reverse = self.decode_cursor(request)
+
+        keys = [(-relevance, pk) for relevance, pk in ranked]
+        if values is None:
+            start, end = 0, self.page_size
+        else:
+            try:
+                key = (-float(values[0]), int(values[1]))
+            except (TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if reverse:
+                end = bisect_left(keys, key)
+                start = max(end - self.page_size, 0)
+            else:
+                start = bisect_right(keys, key)
+                end = start + self.page_size
+        window = ranked[start:end]
+
+        books = queryset.in_bulk([pk for _, pk in window])
+        self.page = []
+        for relevance, pk in window:
+            if pk in books:
+                books[pk].relevance = relevance
+                self.page.append(books[pk])
+
+        self.has_next = end < len(ranked)
+        self.has_previous = start > 0
+        return self.page
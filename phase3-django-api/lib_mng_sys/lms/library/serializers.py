@@ -1,14 +1,18 @@
 import re
+from functools import lru_cache
 
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 import phonenumbers
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from . import catalog, circulation, stats
 from .models import (
     Address, ContactNumber, Library, Author, Member,
-    Category, Book, Borrowing, Review,
+    Category, Book, Borrowing, Review, BookLibrary, BookStats,
     MemberType, ContactType
 )
 
@@ -20,16 +24,37 @@ def validate_name(value):
         )
     return value.replace(" ", "").replace("-","").strip()
 
+@lru_cache(maxsize=getattr(settings, 'PHONE_CACHE_SIZE', 4096))
+def normalize_phone(value):
+    # (E.164 number, None) or (None, error message), memoized per process:
+    # phone parsing is the costliest validator and numbers repeat a lot.
+    # Errors are returned, not raised, so invalid numbers are cached too.
+    try:
+        number = phonenumbers.parse(value, None)
+    except phonenumbers.NumberParseException as e:
+        return None, f"Invalid phone number format: {e}"
+    if not phonenumbers.is_valid_number(number):
+        return None, "Invalid phone number."
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164), None
+
+def phone_cache_stats():
+    info = normalize_phone.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'hit_rate': round(info.hits / lookups, 4) if lookups else 0.0,
+        'size': info.currsize,
+        'max_size': info.maxsize,
+    }
+
 def validate_phone_number(value):
     if not value:
         return None
-    try:
-        number = phonenumbers.parse(str(value), None)
-        if not phonenumbers.is_valid_number(number):
-            raise serializers.ValidationError("Invalid phone number.")
-        return  phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
-    except phonenumbers.NumberParseException as e:
-        raise serializers.ValidationError(f"Invalid phone number format: {e}")
+    number, error = normalize_phone(str(value))
+    if error:
+        raise serializers.ValidationError(error)
+    return number
 
 # Address Serializer
 class AddressSerializer(serializers.ModelSerializer):
@@ -201,8 +226,9 @@ class LibrarySerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
     def get_books(self, obj):
-        books = obj.book_set.all()
-        if not books.exists():
+        # Evaluate the (prefetched) relation instead of issuing .exists()
+        books = list(obj.book_set.all())
+        if not books:
             return {"message": "No books available in this library."}
         return BookMiniSerializer(books, many=True).data
 
@@ -260,10 +286,11 @@ class AuthorSerializer(serializers.ModelSerializer):
         return data
 
     def get_books(self, obj):
-        books = obj.book_set.prefetch_related('categories').all()
+        # .all() on the related manager reuses the view's prefetch cache
+        books = obj.books.all()
         return [
             {
-                "book_id": book.id,
+                "book_id": book.book_id,
                 "title": book.title,
                 "categories": [category.name for category in book.categories.all()]
             }
@@ -403,7 +430,8 @@ class CategorySerializer(serializers.ModelSerializer):
 # Book Serializer
 class BookSerializer(serializers.ModelSerializer):
     book_id = serializers.IntegerField(read_only=True)
-    library = serializers.DictField(write_only=True)
+    library = serializers.DictField(write_only=True, required=False)
+    libraries = serializers.ListField(child=serializers.DictField(), write_only=True, required=False)
     authors = serializers.ListField(child=serializers.DictField(), write_only=True)
     categories = serializers.ListField(child=serializers.DictField(), write_only=True)
     created_at = serializers.DateTimeField(read_only=True)
@@ -414,10 +442,9 @@ class BookSerializer(serializers.ModelSerializer):
         fields = [
             'book_id', 'title', 'isbn', 'publication_date',
             'total_copies', 'available_copies',
-            'library', 'authors', 'categories',
+            'library', 'libraries', 'authors', 'categories',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['publication_date']
 
     def validate_title(self, value):
         if not value.strip():
@@ -448,81 +475,125 @@ class BookSerializer(serializers.ModelSerializer):
         if total is not None and available is not None and available > total:
             raise serializers.ValidationError("Available copies cannot exceed total copies.")
 
+        libraries = self._validate_libraries(data)
+        if libraries is not None:
+            data['libraries'] = libraries
         return data
 
-    def _get_or_create_library(self, lib_data):
-        name = lib_data.get('name', '').strip()
-        if not name:
-            raise serializers.ValidationError("Library name is required.")
-
-        library, _ = Library.objects.get_or_create(name=name)
-        return library
-
-    def _get_or_create_author(self, author_data):
-        fname = author_data.get('first_name', '').strip()
-        lname = author_data.get('last_name', '').strip()
-        bdate = author_data.get('birth_date')
-
-        if not fname or not lname:
-            raise serializers.ValidationError("Author must include first_name and last_name.")
+    def _validate_libraries(self, data):
+        # `library` and `libraries` merged and resolved here, so a missing or
+        # unknown library is a field error like any other
+        lib_list = self._pop_libraries(data)
+        if not lib_list:
+            if self.instance is None:
+                raise serializers.ValidationError({"libraries": ["At least one library is required."]})
+            return None
+        try:
+            return self._get_libraries(lib_list)
+        except ValidationError as e:
+            raise serializers.ValidationError({"libraries": e.detail})
+
+    def to_representation(self, instance):
+        # Relations are write-only inputs; on the way out they are read from
+        # the caches prefetched by BookViewSet
+        data = super().to_representation(instance)
+        data['libraries'] = [
+            {"library_id": library.library_id, "name": library.name}
+            for library in instance.libraries.all()
+        ]
+        data['authors'] = [f"{a.first_name} {a.last_name}" for a in instance.authors.all()]
+        data['categories'] = [c.name for c in instance.categories.all()]
+        data['stats'] = self._stats(instance)
+        return data
 
-        author, _ = Author.objects.get_or_create(
-            first_name__iexact=fname,
-            last_name__iexact=lname,
-            birth_date=bdate,
-            defaults={
+    def _stats(self, instance):
+        # BookStats row (select_related by BookViewSet)
+        try:
+            book_stats = instance.stats
+        except BookStats.DoesNotExist:
+            book_stats = BookStats(book=instance)
+        return {
+            "review_count": book_stats.review_count,
+            "avg_rating": round(book_stats.avg_rating, 2) if book_stats.avg_rating is not None else None,
+            "total_borrows": book_stats.total_borrows,
+            "active_borrows": book_stats.active_borrows,
+        }
+
+    def validate_authors(self, value):
+        authors = []
+        for author_data in value:
+            fname = str(author_data.get('first_name', '')).strip()
+            lname = str(author_data.get('last_name', '')).strip()
+            if not fname or not lname or not author_data.get('birth_date'):
+                raise serializers.ValidationError("Author must include first_name, last_name and birth_date.")
+            authors.append({
+                **author_data,
                 'first_name': fname,
                 'last_name': lname,
-                'birth_date': bdate,
-                'nationality': author_data.get('nationality'),
-                'biography': author_data.get('biography')
-            }
-        )
-        return author
-
-    def _get_or_create_category(self, cat_data):
-        name = cat_data.get('name', '').strip()
-        if not name:
-            raise serializers.ValidationError("Category name is required.")
-
-        category, _ = Category.objects.get_or_create(
-            name__iexact=name,
-            defaults={
-                'name': name,
-                'description': cat_data.get('description')
-            }
-        )
-        return category
+                'birth_date': serializers.DateField().to_internal_value(author_data['birth_date'])
+            })
+        return authors
+
+    def validate_categories(self, value):
+        categories = []
+        for cat_data in value:
+            name = str(cat_data.get('name', '')).strip()
+            if not name:
+                raise serializers.ValidationError("Category name is required.")
+            categories.append({**cat_data, 'name': name})
+        return categories
+
+    def _get_libraries(self, lib_list):
+        # Distinct libraries, resolved by id or name in a single query
+        libraries = catalog.resolve_libraries(lib_list)
+        return list({lib.pk: lib for lib in libraries.values()}.values())
+
+    def _pop_libraries(self, validated_data):
+        lib_list = validated_data.pop('libraries', None)
+        lib_data = validated_data.pop('library', None)
+        if lib_data:
+            lib_list = (lib_list or []) + [lib_data]
+        return lib_list
+
+    # Authors and categories are matched case-insensitively and the missing
+    # ones created in one batch (see catalog.py)
+    def _get_or_create_authors(self, author_list):
+        authors = catalog.resolve_authors(author_list)
+        return [authors[catalog.author_key(a)] for a in author_list]
+
+    def _get_or_create_categories(self, category_list):
+        categories = catalog.resolve_categories(category_list)
+        return [categories[catalog.category_key(c)] for c in category_list]
 
     def create(self, validated_data):
-        library_data = validated_data.pop('library')
+        libraries = validated_data.pop('libraries')
         author_list = validated_data.pop('authors')
         category_list = validated_data.pop('categories')
 
-        library = self._get_or_create_library(library_data)
-        authors = [self._get_or_create_author(a) for a in author_list]
-        categories = [self._get_or_create_category(c) for c in category_list]
-
-        book = Book.objects.create(library=library, **validated_data)
-        book.authors.set(authors)
-        book.categories.set(categories)
+        with transaction.atomic():
+            authors = self._get_or_create_authors(author_list)
+            categories = self._get_or_create_categories(category_list)
+            book = Book.objects.create(**validated_data)
+            BookLibrary.objects.bulk_create(
+                [BookLibrary(book=book, library=library) for library in libraries]
+            )
+            book.authors.set(authors)
+            book.categories.set(categories)
         return book
 
     def update(self, instance, validated_data):
-        library_data = validated_data.pop('library', None)
+        libraries = validated_data.pop('libraries', None)
         author_list = validated_data.pop('authors', None)
         category_list = validated_data.pop('categories', None)
 
-        if library_data:
-            instance.library = self._get_or_create_library(library_data)
+        if libraries:
+            instance.libraries.set(libraries)
 
         if author_list:
-            authors = [self._get_or_create_author(a) for a in author_list]
-            instance.authors.set(authors)
+            instance.authors.set(self._get_or_create_authors(author_list))
 
         if category_list:
-            categories = [self._get_or_create_category(c) for c in category_list]
-            instance.categories.set(categories)
+            instance.categories.set(self._get_or_create_categories(category_list))
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -532,12 +603,26 @@ class BookSerializer(serializers.ModelSerializer):
 
     def delete(self, instance):
         # Clean related data
-        instance.reviews.all().delete()
-        instance.borrowings.all().delete()
+        instance.review_set.all().delete()
+        instance.borrowing_set.all().delete()
         instance.authors.clear()
         instance.categories.clear()
         instance.delete()
 
+# Bulk book upsert item serializer
+class BulkBookItemSerializer(BookSerializer):
+    # One book of a bulk upsert; isbn is the upsert key, so an existing
+    # isbn is not a validation error here
+    class Meta(BookSerializer.Meta):
+        extra_kwargs = {'isbn': {'validators': []}}
+
+    def _validate_libraries(self, data):
+        # Looked up for the whole batch by catalog.bulk_upsert_books
+        lib_list = self._pop_libraries(data)
+        if not lib_list:
+            raise serializers.ValidationError({"libraries": ["At least one library is required."]})
+        return lib_list
+
 # Borrowing Serializer
 class BorrowingSerializer(serializers.ModelSerializer):
     borrowing_id = serializers.IntegerField(read_only=True)
@@ -550,9 +635,12 @@ class BorrowingSerializer(serializers.ModelSerializer):
         model = Borrowing
         fields = ['borrowing_id', 'borrow_date', 'due_date', 'return_date', 'late_fee', 'member', 'book', 'created_at', 'updated_at']
         read_only_fields = ['borrow_date', 'due_date']
+        # (member, book) uniqueness is checked by circulation.borrow_book,
+        # with the same messages as bulk checkout
+        validators = []
 
     def validate_return_date(self, value):
-        if value and value > timezone.now().date():
+        if value and value > timezone.now():
             raise serializers.ValidationError("Return date cannot be in the future.")
         return value
 
@@ -562,8 +650,8 @@ class BorrowingSerializer(serializers.ModelSerializer):
         return float(round(value, 2)) if value is not None else None
 
     def validate(self, data):
-        member, book = data['member'], data['book']
-        return_date = data['return_date']
+        member = data.get('member', getattr(self.instance, 'member', None))
+        book = data.get('book', getattr(self.instance, 'book', None))
 
         # Check if member exists
         if not Member.objects.filter(pk=member.pk).exists():
@@ -581,46 +669,42 @@ class BorrowingSerializer(serializers.ModelSerializer):
                 "code": 400
             })
 
-        #Maximum concurrent borrows: 10
-        limit = 10
-        active = Borrowing.objects.filter(member=member, return_date__isnull=True).count()
-        if active >= limit:
-            raise serializers.ValidationError({
-                "status": "error",
-                "message": f"Member has reached borrowing limit ({limit}).",
-                "code": 400
-            })
-        # Prevent borrowing already borrowed book by same member
-        if Borrowing.objects.filter(member=member, book=book, return_date__isnull=True).exists():
-            raise serializers.ValidationError({
-                "status": "error",
-                "message": "This book is already borrowed by the member and not returned.",
-                "code": 400
-            })
-
-        # Ensure book availability
-        if self.instance is None and book.available_copies <= 0:
-            raise serializers.ValidationError(f"The book '{book.title}' is currently not available.")
+        # Borrow limit, duplicate borrow and availability are enforced
+        # atomically by circulation.borrow_book when the borrowing is saved
 
         # Return date logic (must be after borrow_date)
-        if data.get('return_date') and data['return_date'] < data.get('borrow_date', timezone.now().date()):
+        borrow_date = self.instance.borrow_date if self.instance else timezone.now()
+        if data.get('return_date') and data['return_date'] < borrow_date:
             raise serializers.ValidationError("Return date cannot be before borrow date.")
 
         return data
 
     def create(self, validated_data):
-        book = validated_data['book']
-        book.available_copies -= 1
-        book.save()
-        return super().create(validated_data)
+        return circulation.borrow_book(**validated_data)
 
     def update(self, instance, validated_data):
-        return_date = validated_data.get('return_date')
-        if return_date and not instance.return_date:
-            book = instance.book
-            book.available_copies += 1
-            book.save()
-        return super().update(instance, validated_data)
+        return circulation.update_borrowing(instance, **validated_data)
+
+
+# Bulk circulation item serializers
+# Shape checks only (no queries); the circulation rules for a whole batch
+# are applied set-based by circulation.bulk_borrow / bulk_return
+class BulkCheckoutItemSerializer(serializers.Serializer):
+    member = serializers.IntegerField(min_value=1)
+    book = serializers.IntegerField(min_value=1)
+
+class BulkReturnItemSerializer(serializers.Serializer):
+    borrowing = serializers.IntegerField(min_value=1)
+    return_date = serializers.DateTimeField(required=False, allow_null=True)
+    late_fee = serializers.FloatField(required=False, allow_null=True, min_value=0)
+
+    def validate_return_date(self, value):
+        if value and value > timezone.now():
+            raise serializers.ValidationError("Return date cannot be in the future.")
+        return value
+
+    def validate_late_fee(self, value):
+        return float(round(value, 2)) if value is not None else None
 
 
 # Review Serializer
@@ -678,14 +762,43 @@ class ReviewSerializer(serializers.ModelSerializer):
                 })
         return data
 
+    # BookStats are updated in the same transaction as the review
     def create(self, validated_data):
-        return super().create(validated_data)
+        with transaction.atomic():
+            review = super().create(validated_data)
+            stats.record_review(review.book_id, 1, review.rating)
+        return review
 
     def update(self, instance, validated_data):
+        old_book_id, old_rating = instance.book_id, instance.rating
         instance.review_date = timezone.now().date()
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
-        instance.save()
-        return instance
\ No newline at end of file
+        with transaction.atomic():
+            instance.save()
+            if instance.book_id != old_book_id:
+                stats.record_review(old_book_id, -1, -old_rating)
+                stats.record_review(instance.book_id, 1, instance.rating)
+            elif instance.rating != old_rating:
+                stats.record_review(instance.book_id, 0, instance.rating - old_rating)
+        return instance
+
+# Analytics query parameters
+class AnalyticsParamsSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    limit = serializers.IntegerField(required=False, default=100, min_value=1)
+
+    def validate_limit(self, value):
+        return min(value, settings.API_MAX_PAGE_SIZE)
+
+    def validate(self, data):
+        if data.get('start') and data.get('end') and data['start'] > data['end']:
+            raise serializers.ValidationError("start must not be after end.")
+        return data
+
+class DailyCirculationParamsSerializer(AnalyticsParamsSerializer):
+    limit = None
+    library = serializers.IntegerField(required=False, min_value=1)
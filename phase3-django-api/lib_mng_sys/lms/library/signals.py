@@ -0,0 +1,125 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import autocomplete, stats
+from .cache import catalog_cache, WATCHED_MODELS
+from .models import (
+    Address, Author, Book, BookAuthor, BookCategory, BookLibrary, BookStats, Borrowing, Category,
+    ContactNumber, Library, Member, Review
+)
+
+# Catalog cache invalidation.
+# post_save/post_delete cover the catalog models and direct writes to the
+# through tables; m2m_changed covers book.authors.set(), .add(), .clear()
+# etc., which are sent with the through model as sender.
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_catalog_on_write(sender, **kwargs):
+    if sender.__name__ in WATCHED_MODELS and sender._meta.app_label == 'library':
+        catalog_cache.invalidate_model(sender.__name__)
+
+
+@receiver(m2m_changed, sender=BookAuthor)
+@receiver(m2m_changed, sender=BookCategory)
+@receiver(m2m_changed, sender=BookLibrary)
+def invalidate_catalog_on_m2m_change(sender, action, **kwargs):
+    if action.startswith('post_'):
+        catalog_cache.invalidate_model(sender.__name__)
+
+
+# Through rows have no updated_at of their own, so linking or unlinking a
+# book touches Book.updated_at; ETags/Last-Modified (conditional.py) then
+# change for every payload that embeds the book.
+
+def touch_books(book_ids):
+    if book_ids:
+        Book.objects.filter(pk__in=book_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=BookAuthor)
+@receiver(post_save, sender=BookCategory)
+@receiver(post_save, sender=BookLibrary)
+@receiver(post_delete, sender=BookAuthor)
+@receiver(post_delete, sender=BookCategory)
+@receiver(post_delete, sender=BookLibrary)
+def touch_book_on_through_write(sender, instance, **kwargs):
+    touch_books([instance.book_id])
+
+
+@receiver(m2m_changed, sender=BookAuthor)
+@receiver(m2m_changed, sender=BookCategory)
+@receiver(m2m_changed, sender=BookLibrary)
+def touch_book_on_m2m_change(sender, instance, action, pk_set, **kwargs):
+    if isinstance(instance, Book):
+        # book.authors.add(...)
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_books([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        # author.books.add(...), library.books.remove(...): pk_set holds books
+        touch_books(pk_set)
+    elif action == 'pre_clear':
+        # author.books.clear(): the links are gone by post_clear
+        fk_name = instance._meta.model_name
+        touch_books(list(sender.objects.filter(**{fk_name: instance}).values_list('book_id', flat=True)))
+
+
+# Address and ContactNumber have no updated_at either: writing one touches
+# the libraries and members that embed it.
+
+@receiver(post_save, sender=Address)
+@receiver(post_delete, sender=Address)
+def touch_owners_on_address_write(sender, instance, **kwargs):
+    Library.objects.filter(campus_location_id=instance.pk).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=ContactNumber)
+@receiver(post_delete, sender=ContactNumber)
+def touch_owners_on_contact_write(sender, instance, **kwargs):
+    now = timezone.now()
+    Library.objects.filter(phone_number_id=instance.pk).update(updated_at=now)
+    Member.objects.filter(phone_id=instance.pk).update(updated_at=now)
+
+
+# Autocomplete index (autocomplete.py): labels are (re)indexed once the
+# write commits, so a rolled-back save never shows up as a suggestion.
+
+AUTOCOMPLETE_KINDS = {Book: 'book', Author: 'author', Category: 'category'}
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Category)
+def index_autocomplete_label(sender, instance, **kwargs):
+    kind = AUTOCOMPLETE_KINDS[sender]
+    transaction.on_commit(lambda: autocomplete.index_objects(kind, [instance]))
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Category)
+def unindex_autocomplete_label(sender, instance, **kwargs):
+    kind, pk = AUTOCOMPLETE_KINDS[sender], instance.pk
+    transaction.on_commit(lambda: autocomplete.unindex_objects(kind, [pk]))
+
+
+# BookStats (stats.py): a book gets its row when it is created. Deletes,
+# including cascades from members and books, run their receivers inside
+# the delete's transaction; saves are recorded by the code that writes.
+
+@receiver(post_save, sender=Book)
+def create_book_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        BookStats.objects.create(book=instance)
+
+
+@receiver(post_delete, sender=Review)
+def update_stats_on_review_delete(sender, instance, **kwargs):
+    stats.record_review(instance.book_id, -1, -instance.rating, create_missing=False)
+
+
+@receiver(post_delete, sender=Borrowing)
+def update_stats_on_borrowing_delete(sender, instance, **kwargs):
+    stats.record_borrowing_deleted(instance)
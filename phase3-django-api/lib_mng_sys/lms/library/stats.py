@@ -0,0 +1,164 @@
+import math
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, PositiveIntegerField, Q, Sum, When
+from django.utils import timezone
+
+from .cache import catalog_cache
+from .models import Book, BookStats, Borrowing, Review
+
+# Incremental maintenance of BookStats (review count/sum/average, total
+# and active borrows per book).
+#
+# Every review or borrowing write applies its delta with a single
+# "UPDATE book_stats SET x = x + d" from inside the transaction of that
+# write (circulation.py, ReviewSerializer, the post_delete receivers in
+# signals.py), so the aggregates commit or roll back with it. Rows are
+# created with their book; `manage.py rebuild_book_stats` recomputes them
+# from scratch.
+#
+# Writes that bypass those paths (a bulk .update(), an admin edit, raw SQL)
+# make the rows drift. `manage.py reconcile_book_stats`, meant to run from
+# cron, recomputes them batch by batch and rewrites only the rows that are
+# off (reconcile() below).
+
+COUNTER_FIELDS = ('total_borrows', 'active_borrows')
+
+
+def _apply(deltas, create_missing=True):
+    # deltas: {book_id: {field: delta}}; one UPDATE for the whole batch
+    deltas = {pk: fields for pk, fields in deltas.items() if any(fields.values())}
+    if not deltas:
+        return
+    values = {}
+    for field in COUNTER_FIELDS:
+        changes = {pk: fields[field] for pk, fields in deltas.items() if fields.get(field)}
+        if changes:
+            values[field] = Case(
+                *[When(pk=pk, then=F(field) + delta) for pk, delta in changes.items()],
+                default=F(field),
+                output_field=PositiveIntegerField(),
+            )
+    _update(list(deltas), values, create_missing)
+
+
+def _update(book_ids, values, create_missing):
+    rows = BookStats.objects.filter(pk__in=book_ids)
+    updated = rows.update(**values, updated_at=timezone.now())
+    if updated < len(book_ids) and create_missing:
+        # Books created before BookStats existed, or by a raw insert
+        BookStats.objects.bulk_create([BookStats(book_id=pk) for pk in book_ids], ignore_conflicts=True)
+        rows.update(**values, updated_at=timezone.now())
+    # queryset.update() sends no post_save, so invalidate explicitly
+    catalog_cache.invalidate_model('BookStats')
+
+
+def record_borrows(counts):
+    # counts: {book_id: number of new borrowings}
+    _apply({pk: {'total_borrows': n, 'active_borrows': n} for pk, n in counts.items()})
+
+
+def record_returns(counts):
+    # counts: {book_id: number of borrowings returned}
+    _apply({pk: {'active_borrows': -n} for pk, n in counts.items()})
+
+
+def record_borrowing_deleted(borrowing):
+    _apply({borrowing.book_id: {
+        'total_borrows': -1,
+        'active_borrows': -1 if borrowing.return_date is None else 0,
+    }}, create_missing=False)
+
+
+def record_review(book_id, count_delta, rating_delta, create_missing=True):
+    if not count_delta and not rating_delta:
+        return
+    # avg_rating comes first: MySQL evaluates SET assignments left to right
+    # with the new values of earlier columns, other backends with the old
+    # ones; listed first, it reads the old values everywhere
+    values = {
+        'avg_rating': Case(
+            When(Q(review_count__gt=-count_delta),
+                 then=(F('rating_sum') + rating_delta) / (F('review_count') + count_delta)),
+            default=None,
+            output_field=FloatField(),
+        ),
+        'review_count': F('review_count') + count_delta,
+        'rating_sum': F('rating_sum') + rating_delta,
+    }
+    _update([book_id], values, create_missing)
+
+
+STAT_FIELDS = ('review_count', 'rating_sum', 'avg_rating', 'total_borrows', 'active_borrows')
+
+
+def computed_stats(book_ids=None):
+    # {book_id: {field: value}} recomputed from the review and borrowing
+    # tables, one GROUP BY per table; books without rows are absent
+    reviews = Review.objects.order_by()
+    borrowings = Borrowing.objects.order_by()
+    if book_ids is not None:
+        reviews, borrowings = reviews.filter(book_id__in=book_ids), borrowings.filter(book_id__in=book_ids)
+
+    computed = {}
+    for row in reviews.values('book_id').annotate(count=Count('pk'), total=Sum('rating')):
+        computed[row['book_id']] = {
+            'review_count': row['count'],
+            'rating_sum': row['total'] or 0.0,
+            'avg_rating': (row['total'] or 0.0) / row['count'],
+        }
+    for row in borrowings.values('book_id').annotate(
+            total=Count('pk'), active=Count('pk', filter=Q(return_date__isnull=True))):
+        computed.setdefault(row['book_id'], {}).update(total_borrows=row['total'], active_borrows=row['active'])
+    return computed
+
+
+def stats_values(computed):
+    return {
+        'review_count': computed.get('review_count', 0),
+        'rating_sum': computed.get('rating_sum', 0.0),
+        'avg_rating': computed.get('avg_rating'),
+        'total_borrows': computed.get('total_borrows', 0),
+        'active_borrows': computed.get('active_borrows', 0),
+    }
+
+
+def _differs(current, expected):
+    if isinstance(current, float) and isinstance(expected, float):
+        return not math.isclose(current, expected, rel_tol=1e-9)
+    return current != expected
+
+
+def reconcile(batch_size=1000):
+    # Fixes drifted or missing BookStats rows; returns how many were
+    # written. Each batch of books locks its stats rows before recomputing
+    # them, so a concurrent borrow/return/review either committed first (and
+    # is counted) or applies its delta after this batch commits.
+    fixed, last_id = 0, 0
+    while True:
+        book_ids = list(Book.objects.order_by('pk').filter(pk__gt=last_id).values_list('pk', flat=True)[:batch_size])
+        if not book_ids:
+            break
+        last_id = book_ids[-1]
+
+        with transaction.atomic():
+            current = {row.book_id: row for row in BookStats.objects.select_for_update().filter(book_id__in=book_ids)}
+            computed = computed_stats(book_ids)
+            missing, drifted = [], []
+            for book_id in book_ids:
+                values = stats_values(computed.get(book_id, {}))
+                row = current.get(book_id)
+                if row is None:
+                    missing.append(BookStats(book_id=book_id, **values))
+                elif any(_differs(getattr(row, field), value) for field, value in values.items()):
+                    for field, value in values.items():
+                        setattr(row, field, value)
+                    row.updated_at = timezone.now()
+                    drifted.append(row)
+            BookStats.objects.bulk_create(missing, ignore_conflicts=True)
+            BookStats.objects.bulk_update(drifted, [*STAT_FIELDS, 'updated_at'])
+            fixed += len(missing) + len(drifted)
+
+    if fixed:
+        catalog_cache.invalidate_model('BookStats')
+    return fixed
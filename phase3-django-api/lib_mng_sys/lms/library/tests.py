@@ -1,3 +1,1312 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import threading
+import time
+import warnings
+from datetime import date
+from itertools import count
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, router
+from django.dispatch import receiver
+from django.test import TestCase, TransactionTestCase, Client, override_settings, skipUnlessDBFeature
+from django.test.signals import setting_changed
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from lms.mysql_pool.pool import ConnectionPool, PoolTimeout
 
 # Create your tests here.
+from . import autocomplete, fees, rollups, routers, search, serializers
+from .cache import catalog_cache
+from .models import (
+    Address, ContactNumber, Library, Author, Member, Category, Book, BookLibrary,
+    BookStats, Borrowing, DailyCirculation, Review
+)
+
+_seq = count(1)
+
+# Test data helpers
+def make_library():
+    n = next(_seq)
+    return Library.objects.create(
+        name=f"Library {n}",
+        campus_location=Address.objects.create(street=f"{n} Main Road", district="Khurda", state="Odisha", pin="751001"),
+        contact_email=f"library{n}@example.com",
+        phone_number=ContactNumber.objects.create(number=f"+9194370{n:05d}", type="work"),
+    )
+
+def make_author():
+    n = next(_seq)
+    return Author.objects.create(
+        first_name=f"First{n}", last_name=f"Last{n}", birth_date=date(1970, 1, 1),
+        biography="Biography",
+    )
+
+def make_category():
+    n = next(_seq)
+    return Category.objects.create(name=f"Category {n}", description="Description")
+
+def make_member():
+    n = next(_seq)
+    return Member.objects.create(
+        first_name="Member", last_name=f"No{n}", email=f"member{n}@example.com",
+        phone=ContactNumber.objects.create(number=f"+9198610{n:05d}", type="mobile"),
+        member_type="student",
+    )
+
+def make_book(authors=(), categories=(), libraries=(), copies=5):
+    n = next(_seq)
+    book = Book.objects.create(
+        title=f"Book {n}", isbn=f"978{n:010d}", publication_date=date(2000, 1, 1),
+        total_copies=copies, available_copies=copies,
+    )
+    book.authors.set(authors)
+    book.categories.set(categories)
+    book.libraries.set(libraries)
+    return book
+
+
+class LibraryTestCase(TestCase):
+    # Start every test with an empty catalog cache so query counts are misses
+    def setUp(self):
+        catalog_cache.clear()
+
+
+class LibraryQueryCountTests(LibraryTestCase):
+    def populate(self, libraries, books_per_library):
+        authors = [make_author() for _ in range(2)]
+        categories = [make_category() for _ in range(2)]
+        for _ in range(libraries):
+            library = make_library()
+            for _ in range(books_per_library):
+                make_book(authors, categories, [library])
+
+    def assert_list_queries(self, expected):
+        with self.assertNumQueries(expected):
+            response = self.client.get("/api/libraries/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_list_query_count_is_constant(self):
+        # 4 ETag validators + exists + libraries + book_set + authors + categories
+        self.populate(libraries=2, books_per_library=1)
+        self.assert_list_queries(9)
+
+        self.populate(libraries=10, books_per_library=5)
+        body = self.assert_list_queries(9)
+        self.assertEqual(len(body["data"]), 12)
+        self.assertEqual(len(body["data"][-1]["books"]), 5)
+        self.assertEqual(len(body["data"][-1]["books"][0]["authors"]), 2)
+
+    def test_library_without_books(self):
+        make_library()
+        # nested prefetches are skipped when there are no books
+        body = self.assert_list_queries(7)
+        self.assertEqual(body["data"][0]["books"], {"message": "No books available in this library."})
+
+    def test_retrieve_query_count(self):
+        self.populate(libraries=1, books_per_library=4)
+        library = Library.objects.get()
+        with self.assertNumQueries(8):
+            response = self.client.get(f"/api/libraries/{library.pk}/")
+        self.assertEqual(len(response.json()["books"]), 4)
+
+
+class AuthorQueryCountTests(LibraryTestCase):
+    def populate(self, authors, books_per_author):
+        categories = [make_category() for _ in range(3)]
+        for _ in range(authors):
+            author = make_author()
+            for _ in range(books_per_author):
+                make_book([author], categories)
+
+    def test_list_query_count_is_constant(self):
+        # 3 ETag validators + authors + books + categories
+        self.populate(authors=2, books_per_author=1)
+        with self.assertNumQueries(6):
+            self.client.get("/api/authors/")
+
+        self.populate(authors=20, books_per_author=4)
+        with self.assertNumQueries(6):
+            response = self.client.get("/api/authors/")
+        data = response.json()["data"]
+        self.assertEqual(len(data), 22)
+        book = data[-1]["books"][0]
+        self.assertEqual(set(book), {"book_id", "title", "categories"})
+        self.assertEqual(len(book["categories"]), 3)
+
+    def test_retrieve_query_count(self):
+        self.populate(authors=1, books_per_author=6)
+        author = Author.objects.get()
+        with self.assertNumQueries(6):
+            response = self.client.get(f"/api/authors/{author.pk}/")
+        books = response.json()["data"]["books"]
+        self.assertEqual(len(books), 6)
+        self.assertEqual(sorted(b["book_id"] for b in books), sorted(author.books.values_list("book_id", flat=True)))
+
+
+class BookQueryCountTests(LibraryTestCase):
+    def test_list_query_count_is_constant(self):
+        # 5 ETag validators + books (+ stats join) + libraries + authors + categories
+        library, author, category = make_library(), make_author(), make_category()
+        make_book([author], [category], [library])
+        with self.assertNumQueries(9):
+            self.client.get("/api/books/")
+
+        for _ in range(15):
+            make_book([make_author(), author], [category], [library, make_library()])
+        with self.assertNumQueries(9):
+            response = self.client.get("/api/books/")
+        data = response.json()["data"]
+        self.assertEqual(len(data), 16)
+        self.assertEqual(len(data[-1]["libraries"]), 2)
+        self.assertEqual(len(data[-1]["authors"]), 2)
+
+    def test_retrieve_query_count(self):
+        book = make_book([make_author()], [make_category()], [make_library()])
+        with self.assertNumQueries(9):
+            response = self.client.get(f"/api/books/{book.pk}/")
+        self.assertEqual(response.json()["libraries"][0]["library_id"], book.libraries.get().library_id)
+
+    def test_create_attaches_libraries(self):
+        first, second = make_library(), make_library()
+        author = make_author()
+        response = self.client.post("/api/books/", {
+            "title": "Gitanjali",
+            "isbn": "9780000012345",
+            "publication_date": "1910-08-14",
+            "total_copies": 3,
+            "available_copies": 3,
+            "library": {"library_id": first.library_id},
+            "libraries": [{"name": second.name}],
+            "authors": [{"first_name": author.first_name, "last_name": author.last_name,
+                         "birth_date": "1970-01-01"}],
+            "categories": [{"name": "Poetry", "description": "Verse"}],
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 201, response.content)
+        book = Book.objects.get(isbn="9780000012345")
+        self.assertEqual(set(book.libraries.all()), {first, second})
+        self.assertEqual(list(book.authors.all()), [author])
+
+    def test_create_rejects_unknown_library(self):
+        response = self.client.post("/api/books/", {
+            "title": "Gitanjali",
+            "isbn": "9780000012345",
+            "publication_date": "1910-08-14",
+            "total_copies": 3,
+            "available_copies": 3,
+            "library": {"name": "Nowhere"},
+            "authors": [],
+            "categories": [],
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Book.objects.exists())
+
+
+class BookValidationTests(LibraryTestCase):
+    def create(self, **extra):
+        payload = {
+            "title": "Gitanjali", "isbn": "9780000000017", "publication_date": "2001-01-01",
+            "total_copies": 2, "available_copies": 2,
+            "authors": [{"first_name": "Rabindranath", "last_name": "Tagore", "birth_date": "1861-05-07"}],
+            "categories": [{"name": "Poetry"}],
+            **extra,
+        }
+        return self.client.post("/api/books/", payload, content_type="application/json")
+
+    def test_library_errors_are_keyed_by_field(self):
+        response = self.create(libraries=[{"name": "nope"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"], {"libraries": ["Library not found: nope."]})
+
+        response = self.create()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"], {"libraries": ["At least one library is required."]})
+        self.assertFalse(Book.objects.exists())
+
+    def test_create_links_resolved_libraries(self):
+        library = make_library()
+        response = self.create(library={"library_id": library.pk}, libraries=[{"name": library.name}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(Book.objects.get().libraries.all()), [library])
+
+
+class BulkBookUpsertTests(LibraryTestCase):
+    def book_item(self, n, library, **extra):
+        return {
+            "title": f"Bulk Book {n}", "isbn": f"979{n:010d}", "publication_date": "2001-01-01",
+            "total_copies": 4, "available_copies": 4,
+            "libraries": [{"library_id": library.library_id}],
+            "authors": [{"first_name": "Rabindranath", "last_name": "Tagore", "birth_date": "1861-05-07"},
+                        {"first_name": "Writer", "last_name": f"No{n}", "birth_date": "1980-01-01"}],
+            "categories": [{"name": "Poetry"}, {"name": f"Genre {n}"}],
+            **extra,
+        }
+
+    def post(self, items):
+        return self.client.post("/api/books/bulk/", items, content_type="application/json")
+
+    def test_query_count_does_not_grow_with_batch(self):
+        library = make_library()
+        # savepoint, library + 2x(select, insert, select) for authors and
+        # categories, isbn lookup, book + stats inserts, 3 link inserts, release
+        with self.assertNumQueries(15):
+            response = self.post([self.book_item(n, library) for n in range(1, 4)])
+        self.assertEqual(response.status_code, 200, response.content)
+        with self.assertNumQueries(15):
+            self.post([self.book_item(n, library) for n in range(10, 40)])
+        self.assertEqual(Book.objects.count(), 33)
+        self.assertEqual(Author.objects.filter(last_name="Tagore").count(), 1)
+        self.assertEqual(Category.objects.filter(name="Poetry").get().books.count(), 33)
+
+    def test_upsert_matches_isbn_and_names_case_insensitively(self):
+        library, other = make_library(), make_library()
+        author = Author.objects.create(first_name="Rabindranath", last_name="Tagore",
+                                       birth_date=date(1861, 5, 7), biography="Poet")
+        existing = make_book([author], [], [library])
+        item = self.book_item(1, other, isbn=existing.isbn, title="Renamed", total_copies=9,
+                              available_copies=9)
+        item["authors"][0]["first_name"] = "RABINDRANATH"
+        item["categories"][0]["name"] = "poetry"
+        Category.objects.create(name="Poetry", description="Verse")
+
+        data = self.post([item, self.book_item(2, library)]).json()["data"]
+        self.assertEqual((data["created"], data["updated"]), (1, 1))
+        self.assertEqual(data["results"][0]["book_id"], existing.pk)
+        existing.refresh_from_db()
+        self.assertEqual((existing.title, existing.total_copies), ("Renamed", 9))
+        self.assertEqual(set(existing.libraries.all()), {library, other})
+        self.assertEqual(Author.objects.filter(last_name="Tagore").count(), 1)
+        self.assertEqual(Category.objects.filter(name__iexact="poetry").count(), 1)
+
+    def test_upsert_keeps_copies_on_loan_off_the_shelf(self):
+        library, book = make_library(), make_book(copies=2)
+        for member in (make_member(), make_member()):
+            self.client.post("/api/borrowings/", {"member": member.pk, "book": book.pk},
+                             content_type="application/json")
+        response = self.post([self.book_item(1, library, isbn=book.isbn, total_copies=9, available_copies=9)])
+        self.assertEqual(response.status_code, 200, response.content)
+        book.refresh_from_db()
+        self.assertEqual((book.total_copies, book.available_copies), (9, 7))
+
+        response = self.post([self.book_item(1, library, isbn=book.isbn, total_copies=1, available_copies=1)])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("2 copies on loan", response.json()["message"])
+
+    def test_rejects_invalid_items_without_writing(self):
+        library = make_library()
+        response = self.post([self.book_item(1, library), self.book_item(2, library, libraries=[])])
+        self.assertEqual(response.status_code, 400)
+        response = self.post([self.book_item(1, library), self.book_item(1, library)])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Book.objects.exists())
+
+
+class KeysetPaginationTests(LibraryTestCase):
+    def cursor(self, values, reverse=0):
+        return base64.urlsafe_b64encode(json.dumps({"v": values, "r": reverse}).encode()).decode()
+
+    def test_forward_and_backward_traversal_with_tied_ordering_values(self):
+        books = [make_book() for _ in range(5)]
+        Book.objects.update(created_at=timezone.now())  # every row ties on created_at
+
+        pages, url = [], "/api/books/?page_size=2"
+        while url:
+            body = self.client.get(url).json()
+            pages.append([b["book_id"] for b in body["data"]])
+            url = body["pagination"]["next"]
+        self.assertEqual(pages, [[b.pk for b in books[i:i + 2]] for i in (0, 2, 4)])
+
+        backwards, url = [], body["pagination"]["previous"]
+        while url:
+            body = self.client.get(url).json()
+            backwards.append([b["book_id"] for b in body["data"]])
+            url = body["pagination"]["previous"]
+        self.assertEqual(backwards, pages[1::-1])
+
+    def test_tampered_cursor_is_not_found(self):
+        make_member()
+        for values in ([1, 2], ["notadate", 1], [None, 1], [{}, 1], "v"):
+            for url in ("/api/members/", "/api/reviews/"):
+                with self.subTest(values=values, url=url):
+                    response = self.client.get(url, {"cursor": self.cursor(values)})
+                    self.assertEqual(response.status_code, 404)
+
+
+class BookSearchTests(LibraryTestCase):
+    def search(self, query, **params):
+        return self.client.get("/api/books/search/", {"q": query, **params})
+
+    def test_ranks_title_above_author_and_category_matches(self):
+        library = make_library()
+        tagore = Author.objects.create(first_name="Rabindranath", last_name="Tagore",
+                                       birth_date=date(1861, 5, 7), biography="Poet")
+        poetry = Category.objects.create(name="Bengali Poetry", description="Verse")
+        by_title = make_book([], [], [library])
+        Book.objects.filter(pk=by_title.pk).update(title="Tagore for Beginners")
+        by_author = make_book([tagore], [], [library])
+        by_category = make_book([], [poetry], [library])
+        make_book([make_author()], [make_category()], [library])
+
+        data = self.search("tagore").json()["data"]
+        self.assertEqual([b["book_id"] for b in data], [by_title.pk, by_author.pk])
+        self.assertGreater(data[0]["relevance"], data[1]["relevance"])
+        self.assertEqual(data[1]["authors"], ["Rabindranath Tagore"])
+        self.assertEqual([b["book_id"] for b in self.search("Bengali").json()["data"]], [by_category.pk])
+
+    def test_results_are_paginated_and_follow_writes(self):
+        library, author = make_library(), make_author()
+        books = [make_book([author], [], [library]) for _ in range(5)]
+        response = self.search(author.last_name, page_size=2).json()
+        seen = [b["book_id"] for b in response["data"]]
+        while response["pagination"]["next"]:
+            response = self.client.get(response["pagination"]["next"]).json()
+            seen += [b["book_id"] for b in response["data"]]
+        self.assertEqual(seen, [b.pk for b in books])
+
+        # The fallback index is rebuilt once the catalog changes
+        new_book = make_book([author], [], [library])
+        self.assertIn(new_book.pk, [b["book_id"] for b in self.search(author.last_name, page_size=10).json()["data"]])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.search(" ").status_code, 400)
+
+    def test_writes_during_an_index_rebuild_are_not_lost(self):
+        library, author = make_library(), make_author()
+        make_book([author], [], [library])
+        build, written = search.InvertedIndex.build, []
+
+        def build_then_write():
+            index = build()
+            if not written:  # a book committed while the scan was running
+                written.append(make_book([author], [], [library]))
+            return index
+
+        with mock.patch.object(search.InvertedIndex, "build", side_effect=build_then_write):
+            found = [b["book_id"] for b in self.search(author.last_name).json()["data"]]
+        self.assertIn(written[0].pk, found)
+
+
+class AutocompleteTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        autocomplete.reset()
+
+    def suggest(self, query, **params):
+        return self.client.get("/api/autocomplete/", {"q": query, **params}).json()["data"]
+
+    def test_prefix_and_substring_matches_without_queries(self):
+        author = Author.objects.create(first_name="Rabindranath", last_name="Tagore",
+                                       birth_date=date(1861, 5, 7), biography="Poet")
+        book = make_book()
+        Book.objects.filter(pk=book.pk).update(title="The Home and the World")
+        Category.objects.create(name="Homeopathy", description="Medicine")
+        self.suggest("x")  # builds the index
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest("tag"),
+                             [{"type": "author", "id": author.pk, "label": "Rabindranath Tagore"}])
+            self.assertEqual([s["label"] for s in self.suggest("home")], ["Homeopathy", "The Home and the World"])
+            self.assertEqual([s["type"] for s in self.suggest("home", type="book")], ["book"])
+            self.assertEqual([s["label"] for s in self.suggest("ndran")], ["Rabindranath Tagore"])
+
+    def test_index_follows_committed_writes(self):
+        library = make_library()
+        self.suggest("x")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/books/", {
+                "title": "Gitanjali", "isbn": "9780000012345", "publication_date": "1910-08-14",
+                "total_copies": 3, "available_copies": 3, "library": {"library_id": library.library_id},
+                "authors": [{"first_name": "Rabindranath", "last_name": "Tagore", "birth_date": "1861-05-07"}],
+                "categories": [],
+            }, content_type="application/json")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual([s["type"] for s in self.suggest("gita")], ["book"])
+        self.assertEqual([s["type"] for s in self.suggest("tagore")], ["author"])
+
+        book = Book.objects.get(isbn="9780000012345")
+        with self.captureOnCommitCallbacks(execute=True):
+            book.title = "Gora"
+            book.save()
+        self.assertEqual(self.suggest("gita"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+        self.assertEqual(self.suggest("gora"), [])
+
+    def test_incremental_updates_match_a_fresh_build(self):
+        entries = [("book", n, f"Title {n} of {n % 7} volumes") for n in range(200)]
+        index = autocomplete.AutocompleteIndex.build(entries[:100])
+        for kind, pk, label in entries[100:]:
+            index.add(kind, pk, label)
+        for pk in range(0, 200, 3):
+            index.remove("book", pk)
+        fresh = autocomplete.AutocompleteIndex.build(e for e in entries if e[1] % 3)
+        for query in ("title 1", "of 3", "volumes", "tle 5", "itle 19"):
+            self.assertEqual(index.search(query, 50), fresh.search(query, 50))
+
+        index.prefixes.pop()  # a missing entry is skipped, not an IndexError
+        for kind, pk, _ in entries:
+            index.remove(kind, pk)
+        self.assertEqual((len(index), len(index.prefixes), index.trigrams), (0, 0, {}))
+
+    def test_writes_during_a_rebuild_are_replayed(self):
+        gone = make_book()
+        self.suggest("x")
+        load_entries, written = autocomplete.load_entries, []
+
+        def scan():
+            entries = list(load_entries())  # read before the writes commit
+            with self.captureOnCommitCallbacks(execute=True):
+                written.append(make_book())
+                gone.delete()
+            yield from entries
+
+        with mock.patch.object(autocomplete, "load_entries", scan):
+            autocomplete._rebuild()
+        self.assertEqual([s["id"] for s in self.suggest(written[0].title)], [written[0].pk])
+        self.assertEqual(self.suggest(gone.title), [])
+
+
+class AsyncCatalogTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.library, self.author, self.category = make_library(), make_author(), make_category()
+        self.books = [make_book([self.author], [self.category], [self.library]) for _ in range(3)]
+
+    async def test_payloads_match_the_sync_endpoints(self):
+        for resource in ("libraries", "authors", "categories", "books"):
+            sync = await sync_to_async(self.client.get)(f"/api/{resource}/")
+            response = await self.async_client.get(f"/api/async/{resource}/")
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(response.json()["data"], sync.json()["data"])
+            self.assertEqual(response.json()["message"], sync.json()["message"])
+
+        book = self.books[0]
+        sync = await sync_to_async(self.client.get)(f"/api/books/{book.pk}/")
+        response = await self.async_client.get(f"/api/async/books/{book.pk}/")
+        self.assertEqual(response.json(), sync.json())
+        response = await self.async_client.get(f"/api/async/authors/{self.author.pk}/")
+        self.assertEqual(response.json()["data"]["author_id"], self.author.pk)
+        response = await self.async_client.get("/api/async/books/999999/")
+        self.assertEqual((response.status_code, response.json()["message"]), (404, "Book not found."))
+
+    async def test_keyset_pages(self):
+        response = await self.async_client.get("/api/async/books/", {"page_size": 2})
+        first = response.json()
+        self.assertEqual([b["book_id"] for b in first["data"]], [b.pk for b in self.books[:2]])
+        self.assertIn("/api/async/books/", first["pagination"]["next"])
+        response = await self.async_client.get(first["pagination"]["next"])
+        self.assertEqual([b["book_id"] for b in response.json()["data"]], [self.books[2].pk])
+
+    async def test_cache_and_conditional_get(self):
+        first = await self.async_client.get("/api/async/categories/")
+        self.assertEqual(first["X-Cache"], "MISS")
+        second = await self.async_client.get("/api/async/categories/")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.json(), first.json())
+        response = await self.async_client.get("/api/async/categories/", headers={"if-none-match": first["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+        await sync_to_async(make_category)()
+        response = await self.async_client.get("/api/async/categories/", headers={"if-none-match": first["ETag"]})
+        self.assertEqual((response.status_code, response["X-Cache"]), (200, "MISS"))
+        self.assertEqual(len(response.json()["data"]), 2)
+
+
+class CatalogCacheTests(LibraryTestCase):
+    def test_second_read_is_served_from_cache(self):
+        make_book([make_author()], [make_category()], [make_library()])
+        first = self.client.get("/api/books/")
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/books/")
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(first.json(), second.json())
+
+    def test_save_invalidates_dependent_resources(self):
+        book = make_book([make_author()], [make_category()], [make_library()])
+        self.client.get("/api/books/")
+        self.client.get("/api/categories/")
+        book.title = "Renamed"
+        book.save()
+        self.assertEqual(self.client.get("/api/books/")["X-Cache"], "MISS")
+        response = self.client.get("/api/categories/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["data"][0]["books"][0]["title"], "Renamed")
+
+    def test_through_model_changes_invalidate_precisely(self):
+        library = make_library()
+        book = make_book([make_author()], [make_category()])
+        self.client.get("/api/libraries/")
+        self.client.get("/api/categories/")
+
+        book.libraries.add(library)  # m2m_changed on BookLibrary
+        response = self.client.get("/api/libraries/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.json()["data"][0]["books"]), 1)
+        # categories do not embed libraries
+        self.assertEqual(self.client.get("/api/categories/")["X-Cache"], "HIT")
+
+        BookLibrary.objects.filter(book=book).delete()  # post_delete on BookLibrary
+        response = self.client.get("/api/libraries/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertIn("message", response.json()["data"][0]["books"])
+
+    def test_stats_endpoint(self):
+        make_author()
+        self.client.get("/api/authors/")
+        self.client.get("/api/authors/")
+        data = self.client.get("/api/cache/stats/").json()["data"]
+        self.assertEqual(data["resources"]["author"], {"hits": 1, "misses": 1})
+        self.assertEqual(data["hit_rate"], 0.5)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(TestCase):
+    def make_pool(self, **options):
+        def ping(connection):
+            if not connection.alive:
+                raise OSError("gone away")
+        return ConnectionPool(FakeConnection, ping=ping, **options)
+
+    def test_connections_are_reused(self):
+        pool = self.make_pool(size=2, overflow=0)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        stats = pool.stats()
+        self.assertEqual((stats["connects"], stats["checkouts"], stats["checked_out"], stats["utilization"]),
+                         (1, 2, 1, 0.5))
+
+    def test_overflow_is_closed_on_release_and_checkouts_wait(self):
+        pool = self.make_pool(size=1, overflow=1, timeout=0.05)
+        first, second = pool.acquire(), pool.acquire()
+        self.assertEqual(pool.stats()["overflow_in_use"], 1)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+
+        releaser = threading.Timer(0.01, pool.release, [second])
+        releaser.start()
+        pool.timeout = 5
+        self.assertIs(pool.acquire(), second)
+        releaser.join()
+
+        pool.release(first)
+        pool.release(second)
+        self.assertTrue(second.closed)
+        self.assertFalse(first.closed)
+        stats = pool.stats()
+        self.assertEqual((stats["open"], stats["idle"], stats["waits"], stats["timeouts"]), (1, 1, 2, 1))
+
+    def test_dead_and_old_connections_are_replaced(self):
+        pool = self.make_pool(size=1, overflow=0)
+        dead = pool.acquire()
+        pool.release(dead)
+        dead.alive = False
+        fresh = pool.acquire()
+        self.assertIsNot(fresh, dead)
+        self.assertTrue(dead.closed)
+
+        pool.release(fresh)
+        pool.recycle = 0
+        time.sleep(0.001)
+        self.assertIsNot(pool.acquire(), fresh)
+        stats = pool.stats()
+        self.assertEqual((stats["connects"], stats["ping_failures"], stats["recycled"], stats["open"]), (3, 1, 1, 1))
+
+    def test_broken_connections_free_their_slot(self):
+        pool = self.make_pool(size=1, overflow=0, timeout=0.01)
+        broken = pool.acquire()
+        pool.release(broken, reusable=False)
+        self.assertTrue(broken.closed)
+        self.assertIsNot(pool.acquire(), broken)
+
+    def test_stats_endpoint(self):
+        response = Client().get("/api/db/pool/stats/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.json()["data"], dict)
+
+
+# A second SQLite database standing in for a read replica, registered before
+# the test runner sets up (and migrates) the test databases
+REPLICA = "replica_standin"
+
+
+@receiver(setting_changed)
+def reload_database_settings(*, setting, **kwargs):
+    # The connection handler reads DATABASES once; re-read it for
+    # override_settings(DATABASES=...) below and again when it is undone
+    if setting == "DATABASES":
+        connections.settings = connections.configure_settings(None)
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False, REPLICA_DATABASES=[REPLICA], REPLICA_HEALTH_INTERVAL=0)
+class ReplicaRoutingTests(TransactionTestCase):
+    # 'default' plays the primary and a separate in-memory SQLite database
+    # the replica; it only exists while this class runs. "__all__" rather
+    # than a set naming the replica: the runner validates named aliases
+    # against DATABASES before the override is applied.
+    replica = REPLICA
+    databases = "__all__"
+
+    @classmethod
+    def setUpClass(cls):
+        with warnings.catch_warnings():
+            # Django warns on any DATABASES override; reload_database_settings handles it
+            warnings.simplefilter("ignore", UserWarning)
+            cls.enterClassContext(override_settings(DATABASES={
+                **settings.DATABASES,
+                REPLICA: {"ENGINE": "django.db.backends.sqlite3", "NAME": "file:replica_standin?mode=memory&cache=shared"},
+            }))
+        super().setUpClass()
+        # The router never migrates replicas, so the schema is created here
+        with connections[REPLICA].schema_editor() as editor:
+            for model in apps.get_app_config("library").get_models():
+                editor.create_model(model)
+
+    @classmethod
+    def tearDownClass(cls):
+        replica = connections[REPLICA]
+        if replica.connection is not None:
+            replica.connection.close()  # close() keeps in-memory databases open
+        del connections[REPLICA]
+        super().tearDownClass()
+
+    def tearDown(self):
+        # flush skips the replica too (allow_migrate), so empty it here
+        with connections[REPLICA].cursor() as cursor:
+            for model in apps.get_app_config("library").get_models():
+                cursor.execute(f'DELETE FROM "{model._meta.db_table}"')
+
+    def setUp(self):
+        routers.replica_health.reset()
+        catalog_cache.clear()
+
+    def test_request_reads_go_to_the_replica(self):
+        Category.objects.create(name="On primary", description="Only on the primary")
+        Category.objects.using(self.replica).create(name="On replica", description="Only on the replica")
+        response = self.client.get("/api/categories/")
+        self.assertEqual([c["name"] for c in response.json()["data"]], ["On replica"])
+
+    def test_writes_and_later_reads_use_the_primary(self):
+        response = self.client.post("/api/categories/", {"name": "Poetry", "description": "Verse"})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(Category.objects.using("default").filter(name="Poetry").exists())
+        self.assertFalse(Category.objects.using(self.replica).exists())
+
+        with routers.request_scope("GET"):
+            self.assertEqual(router.db_for_read(Category), self.replica)
+            Category.objects.create(name="Drama", description="Plays")
+            self.assertEqual(router.db_for_read(Category), "default")
+        # Outside requests everything uses the primary
+        self.assertEqual(router.db_for_read(Category), "default")
+
+    @override_settings(REPLICA_DATABASES=["missing", REPLICA])
+    def test_unreachable_replicas_are_skipped(self):
+        with routers.request_scope("GET"):
+            self.assertEqual({router.db_for_read(Category) for _ in range(4)}, {self.replica})
+            self.assertEqual(routers.replica_health.status(), {"missing": False, self.replica: True})
+
+    def test_lagging_replicas_are_skipped(self):
+        with routers.request_scope("GET"):
+            with mock.patch("library.routers.replica_lag", return_value=60.0):
+                self.assertEqual(router.db_for_read(Category), "default")
+            with mock.patch("library.routers.replica_lag", return_value=1.0):
+                self.assertEqual(router.db_for_read(Category), self.replica)
+
+    @override_settings(CATALOG_CACHE_ENABLED=True)
+    def test_cache_fills_after_a_write_read_the_primary(self):
+        Category.objects.using(self.replica).create(name="Stale", description="Not replicated yet")
+        self.assertEqual(self.client.get("/api/categories/")["X-Cache"], "MISS")  # from the replica
+
+        response = self.client.post("/api/categories/", {"name": "Poetry", "description": "Verse"})
+        self.assertEqual(response.status_code, 201, response.content)
+        response = self.client.get("/api/categories/")
+        self.assertEqual([c["name"] for c in response.json()["data"]], ["Poetry"])
+
+    def test_replicas_are_never_migrated(self):
+        self.assertFalse(router.allow_migrate(self.replica, "library", model_name="category"))
+        self.assertTrue(router.allow_migrate("default", "library", model_name="category"))
+
+
+class ConditionalGetTests(LibraryTestCase):
+    def test_etag_round_trip(self):
+        book = make_book([make_author()], [make_category()], [make_library()])
+        response = self.client.get("/api/books/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Last-Modified", response)
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get("/api/books/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+
+        response = self.client.get(f"/api/books/{book.pk}/")
+        catalog_cache.clear()
+        not_modified = self.client.get(f"/api/books/{book.pk}/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_deleted_rows_are_not_served_as_not_modified(self):
+        members = [make_member(), make_member()]
+        response = self.client.get("/api/members/")
+        members[0].delete()
+        since = timezone.now() + timezone.timedelta(days=1)
+        for headers in ({"HTTP_IF_NONE_MATCH": response["ETag"]},
+                        {"HTTP_IF_MODIFIED_SINCE": since.strftime("%a, %d %b %Y %H:%M:%S GMT")}):
+            response = self.client.get("/api/members/", **headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()["data"]), 1)
+
+    def test_etag_changes_with_related_and_through_rows(self):
+        library, author = make_library(), make_author()
+        book = make_book([author], [make_category()])
+        etag = self.client.get("/api/libraries/")["ETag"]
+
+        book.libraries.add(library)
+        response = self.client.get("/api/libraries/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        author.first_name = "Renamed"
+        author.save()
+        self.assertEqual(self.client.get("/api/libraries/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_address_edit_changes_library_etag(self):
+        library = make_library()
+        etag = self.client.get("/api/libraries/")["ETag"]
+        address = library.campus_location  # read-only in the API; admin/shell edit
+        address.street = "2 New Road"
+        address.save()
+        response = self.client.get("/api/libraries/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("2 New Road", response.content.decode())
+
+    def test_contact_edit_changes_member_etag(self):
+        member = make_member()
+        etag = self.client.get("/api/members/")["ETag"]
+        response = self.client.put(f"/api/contacts/{member.phone.pk}/", {"number": "+919437099999", "type": "home"},
+                                   content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get("/api/members/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("+919437099999", response.content.decode())
+
+    def test_etag_differs_per_page_and_object(self):
+        first, second = make_author(), make_author()
+        self.assertNotEqual(
+            self.client.get("/api/authors/?page_size=1")["ETag"],
+            self.client.get("/api/authors/?page_size=2")["ETag"],
+        )
+        self.assertNotEqual(
+            self.client.get(f"/api/authors/{first.pk}/")["ETag"],
+            self.client.get(f"/api/authors/{second.pk}/")["ETag"],
+        )
+        self.assertEqual(self.client.get("/api/authors/999/").status_code, 404)
+
+
+class CirculationTests(LibraryTestCase):
+    def borrow(self, member, book):
+        return self.client.post("/api/borrowings/", {"member": member.pk, "book": book.pk},
+                                content_type="application/json")
+
+    def test_borrow_and_return_adjust_copies(self):
+        member, book = make_member(), make_book(copies=1)
+        response = self.borrow(member, book)
+        self.assertEqual(response.status_code, 201, response.content)
+        book.refresh_from_db()
+        self.assertEqual(book.available_copies, 0)
+        self.assertEqual(self.borrow(make_member(), book).status_code, 400)
+
+        url = f"/api/borrowings/{response.json()['borrowing_id']}/"
+        for _ in range(2):  # returning twice gives back one copy
+            returned = self.client.patch(url, {"return_date": "2020-01-01T00:00:00Z"},
+                                         content_type="application/json")
+            self.assertEqual(returned.status_code, 400)  # before borrow_date
+            returned = self.client.patch(url, {"return_date": Borrowing.objects.get().borrow_date.isoformat()},
+                                         content_type="application/json")
+            self.assertEqual(returned.status_code, 200, returned.content)
+        book.refresh_from_db()
+        self.assertEqual(book.available_copies, 1)
+
+    def test_borrow_limit(self):
+        member = make_member()
+        for _ in range(10):
+            self.assertEqual(self.borrow(member, make_book()).status_code, 201)
+        response = self.borrow(member, make_book())
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("borrowing limit", response.json()["message"])
+
+    def test_book_and_member_of_a_loan_cannot_be_changed(self):
+        member, book, other_book = make_member(), make_book(copies=1), make_book(copies=1)
+        url = f"/api/borrowings/{self.borrow(member, book).json()['borrowing_id']}/"
+        for change in ({"book": other_book.pk}, {"member": make_member().pk}):
+            response = self.client.patch(url, change, content_type="application/json")
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("cannot be changed", response.json()["message"])
+
+        response = self.client.put(url, {"member": member.pk, "book": book.pk}, content_type="application/json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(Borrowing.objects.get().book, book)
+        self.assertEqual([b.available_copies for b in Book.objects.order_by("pk")], [0, 1])
+
+
+    def test_returned_loan_cannot_be_reopened(self):
+        book = make_book(copies=1)
+        url = f"/api/borrowings/{self.borrow(make_member(), book).json()['borrowing_id']}/"
+        self.client.patch(url, {"return_date": timezone.now().isoformat()}, content_type="application/json")
+        response = self.client.patch(url, {"return_date": None}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cannot be reopened", response.json()["message"])
+
+        self.assertEqual(self.borrow(make_member(), book).status_code, 201)
+        self.assertEqual(self.borrow(make_member(), book).status_code, 400)  # one copy, one open loan
+        self.assertEqual(Borrowing.objects.filter(return_date__isnull=True).count(), 1)
+
+    def test_same_member_cannot_borrow_a_book_twice(self):
+        member, book = make_member(), make_book()
+        url = f"/api/borrowings/{self.borrow(member, book).json()['borrowing_id']}/"
+        response = self.borrow(member, book)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("not returned", response.json()["message"])
+
+        self.client.patch(url, {"return_date": timezone.now().isoformat()}, content_type="application/json")
+        response = self.borrow(member, book)  # same rule and message as bulk checkout
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "This book was already borrowed by the member before.")
+
+
+class BulkCirculationTests(LibraryTestCase):
+    def post(self, url, items):
+        return self.client.post(url, items, content_type="application/json")
+
+    def test_bulk_checkout_reports_per_item(self):
+        member, other = make_member(), make_member()
+        books = [make_book() for _ in range(18)]
+        scarce = make_book(copies=1)
+        items = [{"member": member.pk, "book": b.pk} for b in books[:9]]
+        items += [
+            {"member": member.pk, "book": books[0].pk},     # duplicate in batch
+            {"member": member.pk, "book": scarce.pk},       # 10th borrow
+            {"member": member.pk, "book": books[9].pk},     # over the limit
+            {"member": other.pk, "book": scarce.pk},        # no copies left
+            {"member": 999999, "book": books[10].pk},       # unknown member
+            {"member": other.pk, "book": 999999},           # unknown book
+        ]
+        items += [{"member": other.pk, "book": b.pk} for b in books[11:16]]
+
+        # savepoint, 2 locking selects + 2 lookups, 1 UPDATE ... CASE,
+        # 1 INSERT, 1 stats UPDATE, release: the same for any batch size
+        with self.assertNumQueries(9):
+            response = self.post("/api/borrowings/bulk-checkout/", items)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()["data"]
+        self.assertEqual((data["succeeded"], data["failed"]), (15, 5))
+        self.assertEqual([r["status"] for r in data["results"][9:15]],
+                         ["error", "success", "error", "error", "error", "error"])
+        self.assertEqual(Borrowing.objects.filter(member=member, return_date__isnull=True).count(), 10)
+        scarce.refresh_from_db()
+        self.assertEqual(scarce.available_copies, 0)
+        self.assertTrue(all(r["borrowing_id"] for r in data["results"] if r["status"] == "success"))
+
+    def test_bulk_return(self):
+        member = make_member()
+        books = [make_book(copies=2) for _ in range(3)]
+        results = self.post("/api/borrowings/bulk-checkout/",
+                            [{"member": member.pk, "book": b.pk} for b in books]).json()["data"]["results"]
+        ids = [r["borrowing_id"] for r in results]
+
+        response = self.post("/api/borrowings/bulk-return/",
+                             [{"borrowing": ids[0], "late_fee": 12.5}, {"borrowing": ids[1]},
+                              {"borrowing": ids[1]}, {"borrowing": 999999}])
+        data = response.json()["data"]
+        self.assertEqual((data["succeeded"], data["failed"]), (2, 2))
+        self.assertEqual(Borrowing.objects.get(pk=ids[0]).late_fee, 12.5)
+        self.assertEqual([Book.objects.get(pk=b.pk).available_copies for b in books], [2, 2, 1])
+
+    def test_bulk_rejects_malformed_batches(self):
+        self.assertEqual(self.post("/api/borrowings/bulk-checkout/", {"member": 1}).status_code, 400)
+        self.assertEqual(self.post("/api/borrowings/bulk-checkout/", [{"member": "x"}]).status_code, 400)
+
+
+class BookStatsTests(LibraryTestCase):
+    def post(self, url, data):
+        return self.client.post(url, data, content_type="application/json")
+
+    def stats(self, book):
+        return self.client.get(f"/api/books/{book.pk}/").json()["stats"]
+
+    def test_reviews_update_rating_aggregates(self):
+        book, other = make_book(), make_book()
+        self.assertEqual(self.stats(book)["avg_rating"], None)
+        first = self.post("/api/reviews/", {"member": make_member().pk, "book": book.pk,
+                                            "rating": 4.0, "comment": "Good"}).json()["data"]
+        self.post("/api/reviews/", {"member": make_member().pk, "book": book.pk, "rating": 5.0, "comment": "Great"})
+        self.assertEqual(self.stats(book)["review_count"], 2)
+        self.assertEqual(self.stats(book)["avg_rating"], 4.5)
+
+        url = f"/api/reviews/{first['review_id']}/"
+        review = {"member": first["member"], "book": book.pk, "rating": 2.0, "comment": "Meh"}
+        self.client.put(url, review, content_type="application/json")
+        self.assertEqual(self.stats(book)["avg_rating"], 3.5)
+        self.client.put(url, {**review, "book": other.pk}, content_type="application/json")
+        self.assertEqual((self.stats(book)["avg_rating"], self.stats(other)["avg_rating"]), (5.0, 2.0))
+        self.client.delete(url)
+        self.assertEqual(self.stats(other), {"review_count": 0, "avg_rating": None,
+                                             "total_borrows": 0, "active_borrows": 0})
+
+    def test_circulation_counts_match_a_rebuild(self):
+        member, books = make_member(), [make_book() for _ in range(3)]
+        borrowing = self.post("/api/borrowings/", {"member": member.pk, "book": books[0].pk}).json()
+        results = self.post("/api/borrowings/bulk-checkout/",
+                            [{"member": member.pk, "book": b.pk} for b in books[1:]]).json()["data"]["results"]
+        self.client.patch(f"/api/borrowings/{borrowing['borrowing_id']}/",
+                          {"return_date": Borrowing.objects.get(pk=borrowing["borrowing_id"]).borrow_date.isoformat()},
+                          content_type="application/json")
+        self.post("/api/borrowings/bulk-return/", [{"borrowing": results[0]["borrowing_id"]}])
+        self.client.delete(f"/api/borrowings/{results[1]['borrowing_id']}/")
+        Review.objects.create(member=member, book=books[0], rating=3.0, comment="Ok")  # bypasses stats
+
+        self.assertEqual([(self.stats(b)["total_borrows"], self.stats(b)["active_borrows"]) for b in books],
+                         [(1, 0), (1, 0), (0, 0)])
+        incremental = list(BookStats.objects.order_by("pk").values_list("total_borrows", "active_borrows"))
+        call_command("rebuild_book_stats", stdout=open("/dev/null", "w"))
+        rebuilt = BookStats.objects.order_by("pk")
+        self.assertEqual(list(rebuilt.values_list("total_borrows", "active_borrows")), incremental)
+        self.assertEqual(rebuilt.get(pk=books[0].pk).avg_rating, 3.0)
+
+    def test_reconcile_fixes_drifted_stats(self):
+        member, books = make_member(), [make_book() for _ in range(4)]
+        self.post("/api/borrowings/", {"member": member.pk, "book": books[0].pk})
+        self.post("/api/reviews/", {"member": member.pk, "book": books[1].pk, "rating": 4.0, "comment": "Good"})
+        # Writes outside the stats paths
+        Borrowing.objects.filter(book=books[0]).update(return_date=timezone.now())
+        Borrowing.objects.create(member=member, book=books[2])
+        BookStats.objects.filter(pk=books[1].pk).update(review_count=7, avg_rating=1.0)
+        BookStats.objects.filter(pk=books[3].pk).delete()
+
+        out = io.StringIO()
+        call_command("reconcile_book_stats", "--batch-size", "3", stdout=out)
+        self.assertIn("Corrected stats for 4 book(s)", out.getvalue())
+        self.assertEqual([(self.stats(b)["total_borrows"], self.stats(b)["active_borrows"]) for b in books],
+                         [(1, 0), (0, 0), (1, 1), (0, 0)])
+        self.assertEqual((self.stats(books[1])["review_count"], self.stats(books[1])["avg_rating"]), (1, 4.0))
+
+        call_command("reconcile_book_stats", stdout=out)
+        self.assertIn("Corrected stats for 0 book(s)", out.getvalue())
+
+
+class AnalyticsTests(LibraryTestCase):
+    def report(self, name, **params):
+        response = self.client.get(f"/api/analytics/{name}/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["data"]
+
+    def test_most_borrowed_is_densely_ranked_within_the_window(self):
+        members = [make_member() for _ in range(3)]
+        popular, steady, old = make_book(), make_book(), make_book()
+        for member in members:
+            Borrowing.objects.create(member=member, book=popular)
+        for member in members[:2]:
+            Borrowing.objects.create(member=member, book=steady)
+        Borrowing.objects.filter(book=steady, member=members[1]).update(borrow_date="2024-06-15T10:00:00Z")
+        Borrowing.objects.create(member=members[0], book=old)
+        Borrowing.objects.filter(book=old).update(borrow_date="2024-06-20T10:00:00Z")
+
+        rows = self.report("most-borrowed")  # last 30 days
+        self.assertEqual([(r["book_id"], r["borrowing_times"], r["priority"]) for r in rows],
+                         [(popular.pk, 3, 1), (steady.pk, 1, 2)])
+        rows = self.report("most-borrowed", start="2024-06-10", end="2024-06-30")
+        self.assertEqual([(r["book_id"], r["priority"]) for r in rows], [(steady.pk, 1), (old.pk, 1)])
+
+    def test_overdue_members_and_author_ratings(self):
+        late, punctual = make_member(), make_member()
+        author, other = make_author(), make_author()
+        first, second = make_book([author]), make_book([author, other])
+        Borrowing.objects.create(member=late, book=first, late_fee=20.0, return_date=timezone.now())
+        Borrowing.objects.create(member=late, book=second, due_date=timezone.now() - timezone.timedelta(days=1))
+        Borrowing.objects.create(member=punctual, book=first)
+        Review.objects.create(member=late, book=first, rating=4.0, comment="Good")
+        Review.objects.create(member=punctual, book=second, rating=2.0, comment="Meh")
+
+        rows = self.report("overdue-members")
+        self.assertEqual([(r["member_id"], r["fine"], r["overdue_books"]) for r in rows], [(late.pk, 20.0, 1)])
+        rows = self.report("author-ratings")
+        self.assertEqual([(r["author_id"], r["avg_rating"], r["rank"]) for r in rows],
+                         [(author.pk, 3.0, 1), (other.pk, 2.0, 2)])
+
+    def test_library_stock_and_books_with_authors(self):
+        library, empty = make_library(), make_library()
+        author, category = make_author(), make_category()
+        make_book([author], [category], [library], copies=3)
+        Book.objects.filter(pk=make_book([], [], [library], copies=2).pk).update(available_copies=0)
+
+        rows = self.report("library-stock")
+        self.assertEqual([(r["library_id"], r["titles"], r["total_copies"], r["available_copies"], r["out_of_stock"])
+                          for r in rows], [(library.pk, 2, 5, 3, 1), (empty.pk, 0, 0, 0, 0)])
+        rows = self.report("books-authors")
+        self.assertEqual([(r["author_name"], r["category"]) for r in rows],
+                         [(f"{author.first_name} {author.last_name}", category.name)])
+
+    def test_results_are_cached_per_parameters_and_invalidated(self):
+        book = make_book()
+        first = self.client.get("/api/analytics/most-borrowed/")
+        self.assertEqual(self.client.get("/api/analytics/most-borrowed/")["X-Cache"], "HIT")
+        self.assertEqual(self.client.get("/api/analytics/most-borrowed/", {"limit": 5})["X-Cache"], "MISS")
+        Borrowing.objects.create(member=make_member(), book=book)
+        second = self.client.get("/api/analytics/most-borrowed/")
+        self.assertEqual(second["X-Cache"], "MISS")
+        self.assertEqual((len(first.json()["data"]), len(second.json()["data"])), (0, 1))
+
+    def test_invalid_parameters(self):
+        response = self.client.get("/api/analytics/most-borrowed/", {"start": "2024-06-30", "end": "2024-06-01"})
+        self.assertEqual(response.status_code, 400)
+
+
+class DailyCirculationTests(LibraryTestCase):
+    def days_ago(self, n):
+        return timezone.localdate() - timezone.timedelta(days=n)
+
+    def at_noon(self, n):
+        return timezone.make_aware(timezone.datetime.combine(self.days_ago(n), timezone.datetime.min.time())
+                                   + timezone.timedelta(hours=12))
+
+    def borrow(self, book, borrowed, due, returned=None, late_fee=0.0):
+        borrowing = Borrowing.objects.create(member=make_member(), book=book)
+        borrowing.borrow_date, borrowing.due_date = self.at_noon(borrowed), self.at_noon(due)
+        borrowing.return_date = None if returned is None else self.at_noon(returned)
+        borrowing.late_fee = late_fee
+        borrowing.save()
+        return borrowing
+
+    def rollup(self):
+        return {(row.day, row.library_id): (row.borrows, row.returns, row.overdues, row.late_fees)
+                for row in DailyCirculation.objects.all()}
+
+    def test_refresh_aggregates_per_library_and_day(self):
+        library, other = make_library(), make_library()
+        book = make_book(libraries=[library, other])
+        self.borrow(book, borrowed=20, due=6, returned=3, late_fee=30.0)
+        self.borrow(book, borrowed=20, due=5)
+        rollups.refresh_daily_circulation()
+        rows = self.rollup()
+        for lib in (library, other):
+            self.assertEqual(rows[(self.days_ago(20), lib.pk)], (2, 0, 0, 0.0))
+            self.assertEqual(rows[(self.days_ago(6), lib.pk)], (0, 0, 1, 0.0))
+            self.assertEqual(rows[(self.days_ago(5), lib.pk)], (0, 0, 1, 0.0))
+            self.assertEqual(rows[(self.days_ago(3), lib.pk)], (0, 1, 0, 30.0))
+        self.assertEqual(len(rows), 8)
+
+    def test_incremental_refresh_only_recomputes_touched_days(self):
+        library = make_library()
+        book = make_book(libraries=[library])
+        old = self.borrow(book, borrowed=30, due=16, returned=20)
+        Borrowing.objects.filter(pk=old.pk).update(updated_at=self.at_noon(20))
+        loan = self.borrow(book, borrowed=10, due=2)
+        rollups.refresh_daily_circulation()
+        # A stale row outside the touched days is left alone...
+        DailyCirculation.objects.filter(day=self.days_ago(30)).update(borrows=99)
+
+        loan.return_date, loan.late_fee = self.at_noon(1), 10.0
+        loan.save()
+        rollups.refresh_daily_circulation()
+        rows = self.rollup()
+        self.assertEqual(rows[(self.days_ago(1), library.pk)], (0, 1, 0, 10.0))
+        self.assertEqual(rows[(self.days_ago(2), library.pk)], (0, 0, 1, 0.0))
+        self.assertEqual(rows[(self.days_ago(30), library.pk)][0], 99)
+
+        # ...until a range is recomputed explicitly
+        call_command("refresh_circulation_rollup", since=str(self.days_ago(40)), stdout=io.StringIO())
+        self.assertEqual(self.rollup()[(self.days_ago(30), library.pk)][0], 1)
+
+    def test_endpoint_combines_rollup_with_live_today(self):
+        library, other = make_library(), make_library()
+        book, elsewhere = make_book(libraries=[library]), make_book(libraries=[other])
+        self.borrow(book, borrowed=3, due=1, returned=2)
+        rollups.refresh_daily_circulation()
+        Borrowing.objects.create(member=make_member(), book=book)  # today, not rolled up yet
+        Borrowing.objects.create(member=make_member(), book=elsewhere)
+
+        response = self.client.get("/api/analytics/daily-circulation/", {"library": library.pk})
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()["data"]
+        self.assertEqual([(row["day"], row["borrows"], row["returns"]) for row in data], [
+            (str(self.days_ago(3)), 1, 0), (str(self.days_ago(2)), 0, 1), (str(timezone.localdate()), 1, 0),
+        ])
+        response = self.client.get("/api/analytics/daily-circulation/",
+                                   {"start": str(self.days_ago(2)), "end": str(self.days_ago(2))})
+        self.assertEqual([row["day"] for row in response.json()["data"]], [str(self.days_ago(2))])
+
+
+class LateFeeAccrualTests(LibraryTestCase):
+    def overdue(self, member, days, returned=False):
+        # Due `days` days before the start of today, plus twelve hours
+        borrowing = Borrowing.objects.create(member=member, book=make_book())
+        Borrowing.objects.filter(pk=borrowing.pk).update(
+            due_date=fees.start_of_day() - timezone.timedelta(days=days, hours=-12),
+            return_date=timezone.now() if returned else None,
+        )
+        return borrowing
+
+    def accrue(self, **options):
+        out = io.StringIO()
+        call_command("accrue_late_fees", stdout=out, **options)
+        return out.getvalue()
+
+    @override_settings(LATE_FEE_RATES={"student": 5.0, "faculty": 10.0})
+    def test_fees_follow_member_type_and_started_days(self):
+        student, faculty = make_member(), make_member()
+        Member.objects.filter(pk=faculty.pk).update(member_type="faculty")
+        late = self.overdue(student, 3)  # 2.5 days
+        later = self.overdue(faculty, 5)  # 4.5 days
+        returned = self.overdue(student, 4, returned=True)
+        current = Borrowing.objects.create(member=student, book=make_book())
+
+        self.assertIn("Updated late fees on 2 borrowing(s)", self.accrue(batch_size=1))
+        fees_by_pk = dict(Borrowing.objects.values_list("pk", "late_fee"))
+        self.assertEqual([fees_by_pk[b.pk] for b in (late, later, returned, current)], [15.0, 50.0, 0.0, 0.0])
+
+        # Idempotent: a rerun on the same day changes nothing
+        self.assertEqual(fees.accrue_late_fees(), 0)
+        # The next day adds one more day
+        tomorrow = fees.start_of_day(timezone.localdate() + timezone.timedelta(days=1))
+        self.assertEqual(fees.accrue_late_fees(as_of=tomorrow), 2)
+        self.assertEqual(Borrowing.objects.get(pk=late.pk).late_fee, 20.0)
+
+    @override_settings(LATE_FEE_RATES={"student": 5.0})
+    def test_every_member_type_needs_a_rate(self):
+        with self.assertRaisesMessage(CommandError, "faculty"):
+            self.accrue()
+
+
+class ExportTests(LibraryTestCase):
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_csv_export_streams_every_row_in_chunks(self):
+        members = [make_member() for _ in range(5)]
+        response, body = self.export("/api/members/export/")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn('filename="member.csv"', response["Content-Disposition"])
+        rows = list(csv.reader(body.splitlines()))
+        self.assertEqual(rows[0][:2], ["member_id", "first_name"])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [m.pk for m in members])
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_ndjson_export(self):
+        member = make_member()
+        books = [make_book() for _ in range(3)]
+        for book in books:
+            self.client.post("/api/borrowings/", {"member": member.pk, "book": book.pk})
+        response, body = self.export("/api/borrowings/export/?fmt=ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([r["book_id"] for r in records], [b.pk for b in books])
+        self.assertIsNone(records[0]["return_date"])
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_member_ndjson_export_writes_phone_numbers_as_text(self):
+        members = [make_member() for _ in range(3)]
+        response, body = self.export("/api/members/export/?fmt=ndjson")
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([r["member_id"] for r in records], [m.pk for m in members])
+        self.assertEqual(records[0]["phone__number"], str(members[0].phone.number))
+
+    def test_unsupported_format(self):
+        self.assertEqual(self.client.get("/api/reviews/export/?fmt=xml").status_code, 400)
+
+
+class PhoneNormalizationTests(TestCase):
+    def setUp(self):
+        serializers.normalize_phone.cache_clear()
+
+    def test_repeated_numbers_are_served_from_cache(self):
+        for _ in range(3):
+            self.assertEqual(serializers.validate_phone_number("+1 415 555 0101"), "+14155550101")
+        stats = self.client.get("/api/cache/stats/").json()["data"]["phone_normalization"]
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_rate"]), (2, 1, 0.6667))
+
+    def test_invalid_numbers_are_cached_and_still_rejected(self):
+        for _ in range(2):
+            with self.assertRaisesMessage(ValidationError, "Invalid phone number."):
+                serializers.validate_phone_number("+1 000 000 0000")
+        self.assertEqual(serializers.phone_cache_stats()["hits"], 1)
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite's")
+class AccessPathIndexTests(TestCase):
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return " ".join(row[-1] for row in cursor.fetchall())
+
+    def test_hot_borrowing_queries_use_composite_indexes(self):
+        now = timezone.now()
+        self.assertIn("borrowing_member_active_idx",
+                      self.plan(Borrowing.objects.filter(member_id=1, return_date__isnull=True)))
+        self.assertIn("borrowing_overdue_idx",
+                      self.plan(Borrowing.objects.filter(due_date__lt=now, return_date__isnull=True)))
+        self.assertIn("borrowing_book_history_idx",
+                      self.plan(Borrowing.objects.filter(book_id=1, borrow_date__gte=now)))
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class CirculationStressTests(TransactionTestCase):
+    # SQLite has no row locks and rejects concurrent writers outright, so
+    # this only runs on a backend that can queue them (MySQL)
+    requests = 100
+    copies = 10
+
+    def setUp(self):
+        catalog_cache.clear()
+
+    def test_no_oversell_under_concurrent_checkouts(self):
+        book = make_book(copies=self.copies)
+        members = [make_member() for _ in range(self.requests)]
+        barrier = threading.Barrier(self.requests)
+        responses = []
+
+        def checkout(member):
+            client = Client(raise_request_exception=False)
+            try:
+                barrier.wait()
+                response = client.post("/api/borrowings/", {"member": member.pk, "book": book.pk},
+                                       content_type="application/json")
+                responses.append((response.status_code, response.json()))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(m,)) for m in members]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        book.refresh_from_db()
+        statuses = [code for code, _ in responses]
+        self.assertEqual(len(responses), self.requests)
+        self.assertEqual(statuses.count(201), self.copies)
+        self.assertEqual(Borrowing.objects.filter(book=book).count(), self.copies)
+        self.assertEqual(book.available_copies, 0)
+        for code, body in responses:
+            if code != 201:
+                self.assertEqual(code, 400)
+                self.assertEqual(body["message"], f"The book '{book.title}' is currently not available.")
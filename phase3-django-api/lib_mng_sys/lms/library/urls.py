@@ -4,8 +4,10 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     AddressViewSet, ContactNumberViewSet, LibraryViewSet,
     AuthorViewSet, MemberViewSet, CategoryViewSet,
-    BookViewSet, BorrowingViewSet, ReviewViewSet
+    BookViewSet, BorrowingViewSet, ReviewViewSet, AnalyticsViewSet,
+    CacheStatsView, DatabasePoolStatsView, AutocompleteView
 )
+from .async_views import AsyncAuthorView, AsyncBookView, AsyncCategoryView, AsyncLibraryView
 
 router = DefaultRouter()
 router.register(r'addresses', AddressViewSet)
@@ -17,7 +19,20 @@ router.register(r'categories', CategoryViewSet)
 router.register(r'books', BookViewSet)
 router.register(r'borrowings', BorrowingViewSet)
 router.register(r'reviews', ReviewViewSet)
+router.register(r'analytics', AnalyticsViewSet, basename='analytics')
 
 urlpatterns = [
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('db/pool/stats/', DatabasePoolStatsView.as_view(), name='db-pool-stats'),
+    path('autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
+    # Async read-only catalog (async_views.py), for ASGI deployments
+    path('async/libraries/', AsyncLibraryView.as_view(), name='async-library-list'),
+    path('async/libraries/<int:pk>/', AsyncLibraryView.as_view(), name='async-library-detail'),
+    path('async/authors/', AsyncAuthorView.as_view(), name='async-author-list'),
+    path('async/authors/<int:pk>/', AsyncAuthorView.as_view(), name='async-author-detail'),
+    path('async/categories/', AsyncCategoryView.as_view(), name='async-category-list'),
+    path('async/categories/<int:pk>/', AsyncCategoryView.as_view(), name='async-category-detail'),
+    path('async/books/', AsyncBookView.as_view(), name='async-book-list'),
+    path('async/books/<int:pk>/', AsyncBookView.as_view(), name='async-book-detail'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
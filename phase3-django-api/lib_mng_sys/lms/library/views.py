@@ -1,19 +1,33 @@
+from datetime import timedelta
+
 from django.core.serializers import serialize
 from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from lms.mysql_pool.pool import pool_stats
 
 # Create your views here.
 from .models import (
     Address, ContactNumber, Library, Author, Member,
     Category, Book, Borrowing, Review
 )
+from . import analytics, autocomplete, catalog, circulation, rollups
+from .cache import cached_response, catalog_cache
+from .conditional import conditional_response
+from .exports import ExportMixin
+from .search import RankedResultsPagination, search_books
 from .serializers import (
     AddressSerializer, ContactNumberSerializer, LibrarySerializer,
     AuthorSerializer, MemberSerializer, CategorySerializer,
-    BookSerializer, BorrowingSerializer, ReviewSerializer
+    BookSerializer, BorrowingSerializer, ReviewSerializer,
+    BulkBookItemSerializer, BulkCheckoutItemSerializer, BulkReturnItemSerializer,
+    AnalyticsParamsSerializer, DailyCirculationParamsSerializer, phone_cache_stats
 )
 
 class AddressViewSet(viewsets.ModelViewSet):
@@ -28,6 +42,17 @@ class LibraryViewSet(viewsets.ModelViewSet):
     queryset = Library.objects.all()
     serializer_class = LibrarySerializer
 
+    def get_queryset(self):
+        # Whole nested payload (address, phone, books, their authors and
+        # categories) in a fixed number of queries, however many rows
+        return Library.objects.select_related('campus_location', 'phone_number').prefetch_related(
+            Prefetch('book_set', queryset=Book.objects.all()),
+            Prefetch('book_set__authors', queryset=Author.objects.all()),
+            Prefetch('book_set__categories', queryset=Category.objects.all()),
+        )
+
+    @conditional_response('library')
+    @cached_response('library')
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
         if not queryset.exists():
@@ -35,9 +60,12 @@ class LibraryViewSet(viewsets.ModelViewSet):
                 {"status": "error", "message": "No libraries available.", "code": 404},
                 status=status.HTTP_404_NOT_FOUND,
             )
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.paginator.get_paginated_response(serializer.data, "Libraries retrieved successfully.")
 
+    @conditional_response('library')
+    @cached_response('library')
     def retrieve(self, request, *args, **kwargs):
         try:
             library = self.get_object()
@@ -96,11 +124,16 @@ class LibraryViewSet(viewsets.ModelViewSet):
         )
 
 class AuthorViewSet(viewsets.ModelViewSet):
-    queryset = Author.objects.all().prefetch_related('book_set__categories')
+    # Book.authors uses related_name='books'; AuthorSerializer.get_books
+    # reads exactly these caches
+    queryset = Author.objects.all().prefetch_related(
+        Prefetch('books', queryset=Book.objects.all()),
+        Prefetch('books__categories', queryset=Category.objects.all()),
+    )
     serializer_class = AuthorSerializer
 
     def get_object(self):
-        return get_object_or_404(Author, pk=self.kwargs.get('pk'))
+        return get_object_or_404(self.get_queryset(), pk=self.kwargs.get('pk'))
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -112,15 +145,15 @@ class AuthorViewSet(viewsets.ModelViewSet):
             "data": serializer.data
         }, status=status.HTTP_201_CREATED)
 
+    @conditional_response('author')
+    @cached_response('author')
     def list(self, request, *args, **kwargs):
-        authors = self.get_queryset()
+        authors = self.paginate_queryset(self.get_queryset())
         serializer = self.get_serializer(authors, many=True)
-        return Response({
-            "status": "success",
-            "message": "Authors retrieved successfully.",
-            "data": serializer.data
-        })
+        return self.paginator.get_paginated_response(serializer.data, "Authors retrieved successfully.")
 
+    @conditional_response('author')
+    @cached_response('author')
     def retrieve(self, request, *args, **kwargs):
         try:
             author = self.get_object()
@@ -188,9 +221,13 @@ class AuthorViewSet(viewsets.ModelViewSet):
             "message": "Author deleted successfully."
         }, status=status.HTTP_204_NO_CONTENT)
 
-class MemberViewSet(viewsets.ModelViewSet):
+class MemberViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Member.objects.all()
     serializer_class = MemberSerializer
+    export_fields = (
+        'member_id', 'first_name', 'last_name', 'email', 'phone__number',
+        'member_type', 'registration_date', 'created_at', 'updated_at'
+    )
 
     def get_object(self):
         return get_object_or_404(Member, pk=self.kwargs.get('pk'))
@@ -206,15 +243,13 @@ class MemberViewSet(viewsets.ModelViewSet):
             "data": serializer.data
         }, status=status.HTTP_201_CREATED)
 
+    @conditional_response()
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
-            "status": "success",
-            "message": "Member list fetched successfully.",
-            "data": serializer.data
-        })
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.paginator.get_paginated_response(serializer.data, "Member list fetched successfully.")
 
+    @conditional_response()
     def retrieve(self, request, *args, **kwargs):
         try:
             member = self.get_object()
@@ -335,6 +370,8 @@ class CategoryViewSet(viewsets.ModelViewSet):
             "code": 200
         }, status=status.HTTP_200_OK)
 
+    @conditional_response('category')
+    @cached_response('category')
     def retrieve(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
@@ -347,6 +384,8 @@ class CategoryViewSet(viewsets.ModelViewSet):
                 "code": 404
             }, status=status.HTTP_404_NOT_FOUND)
 
+    @conditional_response('category')
+    @cached_response('category')
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
         if not queryset.exists():
@@ -355,15 +394,34 @@ class CategoryViewSet(viewsets.ModelViewSet):
                 "message": "No categories available.",
                 "code": 404
             }, status=status.HTTP_404_NOT_FOUND)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.paginator.get_paginated_response(serializer.data, "Categories retrieved successfully.")
 
 class BookViewSet(viewsets.ModelViewSet):
-    queryset = Book.objects.all().select_related('library').prefetch_related('authors', 'categories')
+    # Book <-> Library is the `libraries` M2M through BookLibrary, so it is
+    # prefetched like authors and categories (one query each per page)
+    queryset = Book.objects.select_related('stats').prefetch_related(
+        Prefetch('libraries', queryset=Library.objects.all()),
+        Prefetch('authors', queryset=Author.objects.all()),
+        Prefetch('categories', queryset=Category.objects.all()),
+    )
     serializer_class = BookSerializer
 
     def get_object(self):
-        return get_object_or_404(Book, pk=self.kwargs.get('pk'))
+        return get_object_or_404(self.get_queryset(), pk=self.kwargs.get('pk'))
+
+    @conditional_response('book')
+    @cached_response('book')
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.paginator.get_paginated_response(serializer.data, "Books retrieved successfully.")
+
+    @conditional_response('book')
+    @cached_response('book')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -412,11 +470,63 @@ class BookViewSet(viewsets.ModelViewSet):
             "errors": serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'], url_path='search')
+    @conditional_response('book')
+    @cached_response('book')
+    def search(self, request, *args, **kwargs):
+        # GET /api/books/search/?q=... over titles, author and category names
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({
+                "status": "error",
+                "message": "Query parameter 'q' is required.",
+                "code": 400
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = RankedResultsPagination()
+        page = paginator.paginate_ranked(search_books(query), self.get_queryset(), request)
+        data = self.get_serializer(page, many=True).data
+        for item, book in zip(data, page):
+            item['relevance'] = book.relevance
+        return paginator.get_paginated_response(data)
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_upsert(self, request, *args, **kwargs):
+        # Create or update (by isbn) up to catalog.BULK_LIMIT books at once
+        items = request.data
+        if not isinstance(items, list) or not items or len(items) > catalog.BULK_LIMIT:
+            return Response({
+                "status": "error",
+                "message": f"Expected a list of 1 to {catalog.BULK_LIMIT} books.",
+                "code": 400
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = BulkBookItemSerializer(data=items, many=True)
+        if not serializer.is_valid():
+            return Response({
+                "status": "error",
+                "message": "Bulk book upsert failed.",
+                "errors": serializer.errors,
+                "code": 400
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        results = catalog.bulk_upsert_books(serializer.validated_data)
+        created = sum(1 for result in results if result["status"] == "created")
+        return Response({
+            "status": "success",
+            "message": "Bulk book upsert processed.",
+            "data": {
+                "created": created,
+                "updated": len(results) - created,
+                "results": results
+            }
+        })
+
     def destroy(self, request, *args, **kwargs):
         book = self.get_object()
         book.authors.clear()
         book.categories.clear()
-        book.reviews.all().delete()
+        book.review_set.all().delete()
         book.borrowing_set.all().delete()
         book.delete()
         return Response({
@@ -424,14 +534,28 @@ class BookViewSet(viewsets.ModelViewSet):
             "message": "Book and related data deleted successfully."
         }, status=status.HTTP_204_NO_CONTENT)
 
-class BorrowingViewSet(viewsets.ModelViewSet):
+class BorrowingViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Borrowing.objects.all().select_related('member', 'book')
     serializer_class = BorrowingSerializer
+    export_fields = (
+        'borrowing_id', 'member_id', 'book_id', 'borrow_date', 'due_date',
+        'return_date', 'late_fee', 'created_at', 'updated_at'
+    )
 
     def get_object(self):
         obj = get_object_or_404(Borrowing, pk=self.kwargs.get('pk'))
         return obj
 
+    @conditional_response()
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.paginator.get_paginated_response(serializer.data, "Borrowings retrieved successfully.")
+
+    @conditional_response()
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
@@ -475,13 +599,65 @@ class BorrowingViewSet(viewsets.ModelViewSet):
         borrowing.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class ReviewViewSet(viewsets.ModelViewSet):
+    def _bulk_circulation(self, request, item_serializer_class, handler, action_name):
+        items = request.data
+        if not isinstance(items, list) or not items or len(items) > circulation.BULK_LIMIT:
+            return Response({
+                "status": "error",
+                "message": f"Expected a list of 1 to {circulation.BULK_LIMIT} items.",
+                "code": 400
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = item_serializer_class(data=items, many=True)
+        if not serializer.is_valid():
+            return Response({
+                "status": "error",
+                "message": f"Bulk {action_name} failed.",
+                "errors": serializer.errors,
+                "code": 400
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        results = handler(serializer.validated_data)
+        succeeded = sum(1 for result in results if result["status"] == "success")
+        return Response({
+            "status": "success",
+            "message": f"Bulk {action_name} processed.",
+            "data": {
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded,
+                "results": results
+            }
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk-checkout')
+    def bulk_checkout(self, request, *args, **kwargs):
+        return self._bulk_circulation(request, BulkCheckoutItemSerializer, circulation.bulk_borrow, "checkout")
+
+    @action(detail=False, methods=['post'], url_path='bulk-return')
+    def bulk_return(self, request, *args, **kwargs):
+        return self._bulk_circulation(request, BulkReturnItemSerializer, circulation.bulk_return, "return")
+
+class ReviewViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all().select_related('member', 'book')
     serializer_class = ReviewSerializer
+    export_fields = (
+        'review_id', 'member_id', 'book_id', 'rating', 'comment',
+        'review_date', 'created_at', 'updated_at'
+    )
 
     def get_object(self):
         return get_object_or_404(Review, pk=self.kwargs.get('pk'))
 
+    @conditional_response()
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.paginator.get_paginated_response(serializer.data, "Reviews retrieved successfully.")
+
+    @conditional_response()
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
@@ -535,4 +711,108 @@ class ReviewViewSet(viewsets.ModelViewSet):
         return Response({
             "status": "success",
             "message": "Review deleted successfully."
-        }, status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        }, status=status.HTTP_204_NO_CONTENT)
+
+class AnalyticsViewSet(viewsets.ViewSet):
+    # Read-only reports (see analytics.py), cached per query string.
+    # Optional ?start=YYYY-MM-DD&end=YYYY-MM-DD&limit=N on every report.
+
+    def _report(self, request, build, message, default_days=None, params_class=AnalyticsParamsSerializer):
+        params = params_class(data=request.query_params)
+        if not params.is_valid():
+            return Response({
+                "status": "error",
+                "message": "Invalid report parameters.",
+                "errors": params.errors,
+                "code": 400
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = params.validated_data
+        if default_days:
+            filters['end'] = filters.get('end') or timezone.localdate()
+            filters['start'] = filters.get('start') or filters['end'] - timedelta(days=default_days - 1)
+        return Response({
+            "status": "success",
+            "message": message,
+            "data": list(build(**filters)),
+            "parameters": params_class(filters).data
+        })
+
+    @action(detail=False, methods=['get'], url_path='books-authors')
+    @cached_response('analytics')
+    def books_authors(self, request, *args, **kwargs):
+        return self._report(request, analytics.books_with_authors, "Books with authors retrieved successfully.")
+
+    @action(detail=False, methods=['get'], url_path='most-borrowed')
+    @cached_response('analytics')
+    def most_borrowed(self, request, *args, **kwargs):
+        # Defaults to the last 30 days
+        return self._report(request, analytics.most_borrowed, "Most borrowed books retrieved successfully.",
+                            default_days=30)
+
+    @action(detail=False, methods=['get'], url_path='overdue-members')
+    @cached_response('analytics')
+    def overdue_members(self, request, *args, **kwargs):
+        return self._report(request, analytics.overdue_members, "Overdue members retrieved successfully.")
+
+    @action(detail=False, methods=['get'], url_path='author-ratings')
+    @cached_response('analytics')
+    def author_ratings(self, request, *args, **kwargs):
+        return self._report(request, analytics.author_ratings, "Author ratings retrieved successfully.")
+
+    @action(detail=False, methods=['get'], url_path='daily-circulation')
+    @cached_response('analytics')
+    def daily_circulation(self, request, *args, **kwargs):
+        # Per library per day from the rollup table (rollups.py); defaults
+        # to the last 30 days, optional ?library=<id>
+        return self._report(request, rollups.daily_circulation, "Daily circulation retrieved successfully.",
+                            default_days=30, params_class=DailyCirculationParamsSerializer)
+
+    @action(detail=False, methods=['get'], url_path='library-stock')
+    @cached_response('analytics')
+    def library_stock(self, request, *args, **kwargs):
+        return self._report(request, analytics.library_stock, "Library stock retrieved successfully.")
+
+class CacheStatsView(APIView):
+    # Hit/miss counters of the catalog response cache and of the memoized
+    # phone normalization (serializers.normalize_phone), this process
+    def get(self, request, *args, **kwargs):
+        return Response({
+            "status": "success",
+            "message": "Catalog cache statistics.",
+            "data": {**catalog_cache.stats(), "phone_normalization": phone_cache_stats()}
+        })
+
+class DatabasePoolStatsView(APIView):
+    # Connection pool usage per database alias (this process); empty when
+    # DB_POOL_ENABLED is off
+    def get(self, request, *args, **kwargs):
+        return Response({
+            "status": "success",
+            "message": "Database pool statistics.",
+            "data": pool_stats()
+        })
+
+class AutocompleteView(APIView):
+    # GET /api/autocomplete/?q=tag[&type=book,author][&limit=10]
+    # Served from the in-process index in autocomplete.py, no DB query
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        kinds = [k for k in request.query_params.get('type', '').split(',') if k]
+        if set(kinds) - set(autocomplete.KINDS):
+            return Response({
+                "status": "error",
+                "message": f"Unknown type. Use any of {list(autocomplete.KINDS)}.",
+                "code": 400
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), self.max_limit)
+        except ValueError:
+            limit = 10
+
+        return Response({
+            "status": "success",
+            "message": "Suggestions retrieved successfully.",
+            "data": autocomplete.get_index().search(request.query_params.get('q', ''), limit, kinds)
+        })
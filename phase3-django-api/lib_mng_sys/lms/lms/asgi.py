@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Serve it with an ASGI server, e.g. ``uvicorn lms.asgi:application --workers 4``.
+The async catalog reads live under /api/async/ (library/async_views.py);
+every other endpoint runs in the server's thread pool as usual.
 """
 
 import os
@@ -0,0 +1,33 @@
+from django.db.backends.mysql import base as mysql
+
+from .pool import get_pool
+
+# MySQL backend (ENGINE 'lms.mysql_pool') whose connections come from a
+# per-process ConnectionPool (pool.py) instead of a fresh TCP + auth
+# handshake each time. Django "closing" a connection (end of request with
+# CONN_MAX_AGE = 0, or when it expires) returns it to the pool. Pool sizing
+# comes from the database's 'POOL' settings: size, overflow, timeout,
+# recycle, pre_ping.
+
+
+class DatabaseWrapper(mysql.DatabaseWrapper):
+    def _pool(self, conn_params=None):
+        def connect():
+            return mysql.DatabaseWrapper.get_new_connection(self, conn_params)
+        return get_pool(self.alias, connect, **self.settings_dict.get('POOL', {}))
+
+    def get_new_connection(self, conn_params):
+        return self._pool(conn_params).acquire()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # Hand the connection back without an open transaction; one closed
+        # inside an atomic block is discarded, Django still references it
+        reusable = not self.in_atomic_block
+        if reusable:
+            try:
+                self.connection.rollback()
+            except Exception:
+                reusable = False
+        self._pool().release(self.connection, reusable)
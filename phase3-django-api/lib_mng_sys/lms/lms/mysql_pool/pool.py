@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import deque
+
+# Thread-safe pool of DB-API connections, sized like SQLAlchemy's QueuePool:
+# up to `size` connections stay open while idle, up to `overflow` more are
+# opened under load and closed again when returned, and a checkout beyond
+# size + overflow waits up to `timeout` seconds. Idle connections older
+# than `recycle` seconds are replaced, and with `pre_ping` every checkout
+# first checks the connection is still alive.
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+def _ping(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT 1')
+        cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+class ConnectionPool:
+    def __init__(self, connect, size=5, overflow=10, timeout=30.0, recycle=3600, pre_ping=True, ping=_ping):
+        self._connect = connect
+        self._ping = ping
+        self.size = size
+        self.overflow = overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # (connection, opened_at), most recently used last
+        self._opened_at = {}  # checked out connection -> opened_at
+        self._open = 0  # idle + checked out
+        self._counters = dict.fromkeys(('connects', 'checkouts', 'waits', 'timeouts', 'recycled', 'ping_failures'), 0)
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        connection = opened_at = None
+        with self._lock:
+            waited = False
+            while True:
+                if self._idle:
+                    connection, opened_at = self._idle.pop()
+                    break
+                if self._open < self.size + self.overflow:
+                    self._open += 1  # reserve the slot, connect outside the lock
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeout(f"No connection available within {self.timeout}s "
+                                      f"(size {self.size}, overflow {self.overflow}).")
+                if not waited:
+                    self._counters['waits'] += 1
+                    waited = True
+                self._lock.wait(remaining)
+
+        if connection is not None and not self._still_good(connection, opened_at):
+            _close_quietly(connection)
+            connection = None
+        if connection is None:
+            try:
+                connection = self._connect()
+            except BaseException:
+                self._give_back_slot()
+                raise
+            opened_at = time.monotonic()
+            with self._lock:
+                self._counters['connects'] += 1
+
+        with self._lock:
+            self._opened_at[connection] = opened_at
+            self._counters['checkouts'] += 1
+        return connection
+
+    def release(self, connection, reusable=True):
+        with self._lock:
+            # Unknown connections (not from this pool) are just closed
+            opened_at = self._opened_at.pop(connection, None)
+            if opened_at is not None:
+                self._lock.notify()
+                if reusable and len(self._idle) < self.size:
+                    self._idle.append((connection, opened_at))
+                    return
+                self._open -= 1
+        # Overflow, broken or unknown connection: close it
+        _close_quietly(connection)
+
+    def dispose(self):
+        # Closes the idle connections; checked out ones close on release
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for connection, _ in idle:
+            _close_quietly(connection)
+
+    def stats(self):
+        with self._lock:
+            checked_out = len(self._opened_at)
+            capacity = self.size + self.overflow
+            return {
+                'size': self.size,
+                'max_overflow': self.overflow,
+                'open': self._open,
+                'idle': len(self._idle),
+                'checked_out': checked_out,
+                'overflow_in_use': max(self._open - self.size, 0),
+                'utilization': round(checked_out / capacity, 4) if capacity else 0.0,
+                **self._counters,
+            }
+
+    def _still_good(self, connection, opened_at):
+        if self.recycle is not None and time.monotonic() - opened_at > self.recycle:
+            with self._lock:
+                self._counters['recycled'] += 1
+            return False
+        if self.pre_ping:
+            try:
+                self._ping(connection)
+            except Exception:
+                with self._lock:
+                    self._counters['ping_failures'] += 1
+                return False
+        return True
+
+    def _give_back_slot(self):
+        with self._lock:
+            self._open -= 1
+            self._lock.notify()
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+# One pool per database alias (per process)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, connect, **options):
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(connect, **options)
+        return _pools[alias]
+
+
+def pool_stats():
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for alias, pool in pools.items()}
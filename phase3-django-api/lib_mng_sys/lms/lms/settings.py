@@ -14,7 +14,7 @@ from pathlib import Path
 
 import pymysql
 pymysql.install_as_MySQLdb()
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -53,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'library.routers.PrimaryReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'lms.urls'
@@ -78,16 +79,120 @@ WSGI_APPLICATION = 'lms.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connection reuse. With DB_POOL_ENABLED (default) connections come from a
+# per-process pool (lms/mysql_pool) and go back to it when Django closes them
+# at the end of each request; without it, each thread keeps its connection
+# for DB_CONN_MAX_AGE seconds. Either way a reused connection is checked
+# before use. Pool usage: GET /api/db/pool/stats/.
+DB_POOL_ENABLED = config('DB_POOL_ENABLED', default=True, cast=bool)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'lms.mysql_pool' if DB_POOL_ENABLED else 'django.db.backends.mysql',
         'NAME': config('DB_NAME'),
         'USER': config('DB_USER'),
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='3306'),
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=0 if DB_POOL_ENABLED else 60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'POOL': {
+            'size': config('DB_POOL_SIZE', default=10, cast=int),  # kept open while idle
+            'overflow': config('DB_POOL_MAX_OVERFLOW', default=10, cast=int),  # extra under load
+            'timeout': config('DB_POOL_TIMEOUT', default=30.0, cast=float),  # seconds to wait for one
+            'recycle': config('DB_POOL_RECYCLE', default=3600, cast=int),  # below MySQL's wait_timeout
+            'pre_ping': config('DB_POOL_PRE_PING', default=True, cast=bool),
+        },
+    }
+}
+
+# Read replicas (library/routers.py): DB_REPLICA_HOSTS=host[:port],... adds
+# aliases replica1, replica2, ... with the primary's credentials. Request
+# reads go to a healthy replica at most DB_REPLICA_MAX_LAG seconds behind;
+# writes, and reads after a write in the same request, go to the primary.
+# Catalog cache fills go to the primary too for MAX_LAG + HEALTH_INTERVAL
+# seconds after a catalog write. Replicas are never migrated.
+REPLICA_DATABASES = []
+for number, replica in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv()), start=1):
+    host, _, port = replica.partition(':')
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
     }
+    REPLICA_DATABASES.append(alias)
+REPLICA_MAX_LAG = config('DB_REPLICA_MAX_LAG', default=5.0, cast=float)  # seconds
+REPLICA_HEALTH_INTERVAL = config('DB_REPLICA_HEALTH_INTERVAL', default=10.0, cast=float)  # seconds
+DATABASE_ROUTERS = ['library.routers.PrimaryReplicaRouter']
+
+
+# Django REST framework
+# List endpoints use keyset pagination over each model's Meta.ordering;
+# clients can ask for ?page_size=N up to API_MAX_PAGE_SIZE.
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=500, cast=int)
+
+# Rows fetched per query by the streaming /export/ endpoints
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Most relevant books returned by /api/books/search/ (across all pages)
+SEARCH_MAX_RESULTS = config('SEARCH_MAX_RESULTS', default=1000, cast=int)
+
+# Seconds between background rebuilds of each process's autocomplete index
+# (picks up writes made by other workers); 0 disables them
+AUTOCOMPLETE_REBUILD_INTERVAL = config('AUTOCOMPLETE_REBUILD_INTERVAL', default=300, cast=int)
+
+# Late fee per started day overdue, by member type (manage.py accrue_late_fees),
+# and borrowing_id range covered by each of its UPDATEs
+LATE_FEE_RATES = {
+    'student': config('LATE_FEE_RATE_STUDENT', default=5.0, cast=float),
+    'faculty': config('LATE_FEE_RATE_FACULTY', default=10.0, cast=float),
 }
+LATE_FEE_BATCH_SIZE = config('LATE_FEE_BATCH_SIZE', default=10000, cast=int)
+
+# Distinct phone numbers whose normalization (serializers.normalize_phone)
+# each process keeps memoized
+PHONE_CACHE_SIZE = config('PHONE_CACHE_SIZE', default=4096, cast=int)
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'library.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': config('API_PAGE_SIZE', default=50, cast=int),
+}
+
+
+# Caches
+# The catalog endpoints (libraries, categories, authors, books) keep a
+# read-through cache of their responses in the 'catalog' alias. LocMemCache
+# is a per-process LRU bounded by MAX_ENTRIES; set CATALOG_CACHE_BACKEND /
+# CATALOG_CACHE_LOCATION to e.g. django.core.cache.backends.redis.RedisCache
+# to share it between workers.
+CATALOG_CACHE_BACKEND = config('CATALOG_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+CATALOG_CACHE_ALIAS = 'catalog'
+CATALOG_CACHE_ENABLED = config('CATALOG_CACHE_ENABLED', default=True, cast=bool)
+CATALOG_CACHE_TTL = config('CATALOG_CACHE_TTL', default=300, cast=int)  # seconds
+CATALOG_CACHE_TTLS = {
+    'library': config('CATALOG_CACHE_TTL_LIBRARY', default=CATALOG_CACHE_TTL, cast=int),
+    'category': config('CATALOG_CACHE_TTL_CATEGORY', default=CATALOG_CACHE_TTL, cast=int),
+    'author': config('CATALOG_CACHE_TTL_AUTHOR', default=CATALOG_CACHE_TTL, cast=int),
+    'book': config('CATALOG_CACHE_TTL_BOOK', default=CATALOG_CACHE_TTL, cast=int),
+    'analytics': config('CATALOG_CACHE_TTL_ANALYTICS', default=CATALOG_CACHE_TTL, cast=int),
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    CATALOG_CACHE_ALIAS: {
+        'BACKEND': CATALOG_CACHE_BACKEND,
+        'LOCATION': config('CATALOG_CACHE_LOCATION', default='catalog'),
+        'TIMEOUT': CATALOG_CACHE_TTL,
+    },
+}
+if CATALOG_CACHE_BACKEND.endswith('LocMemCache'):
+    CACHES[CATALOG_CACHE_ALIAS]['OPTIONS'] = {
+        'MAX_ENTRIES': config('CATALOG_CACHE_MAX_ENTRIES', default=1000, cast=int),
+    }
 
 
 # Password validation
@@ -0,0 +1,115 @@
+"""
+Load test for the catalog read endpoints: requests/sec and latency
+percentiles of one or more targets under the same concurrency.
+
+Compare the WSGI (DRF) path with the async path served through lms.asgi,
+e.g. with both servers running against the same database:
+
+    gunicorn lms.wsgi -w 4 -b 127.0.0.1:8000
+    uvicorn lms.asgi:application --workers 4 --port 8001
+
+    python loadtest.py -c 200 -d 30 \\
+        wsgi=http://127.0.0.1:8000/api/books/ \\
+        asgi=http://127.0.0.1:8001/api/async/books/
+
+Standard library only: every simulated client is a coroutine holding a
+keep-alive HTTP/1.1 connection (reopened when the server closes it).
+"""
+import argparse
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+
+async def _read_response(reader):
+    # Returns (status, keep_alive) after consuming the whole body
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status = int(status_line.split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while size := int((await reader.readline()).split(b';')[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def _client(url, deadline, latencies, errors):
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    request = (f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+               f"Accept: application/json\r\nConnection: keep-alive\r\n\r\n").encode()
+    reader = writer = None
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await _read_response(reader)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            errors.append(time.monotonic() - started)
+            keep_alive = False
+        else:
+            (latencies if status == 200 else errors).append(time.monotonic() - started)
+        if not keep_alive and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def _percentile(values, fraction):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def run(url, concurrency, duration, warmup):
+    if warmup:
+        await asyncio.gather(*[_client(url, time.monotonic() + warmup, [], []) for _ in range(concurrency)])
+    latencies, errors = [], []
+    started = time.monotonic()
+    await asyncio.gather(*[_client(url, started + duration, latencies, errors) for _ in range(concurrency)])
+    elapsed = time.monotonic() - started
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / elapsed,
+        'p50': _percentile(latencies, 0.50) * 1000,
+        'p99': _percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare requests/sec and latency of catalog endpoints.")
+    parser.add_argument('targets', nargs='+', metavar='NAME=URL', help="e.g. asgi=http://127.0.0.1:8001/api/async/books/")
+    parser.add_argument('-c', '--concurrency', type=int, default=100, help="Concurrent connections per target.")
+    parser.add_argument('-d', '--duration', type=float, default=20.0, help="Seconds measured per target.")
+    parser.add_argument('-w', '--warmup', type=float, default=3.0, help="Unmeasured seconds before each run.")
+    args = parser.parse_args()
+
+    print(f"{'target':<12}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for target in args.targets:
+        name, sep, url = target.partition('=')
+        if not sep or '://' in name:
+            name = url = target
+        result = asyncio.run(run(url, args.concurrency, args.duration, args.warmup))
+        print(f"{name:<12}{result['requests']:>10}{result['errors']:>8}{result['rps']:>10.1f}"
+              f"{result['p50']:>10.1f}{result['p99']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()